@@ -0,0 +1,352 @@
+# backend/app/analytics.py
+"""Optional in-memory columnar engine for expense aggregations.
+
+Expenses are held as NumPy columns (date as int32 day numbers, amount as
+int64 cents, category and account ids) plus a CSR index of tag ids, so
+``/expenses/stats`` over multi-year ranges becomes a handful of vectorized
+mask/group operations instead of three SQL aggregates.
+
+Enable with ``ANALYTICS_ENGINE=true``. The store is loaded once at startup,
+kept current from ``expense.changed`` events published by crud writes, and
+polls the sync ``change_log`` (see app/sync.py) for writes made by other
+workers and processes, deletes and archived rows included. Its sequence
+numbers follow commit order, so a transaction that commits late is never
+skipped the way an ``updated_at`` watermark would skip it.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.engine import Connection, Engine
+
+from . import events, models, sync
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ANALYTICS_ENGINE", "False").lower() == "true"
+POLL_SECONDS = float(os.getenv("ANALYTICS_POLL_SECONDS", "5"))
+RELOAD_SECONDS = float(os.getenv("ANALYTICS_RELOAD_SECONDS", "3600"))
+LOAD_CHUNK = 200_000
+# Changed ids are re-read in IN lists of this size
+POLL_BATCH = 1000
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _day(value: date) -> int:
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def _cents(amount: Any) -> int:
+    return int(Decimal(amount).scaleb(2))
+
+
+def _money(cents: int) -> Decimal:
+    # Same value and scale as SUM() over a Numeric(12, 2) column
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def grouped_sum(keys: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Exact int64 group sums via two float bincounts over 26-bit halves.
+
+    Each half sums exactly in float64 for up to 2**27 rows, which keeps this
+    as fast as ``np.bincount`` without the rounding of summing cents as floats.
+    """
+    if len(keys) == 0:
+        return np.zeros(size, dtype=np.int64)
+    low = values & 0x3FFFFFF
+    high = values >> 26
+    low_sums = np.bincount(keys, weights=low, minlength=size).astype(np.int64)
+    high_sums = np.bincount(keys, weights=high, minlength=size).astype(np.int64)
+    return (high_sums << 26) + low_sums
+
+
+class _Growable:
+    """A NumPy array with amortized O(1) appends."""
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values: np.ndarray):
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            grown = np.zeros(max(needed, len(self.data) * 2), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = values
+        self.size = needed
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+
+class ExpenseColumnStore:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = False
+        self._reset()
+
+    def _reset(self):
+        self.ids = _Growable(np.int64)
+        self.dates = _Growable(np.int32)
+        self.amounts = _Growable(np.int64)
+        self.categories = _Growable(np.int32)
+        self.accounts = _Growable(np.int32)
+        self.alive = _Growable(np.bool_)
+        self.tag_offsets = _Growable(np.int64)
+        self.tag_offsets.extend(np.zeros(1, dtype=np.int64))
+        self.tag_ids = _Growable(np.int32)
+        self.row_of = np.full(1024, -1, dtype=np.int64)  # expense id -> row index
+        self.dead = 0
+        self.watermark = 0  # sync sequence number applied up to
+
+    # Writes
+    def _append(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        ids = np.fromiter((r["id"] for r in rows), dtype=np.int64, count=len(rows))
+
+        # An id seen before is an update: retire its old row
+        max_id = int(ids.max())
+        if max_id >= len(self.row_of):
+            grown = np.full(max(max_id + 1, len(self.row_of) * 2), -1, dtype=np.int64)
+            grown[:len(self.row_of)] = self.row_of
+            self.row_of = grown
+        previous = self.row_of[ids]
+        previous = previous[previous >= 0]
+        if len(previous):
+            alive = self.alive.view()
+            self.dead += int(alive[previous].sum())
+            alive[previous] = False
+
+        start = self.ids.size
+        self.ids.extend(ids)
+        self.dates.extend(np.fromiter((_day(r["date"]) for r in rows), dtype=np.int32, count=len(rows)))
+        self.amounts.extend(np.fromiter((_cents(r["amount"]) for r in rows), dtype=np.int64, count=len(rows)))
+        self.categories.extend(np.fromiter((r["category_id"] for r in rows), dtype=np.int32, count=len(rows)))
+        self.accounts.extend(np.fromiter(
+            (r["account_id"] if r["account_id"] is not None else -1 for r in rows), dtype=np.int32, count=len(rows)
+        ))
+        self.alive.extend(np.ones(len(rows), dtype=np.bool_))
+        counts = np.fromiter((len(r["tag_ids"]) for r in rows), dtype=np.int64, count=len(rows))
+        self.tag_offsets.extend(self.tag_offsets.view()[-1] + np.cumsum(counts))
+        self.tag_ids.extend(np.fromiter((t for r in rows for t in r["tag_ids"]), dtype=np.int32, count=int(counts.sum())))
+        self.row_of[ids] = np.arange(start, start + len(rows))
+
+    def _remove(self, expense_id: int):
+        if expense_id < len(self.row_of) and self.row_of[expense_id] >= 0:
+            row = self.row_of[expense_id]
+            if self.alive.view()[row]:
+                self.alive.view()[row] = False
+                self.dead += 1
+            self.row_of[expense_id] = -1
+
+    def _maybe_compact(self):
+        if self.dead < max(10_000, self.ids.size // 4):
+            return
+        alive = self.alive.view().copy()
+        offsets = self.tag_offsets.view()
+        rows = np.nonzero(alive)[0]
+        tag_rows = np.repeat(np.arange(self.ids.size), np.diff(offsets))
+        kept_tags = self.tag_ids.view()[alive[tag_rows]]
+        counts = np.diff(offsets)[rows]
+
+        columns = [self.ids.view()[rows], self.dates.view()[rows], self.amounts.view()[rows],
+                   self.categories.view()[rows], self.accounts.view()[rows]]
+        watermark, row_capacity = self.watermark, len(self.row_of)
+        self._reset()
+        self.watermark = watermark
+        self.row_of = np.full(row_capacity, -1, dtype=np.int64)
+        for target, values in zip((self.ids, self.dates, self.amounts, self.categories, self.accounts), columns):
+            target.extend(values)
+        self.alive.extend(np.ones(len(rows), dtype=np.bool_))
+        self.tag_offsets.extend(np.cumsum(counts))
+        self.tag_ids.extend(kept_tags)
+        self.row_of[self.ids.view()] = np.arange(len(rows))
+
+    def apply(self, upserts: Iterable[Dict[str, Any]] = (), deletes: Iterable[int] = ()):
+        with self._lock:
+            for expense_id in deletes:
+                self._remove(expense_id)
+            self._append(list(upserts))
+            self._maybe_compact()
+
+    def on_expense_changed(self, payload: Dict[str, Any]):
+        before, after = payload["before"], payload["after"]
+        if after is not None:
+            self.apply(upserts=[after])
+        elif before is not None:
+            self.apply(deletes=[before["id"]])
+
+    # Loading from the database
+    def _fetch(self, conn: Connection, ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        expenses = models.Expense.__table__
+        expense_tags = models.ExpenseTag.__table__
+        # One pass over expenses LEFT JOIN expense_tags ordered by id; tag rows
+        # of the same expense arrive consecutively and are folded together
+        query = select(
+            expenses.c.id, expenses.c.date, expenses.c.amount, expenses.c.category_id,
+            expenses.c.account_id, expense_tags.c.tag_id,
+        ).select_from(
+            expenses.outerjoin(expense_tags, expense_tags.c.expense_id == expenses.c.id)
+        ).order_by(expenses.c.id)
+        if ids is not None:
+            query = query.where(expenses.c.id.in_(ids))
+
+        rows: List[Dict[str, Any]] = []
+        result = conn.execution_options(stream_results=True, yield_per=LOAD_CHUNK).execute(query)
+        for r in result:
+            if rows and rows[-1]["id"] == r.id:
+                rows[-1]["tag_ids"].append(r.tag_id)
+                continue
+            rows.append({
+                "id": r.id,
+                "date": r.date,
+                "amount": r.amount,
+                "category_id": r.category_id,
+                "account_id": r.account_id,
+                "tag_ids": [r.tag_id] if r.tag_id is not None else [],
+            })
+        return rows
+
+    def load(self, engine: Engine):
+        started = time.perf_counter()
+        with engine.connect() as conn:
+            # Read first: changes committed during the load are applied again by the next poll
+            watermark = sync.current_seq(conn)
+            conn.commit()
+            rows = self._fetch(conn)
+        with self._lock:
+            self._reset()
+            self._append(rows)
+            self.watermark = watermark
+            self.ready = True
+        logger.info("Analytics engine loaded %d expenses in %.1fs", len(rows), time.perf_counter() - started)
+
+    def poll(self, engine: Engine):
+        """Apply expenses written, deleted or archived by other processes since the last poll."""
+        log = models.ChangeLog
+        with engine.connect() as conn:
+            changes = conn.execute(
+                select(log.seq, log.entity_id, log.deleted)
+                .where(log.entity == "expense", log.seq > self.watermark)
+            ).all()
+            if not changes:
+                return
+            changed = [c.entity_id for c in changes if not c.deleted]
+            rows = []
+            for i in range(0, len(changed), POLL_BATCH):
+                rows += self._fetch(conn, changed[i:i + POLL_BATCH])
+        # A row deleted after it was logged as changed is gone from rows; its tombstone comes later
+        with self._lock:
+            self.apply(upserts=rows, deletes=[c.entity_id for c in changes if c.deleted])
+            self.watermark = max(c.seq for c in changes)
+
+    # Queries
+    def summarize(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        category_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Totals in cents: ``{"total", "count", "by_category": {id: [cents, n]}, "by_tag": {...}}``."""
+        with self._lock:
+            mask = self.alive.view().copy()
+            dates = self.dates.view()
+            categories = self.categories.view()
+            amounts = self.amounts.view()
+            offsets = self.tag_offsets.view()
+            tag_ids = self.tag_ids.view()
+
+        if start_date:
+            mask &= dates >= _day(start_date)
+        if end_date:
+            mask &= dates <= _day(end_date)
+        if category_id:
+            mask &= categories == category_id
+
+        selected = amounts[mask]
+        selected_categories = categories[mask]
+        size = int(selected_categories.max()) + 1 if len(selected_categories) else 0
+        category_sums = grouped_sum(selected_categories, selected, size)
+        category_counts = np.bincount(selected_categories, minlength=size)
+
+        tag_rows = np.repeat(np.arange(len(mask)), np.diff(offsets))
+        tag_mask = mask[tag_rows]
+        selected_tags = tag_ids[tag_mask]
+        tag_size = int(selected_tags.max()) + 1 if len(selected_tags) else 0
+        tag_sums = grouped_sum(selected_tags, amounts[tag_rows[tag_mask]], tag_size)
+        tag_counts = np.bincount(selected_tags, minlength=tag_size)
+
+        return {
+            "total": int(selected.sum()),
+            "count": int(mask.sum()),
+            "by_category": {
+                int(c): [int(category_sums[c]), int(category_counts[c])] for c in np.nonzero(category_counts)[0]
+            },
+            "by_tag": {
+                int(t): [int(tag_sums[t]), int(tag_counts[t])] for t in np.nonzero(tag_counts)[0]
+            },
+        }
+
+    def expense_summary(
+        self,
+        db,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        category_id: Optional[int] = None,
+    ) -> Tuple[Decimal, int, List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """The hot-table part of ``crud.get_expense_summary``: total, count, by_category, by_tag."""
+        result = self.summarize(start_date, end_date, category_id)
+        category_names = dict(db.query(models.Category.id, models.Category.name).filter(
+            models.Category.id.in_(list(result["by_category"]))
+        ).all()) if result["by_category"] else {}
+        tag_names = dict(db.query(models.Tag.id, models.Tag.name).filter(
+            models.Tag.id.in_(list(result["by_tag"]))
+        ).all()) if result["by_tag"] else {}
+
+        by_category = [
+            {"category_id": cid, "category_name": category_names[cid], "total_amount": str(_money(cents)), "count": n}
+            for cid, (cents, n) in sorted(result["by_category"].items()) if cid in category_names
+        ]
+        by_tag = [
+            {"tag_id": tid, "tag_name": tag_names[tid], "total_amount": str(_money(cents)), "count": n}
+            for tid, (cents, n) in sorted(result["by_tag"].items()) if tid in tag_names
+        ]
+        total = _money(result["total"]) if result["count"] else Decimal("0")
+        return total, result["count"], by_category, by_tag
+
+
+engine_store = ExpenseColumnStore()
+
+
+def start(engine: Engine):
+    """Load the store in the background and keep it fresh; call once per process."""
+    events.subscribe("expense.changed", engine_store.on_expense_changed)
+
+    def run():
+        try:
+            engine_store.load(engine)
+        except Exception:
+            logger.exception("Analytics engine failed to load; falling back to SQL")
+            return
+        last_reload = time.monotonic()
+        while True:
+            time.sleep(POLL_SECONDS)
+            try:
+                if time.monotonic() - last_reload > RELOAD_SECONDS:
+                    engine_store.load(engine)
+                    last_reload = time.monotonic()
+                else:
+                    engine_store.poll(engine)
+            except Exception:
+                logger.exception("Analytics engine refresh failed")
+
+    threading.Thread(target=run, name="analytics-engine", daemon=True).start()
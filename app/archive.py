@@ -0,0 +1,323 @@
+# backend/app/archive.py
+"""Cold storage of old expenses as compressed columnar files, one per month.
+
+Each ``expenses_YYYY-MM.colz`` file holds a JSON header followed by one
+zlib-compressed block per column. Readers memory-map the file and only
+decompress the columns a query needs, so summarising a month touches a few
+hundred KB instead of the full rows.
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from . import models, sync
+from .utils.date_utils import add_months, get_month_range
+
+ARCHIVE_DIR = os.getenv("EXPENSE_ARCHIVE_DIR", "archive/expenses")
+MAGIC = b"EXPCOL1\n"
+EPOCH = date(1970, 1, 1)
+
+# Column name -> numpy dtype for the fixed-width columns
+NUMERIC_COLUMNS = {
+    "id": np.int64,
+    "date": np.int32,          # days since 1970-01-01
+    "amount": np.int64,        # cents
+    "category_id": np.int32,
+    "account_id": np.int32,    # -1 for no account
+    "tag_offsets": np.int64,   # CSR offsets into tag_ids, length rows + 1
+    "tag_ids": np.int32,
+}
+TEXT_COLUMNS = ("description", "receipt_path")
+# Archived ids are deleted in IN lists of this size
+DELETE_BATCH = 1000
+
+
+def month_path(year: int, month: int, archive_dir: str = ARCHIVE_DIR) -> str:
+    return os.path.join(archive_dir, f"expenses_{year:04d}-{month:02d}.colz")
+
+
+def archived_months(archive_dir: str = ARCHIVE_DIR) -> List[Tuple[int, int]]:
+    if not os.path.isdir(archive_dir):
+        return []
+    months = []
+    for filename in os.listdir(archive_dir):
+        if filename.startswith("expenses_") and filename.endswith(".colz"):
+            year, month = filename[len("expenses_"):-len(".colz")].split("-")
+            months.append((int(year), int(month)))
+    return sorted(months)
+
+
+def months_in_range(
+    start_date: Optional[date], end_date: Optional[date], archive_dir: str = ARCHIVE_DIR
+) -> List[Tuple[int, int]]:
+    """Archived months that overlap ``[start_date, end_date]`` (open-ended when None)."""
+    result = []
+    for year, month in archived_months(archive_dir):
+        first, last = get_month_range(year, month)
+        if (start_date is None or last >= start_date) and (end_date is None or first <= end_date):
+            result.append((year, month))
+    return result
+
+
+def _to_days(values: Iterable[date]) -> np.ndarray:
+    return np.fromiter(((d - EPOCH).days for d in values), dtype=np.int32)
+
+
+def _encode_text(values: List[Optional[str]]) -> Tuple[np.ndarray, bytes]:
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    chunks = []
+    position = 0
+    for i, value in enumerate(values):
+        if value is None:
+            offsets[i + 1] = -1 - position  # negative marks NULL, keeps the running position
+            continue
+        data = value.encode("utf-8")
+        chunks.append(data)
+        position += len(data)
+        offsets[i + 1] = position
+    return offsets, b"".join(chunks)
+
+
+def _write(path: str, columns: Dict[str, bytes], rows: int):
+    header = {"rows": rows, "columns": {}}
+    blocks = []
+    offset = 0
+    for name, raw in columns.items():
+        block = zlib.compress(raw, 6)
+        header["columns"][name] = {"offset": offset, "length": len(block)}
+        blocks.append(block)
+        offset += len(block)
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for block in blocks:
+            f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)  # atomic, readers never see a half-written month
+    _load_column.cache_clear()
+
+
+def write_month(path: str, rows: List[dict]):
+    """Write expense rows (dicts with id, date, amount, category_id, account_id, tag_ids, description, receipt_path)."""
+    rows = sorted(rows, key=lambda r: (r["date"], r["id"]))
+    tag_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    tag_ids: List[int] = []
+    for i, row in enumerate(rows):
+        tag_ids.extend(row["tag_ids"])
+        tag_offsets[i + 1] = len(tag_ids)
+
+    columns = {
+        "id": np.array([r["id"] for r in rows], dtype=np.int64).tobytes(),
+        "date": _to_days(r["date"] for r in rows).tobytes(),
+        "amount": np.array([int(Decimal(r["amount"]) * 100) for r in rows], dtype=np.int64).tobytes(),
+        "category_id": np.array([r["category_id"] for r in rows], dtype=np.int32).tobytes(),
+        "account_id": np.array([r["account_id"] if r["account_id"] is not None else -1 for r in rows], dtype=np.int32).tobytes(),
+        "tag_offsets": tag_offsets.tobytes(),
+        "tag_ids": np.array(tag_ids, dtype=np.int32).tobytes(),
+    }
+    for name in TEXT_COLUMNS:
+        offsets, data = _encode_text([r[name] for r in rows])
+        columns[f"{name}_offsets"] = offsets.tobytes()
+        columns[f"{name}_data"] = data
+    _write(path, columns, len(rows))
+
+
+@lru_cache(maxsize=256)
+def _load_column(path: str, mtime: float, name: str) -> np.ndarray:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_len = struct.unpack_from("<Q", mm, len(MAGIC))[0]
+        base = len(MAGIC) + 8
+        header = json.loads(mm[base:base + header_len])
+        info = header["columns"][name]
+        start = base + header_len + info["offset"]
+        raw = zlib.decompress(mm[start:start + info["length"]])
+    if name in NUMERIC_COLUMNS:
+        array = np.frombuffer(raw, dtype=NUMERIC_COLUMNS[name])
+    elif name.endswith("_offsets"):
+        array = np.frombuffer(raw, dtype=np.int64)
+    else:
+        array = np.frombuffer(raw, dtype=np.uint8)
+    array.flags.writeable = False
+    return array
+
+
+def read_column(path: str, name: str) -> np.ndarray:
+    return _load_column(path, os.path.getmtime(path), name)
+
+
+def read_rows(path: str) -> List[dict]:
+    """Decode every row of a month file (used when merging late rows into an archived month)."""
+    ids = read_column(path, "id")
+    dates = read_column(path, "date")
+    amounts = read_column(path, "amount")
+    categories = read_column(path, "category_id")
+    accounts = read_column(path, "account_id")
+    tag_offsets = read_column(path, "tag_offsets")
+    tag_ids = read_column(path, "tag_ids")
+    texts = {}
+    for name in TEXT_COLUMNS:
+        offsets = read_column(path, f"{name}_offsets")
+        data = read_column(path, f"{name}_data").tobytes()
+        values, position = [], 0
+        for end in offsets[1:]:
+            if end < 0:
+                values.append(None)
+                position = -1 - int(end)
+            else:
+                values.append(data[position:end].decode("utf-8"))
+                position = int(end)
+        texts[name] = values
+
+    return [
+        {
+            "id": int(ids[i]),
+            "date": date.fromordinal(EPOCH.toordinal() + int(dates[i])),
+            "amount": Decimal(int(amounts[i])).scaleb(-2),
+            "category_id": int(categories[i]),
+            "account_id": int(accounts[i]) if accounts[i] >= 0 else None,
+            "tag_ids": [int(t) for t in tag_ids[tag_offsets[i]:tag_offsets[i + 1]]],
+            "description": texts["description"][i],
+            "receipt_path": texts["receipt_path"][i],
+        }
+        for i in range(len(ids))
+    ]
+
+
+def summarize(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category_id: Optional[int] = None,
+    archive_dir: str = ARCHIVE_DIR,
+) -> dict:
+    """Totals in cents over archived months, in the shape ``crud.get_expense_summary`` merges."""
+    total, count = 0, 0
+    by_category: Dict[int, List[int]] = {}
+    by_tag: Dict[int, List[int]] = {}
+
+    for year, month in months_in_range(start_date, end_date, archive_dir):
+        path = month_path(year, month, archive_dir)
+        dates = read_column(path, "date")
+        amounts = read_column(path, "amount")
+        categories = read_column(path, "category_id")
+
+        mask = np.ones(len(dates), dtype=bool)
+        if start_date:
+            mask &= dates >= (start_date - EPOCH).days
+        if end_date:
+            mask &= dates <= (end_date - EPOCH).days
+        if category_id:
+            mask &= categories == category_id
+        if not mask.any():
+            continue
+
+        selected_amounts = amounts[mask]
+        total += int(selected_amounts.sum())
+        count += int(mask.sum())
+
+        cats, inverse = np.unique(categories[mask], return_inverse=True)
+        sums = np.bincount(inverse, weights=selected_amounts, minlength=len(cats))
+        counts = np.bincount(inverse, minlength=len(cats))
+        for cat, s, c in zip(cats.tolist(), sums, counts.tolist()):
+            entry = by_category.setdefault(cat, [0, 0])
+            entry[0] += int(round(s))
+            entry[1] += c
+
+        # Expand the CSR tag index for the selected rows
+        tag_offsets = read_column(path, "tag_offsets")
+        tag_ids = read_column(path, "tag_ids")
+        per_row = np.diff(tag_offsets)
+        row_for_tag = np.repeat(np.arange(len(dates)), per_row)
+        tag_mask = mask[row_for_tag]
+        if tag_mask.any():
+            tags, inverse = np.unique(tag_ids[tag_mask], return_inverse=True)
+            tag_amounts = amounts[row_for_tag[tag_mask]]
+            sums = np.bincount(inverse, weights=tag_amounts, minlength=len(tags))
+            counts = np.bincount(inverse, minlength=len(tags))
+            for tag, s, c in zip(tags.tolist(), sums, counts.tolist()):
+                entry = by_tag.setdefault(tag, [0, 0])
+                entry[0] += int(round(s))
+                entry[1] += c
+
+    return {"total": total, "count": count, "by_category": by_category, "by_tag": by_tag}
+
+
+def archive_before(engine: Engine, cutoff: date, archive_dir: str = ARCHIVE_DIR, dry_run: bool = False) -> List[Tuple[int, int, int]]:
+    """Move every expense dated before the month of ``cutoff`` into month files.
+
+    Returns ``(year, month, rows)`` for each month written. A month that is
+    already archived is merged with any rows that arrived since, so the
+    command can be re-run safely. The rows read are locked until they are
+    deleted, and only the ids written to the file are deleted: a row inserted
+    into or moved into the month meanwhile stays for the next run. The
+    deletes are logged as sync tombstones, which also retire the rows from
+    the analytics engine of every worker.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = cutoff.replace(day=1)
+    results = []
+
+    expenses = models.Expense.__table__
+    expense_tags = models.ExpenseTag.__table__
+
+    with engine.connect() as conn:
+        months = conn.execute(
+            select(expenses.c.date).where(expenses.c.date < cutoff).distinct()
+        ).scalars().all()
+    month_starts = sorted({d.replace(day=1) for d in months})
+
+    for month_start in month_starts:
+        month_end = add_months(month_start, 1)
+        in_month = (expenses.c.date >= month_start) & (expenses.c.date < month_end)
+        with engine.begin() as conn:
+            rows = [dict(r._mapping) for r in conn.execute(select(
+                expenses.c.id, expenses.c.date, expenses.c.amount, expenses.c.category_id,
+                expenses.c.account_id, expenses.c.description, expenses.c.receipt_path
+            ).where(in_month).with_for_update())]
+            if not rows:
+                continue
+            ids = [row["id"] for row in rows]
+            batches = [ids[i:i + DELETE_BATCH] for i in range(0, len(ids), DELETE_BATCH)]
+            tags: Dict[int, List[int]] = {}
+            for batch in batches:
+                for expense_id, tag_id in conn.execute(
+                    select(expense_tags.c.expense_id, expense_tags.c.tag_id)
+                    .where(expense_tags.c.expense_id.in_(batch))
+                    .order_by(expense_tags.c.tag_id)
+                ):
+                    tags.setdefault(expense_id, []).append(tag_id)
+            for row in rows:
+                row["tag_ids"] = tags.get(row["id"], [])
+
+            results.append((month_start.year, month_start.month, len(rows)))
+            if dry_run:
+                continue
+
+            path = month_path(month_start.year, month_start.month, archive_dir)
+            if os.path.exists(path):
+                archived_ids = {r["id"] for r in rows}
+                rows += [r for r in read_rows(path) if r["id"] not in archived_ids]
+            write_month(path, rows)
+
+            # The file is durable before the hot rows go away
+            for batch in batches:
+                conn.execute(expense_tags.delete().where(expense_tags.c.expense_id.in_(batch)))
+                conn.execute(expenses.delete().where(expenses.c.id.in_(batch)))
+            # Not a delete for sync clients: they may keep the history the server moved to cold storage
+            sync.record_connection(conn, "expense", ids, deleted=True, archived=True)
+
+    return results
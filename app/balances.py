@@ -0,0 +1,201 @@
+# backend/app/balances.py
+"""Account balances backed by monthly closing-balance snapshots.
+
+A balance is ``initial_balance`` minus every expense booked on the account.
+``account_balance_snapshots`` keeps, per account and month with expenses,
+the month's spend and the closing balance at its end. Expense writes adjust
+the snapshots in the same transaction, so a lookup is the latest snapshot
+before the month of ``as_of`` plus the spend since the start of that month.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import models
+
+Snapshot = models.AccountBalanceSnapshot
+Expense = models.Expense
+ZERO = Decimal("0.00")
+
+
+def _month(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _initial_balance(db: Session, account_id: int) -> Decimal:
+    value = db.execute(select(models.Account.initial_balance).where(models.Account.id == account_id)).scalar()
+    return Decimal(value or 0)
+
+
+def apply_spend(db: Session, account_id: int, day: date, delta: Decimal):
+    """Book ``delta`` of extra spend on ``day``: that month and every later snapshot move by it."""
+    month = _month(day)
+    # One statement for the month and every later one; only the month itself changes its spend
+    touched = month in db.execute(
+        update(Snapshot)
+        .where(Snapshot.account_id == account_id, Snapshot.month >= month)
+        .values(
+            spent=case((Snapshot.month == month, Snapshot.spent + delta), else_=Snapshot.spent),
+            closing_balance=Snapshot.closing_balance - delta,
+        )
+        .returning(Snapshot.month)
+    ).scalars().all()
+    if not touched:
+        # First expense in this month: open from the previous closing balance
+        previous = db.execute(
+            select(Snapshot.closing_balance)
+            .where(Snapshot.account_id == account_id, Snapshot.month < month)
+            .order_by(Snapshot.month.desc())
+            .limit(1)
+        ).scalar()
+        opening = Decimal(previous) if previous is not None else _initial_balance(db, account_id)
+        row = {"account_id": account_id, "month": month, "spent": delta, "closing_balance": opening - delta}
+        dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(db.get_bind().dialect.name)
+        if dialect is None:
+            db.execute(insert(Snapshot).values(**row))
+            return
+        # A concurrent first expense of the month may insert the row first; add to it then
+        statement = dialect.insert(Snapshot).values(**row)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["account_id", "month"],
+            set_={
+                "spent": Snapshot.spent + statement.excluded.spent,
+                "closing_balance": Snapshot.closing_balance - statement.excluded.spent,
+                "updated_at": func.now(),
+            },
+        ))
+
+
+def apply_expense_change(db: Session, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    """Adjust snapshots for an expense write given its before/after snapshots (see crud)."""
+    if before and after and all(before[k] == after[k] for k in ("account_id", "date", "amount")):
+        return
+    if before and before["account_id"]:
+        apply_spend(db, before["account_id"], before["date"], -Decimal(before["amount"]))
+    if after and after["account_id"]:
+        apply_spend(db, after["account_id"], after["date"], Decimal(after["amount"]))
+
+
+def apply_initial_balance_change(db: Session, account_id: int, difference: Decimal):
+    if difference:
+        db.execute(
+            update(Snapshot)
+            .where(Snapshot.account_id == account_id)
+            .values(closing_balance=Snapshot.closing_balance + difference)
+        )
+
+
+def balance_as_of(db: Session, account: models.Account, as_of: date) -> Dict[str, Any]:
+    month = _month(as_of)
+    snapshot = db.execute(
+        select(Snapshot.month, Snapshot.closing_balance)
+        .where(Snapshot.account_id == account.id, Snapshot.month < month)
+        .order_by(Snapshot.month.desc())
+        .limit(1)
+    ).first()
+    opening = Decimal(snapshot.closing_balance) if snapshot else Decimal(account.initial_balance or 0)
+    spent = db.execute(
+        select(func.coalesce(func.sum(Expense.amount), 0))
+        .where(Expense.account_id == account.id, Expense.date >= month, Expense.date <= as_of)
+    ).scalar()
+    return {
+        "account_id": account.id,
+        "name": account.name,
+        "as_of": as_of.isoformat(),
+        "balance": str(opening - Decimal(spent)),
+    }
+
+
+def balances_as_of(db: Session, accounts: List[models.Account], as_of: date) -> List[Dict[str, Any]]:
+    """Balances of many accounts with one snapshot query and one delta query."""
+    month = _month(as_of)
+    ids = [account.id for account in accounts]
+    latest = (
+        select(Snapshot.account_id, func.max(Snapshot.month).label("month"))
+        .where(Snapshot.account_id.in_(ids), Snapshot.month < month)
+        .group_by(Snapshot.account_id)
+        .subquery()
+    )
+    closing = dict(db.execute(
+        select(Snapshot.account_id, Snapshot.closing_balance)
+        .join(latest, (Snapshot.account_id == latest.c.account_id) & (Snapshot.month == latest.c.month))
+    ).all())
+    spent = dict(db.execute(
+        select(Expense.account_id, func.sum(Expense.amount))
+        .where(Expense.account_id.in_(ids), Expense.date >= month, Expense.date <= as_of)
+        .group_by(Expense.account_id)
+    ).all())
+    result = []
+    for account in accounts:
+        opening = closing.get(account.id, account.initial_balance or 0)
+        result.append({
+            "account_id": account.id,
+            "name": account.name,
+            "as_of": as_of.isoformat(),
+            "balance": str(Decimal(opening) - Decimal(spent.get(account.id, 0))),
+        })
+    return result
+
+
+def history(db: Session, account: models.Account, start: date, end: date) -> Dict[str, Any]:
+    """Daily balance series between ``start`` and ``end`` (days with expenses only).
+
+    The running total is computed by the database with SUM(...) OVER, on top
+    of the opening balance read from the snapshots.
+    """
+    opening = Decimal(balance_as_of(db, account, start - timedelta(days=1))["balance"])
+    daily = func.sum(Expense.amount)
+    rows = db.execute(
+        select(Expense.date, daily.label("spent"), func.sum(daily).over(order_by=Expense.date).label("cumulative"))
+        .where(Expense.account_id == account.id, Expense.date >= start, Expense.date <= end)
+        .group_by(Expense.date)
+        .order_by(Expense.date)
+    ).all()
+    return {
+        "account_id": account.id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "opening_balance": str(opening),
+        "closing_balance": str(opening - Decimal(rows[-1].cumulative)) if rows else str(opening),
+        "items": [
+            {"date": row.date.isoformat(), "spent": str(Decimal(row.spent)), "balance": str(opening - Decimal(row.cumulative))}
+            for row in rows
+        ],
+    }
+
+
+def rebuild(conn: Connection, account_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute snapshots from the expenses table; returns the number of snapshot rows."""
+    accounts = select(models.Account.id, models.Account.initial_balance)
+    if account_ids is not None:
+        account_ids = list(account_ids)
+        accounts = accounts.where(models.Account.id.in_(account_ids))
+    initial = {account_id: Decimal(balance or 0) for account_id, balance in conn.execute(accounts)}
+
+    clear = delete(Snapshot)
+    daily = select(Expense.account_id, Expense.date, func.sum(Expense.amount)).where(Expense.account_id.isnot(None))
+    if account_ids is not None:
+        clear = clear.where(Snapshot.account_id.in_(account_ids))
+        daily = daily.where(Expense.account_id.in_(account_ids))
+    conn.execute(clear)
+
+    rows: List[Dict[str, Any]] = []
+    for account_id, day, amount in conn.execute(
+        daily.group_by(Expense.account_id, Expense.date).order_by(Expense.account_id, Expense.date)
+    ):
+        if account_id not in initial:
+            continue
+        month = _month(day)
+        if not rows or rows[-1]["account_id"] != account_id or rows[-1]["month"] != month:
+            opening = rows[-1]["closing_balance"] if rows and rows[-1]["account_id"] == account_id else initial[account_id]
+            rows.append({"account_id": account_id, "month": month, "spent": ZERO, "closing_balance": opening})
+        rows[-1]["spent"] += Decimal(amount)
+        rows[-1]["closing_balance"] -= Decimal(amount)
+    if rows:
+        conn.execute(insert(Snapshot), rows)
+    return len(rows)
@@ -0,0 +1,178 @@
+# backend/app/batch.py
+"""Run a list of crud operations in one session and one database transaction.
+
+The session is bound to a connection whose transaction is owned here and
+joins it with ``create_savepoint``: every ``db.commit()`` inside crud only
+releases a SAVEPOINT and every ``db.rollback()`` only undoes the current
+operation. Atomic batches commit or roll back the outer transaction as a
+whole; otherwise each operation keeps its own outcome. Change events are
+held until the outer transaction commits, so listeners never see writes
+of a batch that was rolled back, and the session bypasses the reference
+cache so it never caches rows the batch may still roll back.
+
+Operations may name the id they create with ``ref`` and later ones use it
+as ``{"$ref": name}`` anywhere in their ``id`` or ``data``.
+"""
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import crud, events, refcache, schemas, sync
+
+MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "500"))
+
+
+class Resource(NamedTuple):
+    create: Callable
+    update: Callable
+    delete: Callable
+    create_schema: Type[BaseModel]
+    update_schema: Type[BaseModel]
+    schema: Type[BaseModel]
+
+
+RESOURCES: Dict[str, Resource] = {
+    "category": Resource(
+        crud.create_category, crud.update_category, crud.delete_category,
+        schemas.CategoryCreate, schemas.CategoryUpdate, schemas.Category
+    ),
+    "tag": Resource(crud.create_tag, crud.update_tag, crud.delete_tag, schemas.TagCreate, schemas.TagUpdate, schemas.Tag),
+    "account": Resource(
+        crud.create_account, crud.update_account, crud.delete_account,
+        schemas.AccountCreate, schemas.AccountUpdate, schemas.Account
+    ),
+    "expense": Resource(
+        crud.create_expense, crud.update_expense, crud.delete_expense,
+        schemas.ExpenseCreate, schemas.ExpenseUpdate, schemas.Expense
+    ),
+    "budget": Resource(
+        crud.create_budget, crud.update_budget, crud.delete_budget,
+        schemas.BudgetCreate, schemas.BudgetUpdate, schemas.Budget
+    ),
+    "recurring": Resource(
+        crud.create_recurring_expense, crud.update_recurring_expense, crud.delete_recurring_expense,
+        schemas.RecurringExpenseCreate, schemas.RecurringExpenseUpdate, schemas.RecurringExpense
+    ),
+}
+ACTIONS = ("create", "update", "delete")
+
+
+class OperationError(Exception):
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def parse_op(name: str) -> Tuple[str, Resource]:
+    action, _, resource = name.partition("_")
+    if action not in ACTIONS or resource not in RESOURCES:
+        raise OperationError(400, f"Unknown operation {name!r}")
+    return action, RESOURCES[resource]
+
+
+def resolve_refs(value: Any, refs: Dict[str, int]) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {"$ref"}:
+            name = value["$ref"]
+            if name not in refs:
+                raise OperationError(400, f"Unknown reference {name!r}")
+            return refs[name]
+        return {key: resolve_refs(item, refs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_refs(item, refs) for item in value]
+    return value
+
+
+def _execute(db: Session, operation: schemas.BatchOperation, refs: Dict[str, int]) -> Tuple[int, Any]:
+    """Run one operation; returns (status code, serialized data)."""
+    action, resource = parse_op(operation.op)
+    data = resolve_refs(operation.data or {}, refs)
+    target = resolve_refs(operation.id, refs)
+    if action != "create" and not isinstance(target, int):
+        raise OperationError(400, f"{operation.op} needs an integer id")
+    if operation.dedupe is not None and (operation.op != "create_expense" or operation.dedupe not in ("skip", "flag")):
+        raise OperationError(400, "dedupe is only supported as skip or flag on create_expense")
+
+    try:
+        if action == "delete":
+            return 200, resource.delete(db, target)
+        if action == "update":
+            result = resource.update(db, target, resource.update_schema.model_validate(data))
+            return 200, resource.schema.from_orm(result).model_dump(mode="json")
+        payload = resource.create_schema.model_validate(data)
+    except ValidationError as exc:
+        raise OperationError(422, exc.errors(include_url=False, include_context=False))
+
+    status_code = 201
+    if operation.dedupe:
+        result, skipped = crud.create_expense_deduped(db, payload, operation.dedupe)
+        status_code = 200 if skipped else 201
+    else:
+        result = resource.create(db, payload)
+    if operation.ref:
+        refs[operation.ref] = result.id
+    return status_code, resource.schema.from_orm(result).model_dump(mode="json")
+
+
+def run(engine: Engine, operations: List[schemas.BatchOperation], atomic: bool = True) -> Dict[str, Any]:
+    refs: Dict[str, int] = {}
+    results: List[Dict[str, Any]] = []
+    held: List[Tuple[str, Dict[str, Any]]] = []
+    held_changes: Dict[Tuple[str, int], bool] = {}
+    failed: Optional[Dict[str, Any]] = None
+
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        if conn.dialect.name == "sqlite":
+            # pysqlite defers BEGIN until the first write, which would turn the
+            # first SAVEPOINT into the outer transaction; start it explicitly
+            conn.exec_driver_sql("BEGIN")
+        db = Session(bind=conn, join_transaction_mode="create_savepoint", autoflush=False)
+        db.info["hold_events"] = True
+        db.info["bypass_refcache"] = True
+        db.info["hold_sync"] = True
+        try:
+            for index, operation in enumerate(operations):
+                result = {"index": index, "op": operation.op, "ref": operation.ref}
+                try:
+                    result["status"], result["data"] = _execute(db, operation, refs)
+                    # Events and sync changes of this operation survive later per-operation rollbacks
+                    held.extend(db.info.pop("pending_events", []))
+                    held_changes.update(db.info.pop("sync_changes", {}))
+                except (OperationError, HTTPException) as exc:
+                    db.rollback()
+                    result["status"], result["error"] = exc.status_code, exc.detail
+                except IntegrityError as exc:
+                    db.rollback()
+                    result["status"], result["error"] = 400, f"Database constraint violation: {exc.orig}"
+                results.append(result)
+                if "error" in result and atomic:
+                    failed = result
+                    break
+        finally:
+            db.close()
+
+        if failed is None:
+            # Logged last, so the sync counter is the last lock the batch takes
+            sync.write(conn, held_changes)
+            transaction.commit()
+            for topic, payload in held:
+                events.publish(topic, payload)
+        else:
+            transaction.rollback()
+            refcache.invalidate()
+
+    return {
+        "atomic": atomic,
+        "committed": failed is None,
+        "succeeded": sum(1 for result in results if "error" not in result) if failed is None else 0,
+        "failed": sum(1 for result in results if "error" in result),
+        "results": results,
+        "refs": refs if failed is None else {},
+    }
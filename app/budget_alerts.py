@@ -0,0 +1,295 @@
+# backend/app/budget_alerts.py
+"""Budget threshold alerts, evaluated as expenses are written.
+
+``budget_spend`` keeps the running spend per category and month. Every
+expense write moves the affected row by the write's amount, in the same
+transaction, and compares the spend before and after it with the month's
+budget: each threshold (a percent of ``Budget.amount``) crossed upwards
+is recorded once in ``budget_alerts``. No write ever re-sums a month.
+
+``budget_alerts`` doubles as an outbox. With ``BUDGET_ALERT_WEBHOOK_URL``
+set, a background task POSTs pending alerts in batches and retries
+failures with exponential backoff; batches are leased, so several
+workers can deliver side by side. Without a webhook the alerts stay
+pending for ``GET /budgets/alerts``.
+"""
+import asyncio
+import json
+import logging
+import os
+import urllib.request
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from . import events, models
+from .database import engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLDS = [int(p) for p in os.getenv("BUDGET_ALERT_THRESHOLDS", "50,80,100").split(",") if p.strip()]
+WEBHOOK_URL = os.getenv("BUDGET_ALERT_WEBHOOK_URL")
+WEBHOOK_TIMEOUT = float(os.getenv("BUDGET_ALERT_WEBHOOK_TIMEOUT", "10"))
+BATCH_SIZE = int(os.getenv("BUDGET_ALERT_BATCH_SIZE", "100"))
+MAX_ATTEMPTS = int(os.getenv("BUDGET_ALERT_MAX_ATTEMPTS", "8"))
+RETRY_SECONDS = float(os.getenv("BUDGET_ALERT_RETRY_SECONDS", "30"))
+MAX_RETRY_SECONDS = 3600.0
+POLL_SECONDS = float(os.getenv("BUDGET_ALERT_POLL_SECONDS", "30"))
+# A claimed batch not settled within this time is picked up again
+LEASE_SECONDS = WEBHOOK_TIMEOUT * 3
+
+Spend = models.BudgetSpend
+Alert = models.BudgetAlert
+Expense = models.Expense
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def parse_thresholds(value: Optional[str]) -> List[int]:
+    if value is None:
+        return DEFAULT_THRESHOLDS
+    return [int(p) for p in value.split(",") if p]
+
+
+def format_thresholds(values: Optional[Iterable[int]]) -> Optional[str]:
+    return None if values is None else ",".join(str(v) for v in sorted(set(values)))
+
+
+# Running totals and evaluation
+
+def apply_spend(db: Session, category_id: int, day: date, delta: Decimal):
+    """Book ``delta`` of spend in the month of ``day`` and record thresholds it crosses."""
+    month = day.replace(day=1)
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(db.get_bind().dialect.name)
+    if dialect is None:
+        spent = db.execute(
+            update(Spend)
+            .where(Spend.category_id == category_id, Spend.month == month)
+            .values(spent=Spend.spent + delta)
+            .returning(Spend.spent)
+        ).scalar()
+        if spent is None:
+            db.execute(insert(Spend).values(category_id=category_id, month=month, spent=delta))
+            spent = delta
+    else:
+        # One statement, so a concurrent first write of the month adds to the row instead of colliding
+        statement = dialect.insert(Spend).values(category_id=category_id, month=month, spent=delta)
+        spent = db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["category_id", "month"],
+                set_={"spent": Spend.spent + statement.excluded.spent, "updated_at": func.now()},
+            ).returning(Spend.spent)
+        ).scalar()
+    if delta > 0:
+        _evaluate(db, category_id, month, Decimal(spent) - delta, Decimal(spent))
+
+
+def apply_expense_change(db: Session, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    """Adjust running totals for an expense write given its before/after snapshots (see crud)."""
+    if before and after and all(before[k] == after[k] for k in ("category_id", "date", "amount")):
+        return
+    if before:
+        apply_spend(db, before["category_id"], before["date"], -Decimal(before["amount"]))
+    if after:
+        apply_spend(db, after["category_id"], after["date"], Decimal(after["amount"]))
+
+
+def check_budget(db: Session, budget: models.Budget):
+    """Evaluate a created or changed budget against the month's spend so far."""
+    check_budgets(db, [budget])
+
+
+def check_budgets(db: Session, budgets: List[Any]):
+    """``check_budget`` for many budgets (rows or models) with one spend query."""
+    if not budgets:
+        return
+    months = {date(budget.year, budget.month, 1) for budget in budgets}
+    spend = {
+        (row.category_id, row.month): row.spent
+        for row in db.execute(
+            select(Spend.category_id, Spend.month, Spend.spent)
+            .where(Spend.category_id.in_({budget.category_id for budget in budgets}), Spend.month.in_(months))
+        )
+    }
+    for budget in budgets:
+        spent = spend.get((budget.category_id, date(budget.year, budget.month, 1)))
+        if spent:
+            _record(db, budget.id, budget.category_id, budget.year, budget.month, Decimal(budget.amount),
+                    parse_thresholds(budget.thresholds), Decimal(0), Decimal(spent))
+
+
+def _evaluate(db: Session, category_id: int, month: date, before: Decimal, after: Decimal):
+    budget = db.execute(
+        select(models.Budget.id, models.Budget.amount, models.Budget.thresholds)
+        .where(models.Budget.category_id == category_id, models.Budget.year == month.year, models.Budget.month == month.month)
+    ).first()
+    if budget is not None:
+        _record(db, budget.id, category_id, month.year, month.month, Decimal(budget.amount),
+                parse_thresholds(budget.thresholds), before, after)
+
+
+def _record(db: Session, budget_id: int, category_id: int, year: int, month: int, amount: Decimal,
+            thresholds: List[int], before: Decimal, after: Decimal):
+    crossed = [t for t in thresholds if before * 100 < t * amount <= after * 100]
+    if not crossed:
+        return
+    now = _now()
+    rows = [{
+        "budget_id": budget_id, "category_id": category_id, "year": year, "month": month,
+        "threshold": threshold, "spent": after, "budget_amount": amount,
+        "status": "pending", "attempts": 0, "next_attempt_at": now,
+    } for threshold in crossed]
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(db.get_bind().dialect.name)
+    if dialect is None:
+        recorded = set(db.execute(
+            select(Alert.threshold).where(Alert.budget_id == budget_id, Alert.threshold.in_(crossed))
+        ).scalars())
+        rows = [row for row in rows if row["threshold"] not in recorded]
+        if rows:
+            db.execute(insert(Alert), rows)
+        inserted = [row["threshold"] for row in rows]
+    else:
+        # A threshold alerts once per budget, however often spend moves across it
+        inserted = db.execute(
+            dialect.insert(Alert).on_conflict_do_nothing(index_elements=["budget_id", "threshold"]).returning(Alert.threshold),
+            rows
+        ).scalars().all()
+    if inserted:
+        events.publish_after_commit(db, "budget.alert", {
+            "budget_id": budget_id, "category_id": category_id, "year": year, "month": month,
+            "thresholds": sorted(inserted), "spent": after, "budget_amount": amount,
+        })
+
+
+def rebuild(conn: Connection) -> int:
+    """Recompute running totals from the expenses table; returns the number of rows."""
+    conn.execute(delete(Spend))
+    totals: Dict[tuple, Decimal] = {}
+    for category_id, day, amount in conn.execute(
+        select(Expense.category_id, Expense.date, func.sum(Expense.amount)).group_by(Expense.category_id, Expense.date)
+    ):
+        key = (category_id, day.replace(day=1))
+        totals[key] = totals.get(key, Decimal(0)) + Decimal(amount)
+    rows = [{"category_id": category_id, "month": month, "spent": spent} for (category_id, month), spent in totals.items()]
+    if rows:
+        conn.execute(insert(Spend), rows)
+    return len(rows)
+
+
+# Delivery
+
+def _serialize(row) -> Dict[str, Any]:
+    return {
+        "id": row.id, "budget_id": row.budget_id, "category_id": row.category_id,
+        "year": row.year, "month": row.month, "threshold": row.threshold,
+        "spent": str(row.spent), "budget_amount": str(row.budget_amount),
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+def _post(url: str, alerts: List[Dict[str, Any]]):
+    request = urllib.request.Request(
+        url, data=json.dumps({"alerts": alerts}).encode(), headers={"content-type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT) as response:
+        response.read()
+
+
+def _claim(engine: Engine, limit: int) -> List[Any]:
+    now = _now()
+    with engine.begin() as conn:
+        rows = conn.execute(
+            select(Alert.__table__)
+            .where(Alert.status == "pending", Alert.next_attempt_at <= now)
+            .order_by(Alert.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if rows:
+            conn.execute(
+                update(Alert)
+                .where(Alert.id.in_([row.id for row in rows]))
+                .values(next_attempt_at=now + timedelta(seconds=LEASE_SECONDS))
+            )
+    return rows
+
+
+def deliver_once(engine: Engine = default_engine, url: Optional[str] = None, batch_size: int = BATCH_SIZE) -> int:
+    """POST one batch of due alerts; returns the number delivered."""
+    url = url or WEBHOOK_URL
+    rows = _claim(engine, batch_size)
+    if not rows:
+        return 0
+    ids = [row.id for row in rows]
+    try:
+        _post(url, [_serialize(row) for row in rows])
+    except Exception as exc:
+        # All alerts of a batch share its attempts, so the backoff is the same for all
+        attempts = max(row.attempts for row in rows) + 1
+        delay = min(RETRY_SECONDS * 2 ** (attempts - 1), MAX_RETRY_SECONDS)
+        with engine.begin() as conn:
+            conn.execute(update(Alert).where(Alert.id.in_(ids)).values(
+                attempts=attempts,
+                status="failed" if attempts >= MAX_ATTEMPTS else "pending",
+                next_attempt_at=_now() + timedelta(seconds=delay),
+                last_error=str(exc)[:1000],
+            ))
+        logger.warning("Budget alert webhook failed (attempt %d): %s", attempts, exc)
+        return 0
+    with engine.begin() as conn:
+        conn.execute(update(Alert).where(Alert.id.in_(ids)).values(
+            status="delivered", attempts=Alert.attempts + 1, delivered_at=_now(), last_error=None
+        ))
+    return len(rows)
+
+
+_task: Optional[asyncio.Task] = None
+_wake: Optional[asyncio.Event] = None
+
+
+def _on_alert(payload: Dict[str, Any]):
+    # Runs in the committing thread; wake the deliverer without waiting for the poll
+    if _task is not None and _wake is not None:
+        _task.get_loop().call_soon_threadsafe(_wake.set)
+
+
+async def run_deliverer(engine: Engine = default_engine):
+    while True:
+        _wake.clear()
+        try:
+            while await asyncio.to_thread(deliver_once, engine) == BATCH_SIZE:
+                pass
+        except Exception:
+            logger.exception("Budget alert delivery failed")
+        try:
+            await asyncio.wait_for(_wake.wait(), POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start(engine: Engine = default_engine):
+    """Start webhook delivery on the running event loop; no-op without a webhook URL."""
+    global _task, _wake
+    if _task is None and WEBHOOK_URL:
+        _wake = asyncio.Event()
+        _task = asyncio.get_running_loop().create_task(run_deliverer(engine), name="budget-alert-delivery")
+        events.subscribe("budget.alert", _on_alert)
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        events.unsubscribe("budget.alert", _on_alert)
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
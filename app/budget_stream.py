@@ -0,0 +1,405 @@
+# backend/app/budget_stream.py
+"""Live budget status for dashboards over server-sent events.
+
+The status of a month is loaded once, when its first client connects, and
+then kept current from ``expense.changed`` events: every committed write
+becomes a spend delta for the (month, category) it touched, and clients
+receive only the categories whose spend changed. Budget and category
+changes, which are rare, reload the affected months instead.
+
+Deltas travel through a ``Channel``. The default delivers them within the
+process; with ``BUDGET_STREAM_CHANNEL=postgres`` they go through
+LISTEN/NOTIFY so every worker sees writes made by the others.
+
+Connected clients hold no queue and no timer of their own: each month has
+one ``asyncio.Event`` that is swapped and set on every change (and by a
+single heartbeat task), and a client reads whatever changed since the
+version it last sent.
+"""
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from collections import defaultdict, deque
+from decimal import Decimal
+from typing import Any, AsyncIterator, Callable, Deque, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select as sql_select
+from sqlalchemy.engine import Engine
+
+from . import events, models
+from .database import engine as default_engine
+from .utils.date_utils import get_month_range
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = os.getenv("BUDGET_STREAM_CHANNEL", "local")  # local or postgres
+HEARTBEAT_SECONDS = float(os.getenv("BUDGET_STREAM_HEARTBEAT_SECONDS", "15"))
+# Changes remembered per month; a client further behind gets a fresh snapshot
+BACKLOG = 256
+NOTIFY_CHANNEL = "budget_stream"
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_BYTES = 7000
+
+Month = Tuple[int, int]
+Message = Dict[str, Any]
+
+
+# Channels
+
+class Channel:
+    """Carries messages from the worker that committed a write to every worker."""
+
+    def start(self, deliver: Callable[[List[Message]], None]):
+        self.deliver = deliver
+
+    def publish(self, messages: List[Message]):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class LocalChannel(Channel):
+    """Single process: messages are delivered directly."""
+
+    def publish(self, messages: List[Message]):
+        self.deliver(messages)
+
+
+class PostgresChannel(Channel):
+    """Fans messages out to all workers with NOTIFY; a thread per process LISTENs."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, deliver: Callable[[List[Message]], None]):
+        super().start(deliver)
+        self._thread = threading.Thread(target=self._listen, name="budget-stream-listen", daemon=True)
+        self._thread.start()
+
+    def publish(self, messages: List[Message]):
+        payloads, batch = [], []
+        for message in messages:
+            batch.append(message)
+            if len(json.dumps(batch)) > NOTIFY_MAX_BYTES:
+                payloads.append(json.dumps(batch[:-1]))
+                batch = [message]
+        payloads.append(json.dumps(batch))
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for payload in payloads:
+                conn.exec_driver_sql("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, payload))
+
+    def _listen(self):
+        while not self._stopping.is_set():
+            try:
+                connection = self.engine.raw_connection()
+                # Autocommit and LISTEN must never reach a request session: take the
+                # connection out of the pool so close() really closes it
+                connection.detach()
+                try:
+                    dbapi = connection.driver_connection
+                    dbapi.autocommit = True
+                    dbapi.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    # Anything sent while not listening is lost; start every month afresh
+                    self.deliver([{"kind": "reload"}])
+                    while not self._stopping.is_set():
+                        if select.select([dbapi], [], [], 1.0)[0]:
+                            dbapi.poll()
+                            while dbapi.notifies:
+                                self.deliver(json.loads(dbapi.notifies.pop(0).payload))
+                finally:
+                    connection.close()
+            except Exception:
+                logger.exception("Budget stream listener failed; reconnecting")
+                self._stopping.wait(1.0)
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+# Month state
+
+def _load(engine: Engine, year: int, month: int) -> Tuple[Dict[int, Tuple[str, Decimal]], Dict[int, Decimal]]:
+    """(budgets by category as (name, amount), spend by category) for one month."""
+    month_start, month_end = get_month_range(year, month)
+    Budget, Category, Expense = models.Budget, models.Category, models.Expense
+    with engine.connect() as conn:
+        budgets = {
+            row.category_id: (row.name, Decimal(row.amount))
+            for row in conn.execute(
+                sql_select(Budget.category_id, Category.name, Budget.amount)
+                .join(Category, Budget.category_id == Category.id)
+                .where(Budget.year == year, Budget.month == month)
+            )
+        }
+        spent = {
+            row.category_id: Decimal(row.total)
+            for row in conn.execute(
+                sql_select(Expense.category_id, func.sum(Expense.amount).label("total"))
+                .where(Expense.date >= month_start, Expense.date <= month_end)
+                .group_by(Expense.category_id)
+            )
+        }
+    return budgets, spent
+
+
+def _percent(spent: Decimal, budget: Decimal) -> float:
+    return float(spent) / float(budget) * 100 if budget > 0 else 0
+
+
+class MonthState:
+    def __init__(self, year: int, month: int):
+        self.year = year
+        self.month = month
+        self.budgets: Dict[int, Tuple[str, Decimal]] = {}
+        self.spent: Dict[int, Decimal] = defaultdict(Decimal)
+        self.version = 0
+        # Clients behind this version need a snapshot (the month was reloaded)
+        self.reset_version = 0
+        self.changes: Deque[Tuple[int, FrozenSet[int]]] = deque(maxlen=BACKLOG)
+        self.changed = asyncio.Event()
+        self.ready = asyncio.Event()
+        self.loading = False
+        self.stale = False
+        self.clients = 0
+
+    def wake(self):
+        event, self.changed = self.changed, asyncio.Event()
+        event.set()
+
+    def apply_spend(self, category_id: int, delta: Decimal):
+        self.spent[category_id] += delta
+        self.version += 1
+        self.changes.append((self.version, frozenset([category_id])))
+        self.wake()
+
+    def replace(self, budgets: Dict[int, Tuple[str, Decimal]], spent: Dict[int, Decimal]):
+        self.budgets = budgets
+        self.spent = defaultdict(Decimal, spent)
+        self.version += 1
+        self.reset_version = self.version
+        self.changes.clear()
+        self.ready.set()
+        self.wake()
+
+    def changed_since(self, version: int) -> Optional[Set[int]]:
+        """Categories changed after ``version``; None when a snapshot is needed."""
+        if version < self.reset_version or (self.changes and self.changes[0][0] > version + 1):
+            return None
+        return set().union(*(categories for changed_at, categories in self.changes if changed_at > version))
+
+    def _category(self, category_id: int) -> Dict[str, Any]:
+        name, budget = self.budgets[category_id]
+        spent = self.spent.get(category_id, Decimal(0))
+        return {
+            "category_id": category_id,
+            "category_name": name,
+            "budget_amount": str(budget),
+            "total_spent": str(spent),
+            "percent": _percent(spent, budget),
+        }
+
+    def _summary(self) -> Dict[str, Any]:
+        total_budget = sum((budget for _, budget in self.budgets.values()), Decimal(0))
+        total_spent = sum(self.spent.values(), Decimal(0))
+        return {"total_budget": str(total_budget), "total_spent": str(total_spent), "percent": _percent(total_spent, total_budget)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "year": self.year,
+            "month": self.month,
+            "summary": self._summary(),
+            "categories": [self._category(category_id) for category_id in sorted(self.budgets)],
+        }
+
+    def delta(self, categories: Set[int]) -> Dict[str, Any]:
+        return {
+            "year": self.year,
+            "month": self.month,
+            "summary": self._summary(),
+            "categories": [self._category(category_id) for category_id in sorted(categories) if category_id in self.budgets],
+        }
+
+
+# Hub
+
+class Hub:
+    """Month states watched by clients of this process; lives on the event loop."""
+
+    def __init__(self, engine: Engine, channel: Channel):
+        self.engine = engine
+        self.channel = channel
+        self.months: Dict[Month, MonthState] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.channel.start(self.deliver)
+        self._heartbeat = self.loop.create_task(self._beat(), name="budget-stream-heartbeat")
+        events.subscribe("expense.changed", self.on_expense_changed)
+        events.subscribe("budget.changed", self.on_budget_changed)
+        events.subscribe("category.changed", self.on_category_changed)
+
+    async def stop(self):
+        events.unsubscribe("expense.changed", self.on_expense_changed)
+        events.unsubscribe("budget.changed", self.on_budget_changed)
+        events.unsubscribe("category.changed", self.on_category_changed)
+        self.channel.stop()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+
+    # Event handlers run in the thread that committed the write
+
+    def on_expense_changed(self, payload: Dict[str, Any]):
+        deltas: Dict[Tuple[int, int, Optional[int]], Decimal] = defaultdict(Decimal)
+        for side, sign in (("before", -1), ("after", 1)):
+            row = payload.get(side)
+            if row:
+                deltas[(row["date"].year, row["date"].month, row["category_id"])] += sign * Decimal(row["amount"])
+        messages = [
+            {"kind": "spend", "year": year, "month": month, "category_id": category_id, "delta": str(delta)}
+            for (year, month, category_id), delta in deltas.items() if delta
+        ]
+        if messages:
+            self.channel.publish(messages)
+
+    def on_budget_changed(self, payload: Dict[str, Any]):
+        months = {(row["year"], row["month"]) for row in (payload.get("before"), payload.get("after")) if row}
+        self.channel.publish([{"kind": "reload", "year": year, "month": month} for year, month in months])
+
+    def on_category_changed(self, payload: Dict[str, Any]):
+        # Names change and deleted categories take their expenses along
+        self.channel.publish([{"kind": "reload"}])
+
+    def deliver(self, messages: List[Message]):
+        """Called from any thread; applies the messages on the event loop."""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._apply, messages)
+
+    # Event loop side
+
+    def _apply(self, messages: List[Message]):
+        for message in messages:
+            if message["kind"] == "reload":
+                if message.get("year") is None:
+                    targets = list(self.months.values())
+                else:
+                    targets = [state] if (state := self.months.get((message["year"], message["month"]))) else []
+                for state in targets:
+                    self._refresh(state)
+                continue
+            state = self.months.get((message["year"], message["month"]))
+            if state is None:
+                continue
+            if state.loading:
+                # The load in progress may or may not include this write
+                state.stale = True
+                continue
+            state.apply_spend(message["category_id"], Decimal(message["delta"]))
+
+    def _refresh(self, state: MonthState):
+        if state.loading:
+            state.stale = True
+            return
+        state.loading = True
+        self.loop.create_task(self._reload(state))
+
+    async def _reload(self, state: MonthState):
+        try:
+            while True:
+                state.stale = False
+                budgets, spent = await asyncio.to_thread(_load, self.engine, state.year, state.month)
+                if not state.stale:
+                    break
+            state.replace(budgets, spent)
+        except Exception:
+            logger.exception("Loading budget status for %d-%02d failed", state.year, state.month)
+            if not state.ready.is_set():
+                self.months.pop((state.year, state.month), None)
+                state.wake()
+        finally:
+            state.loading = False
+
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            for state in self.months.values():
+                state.wake()
+
+    async def join(self, year: int, month: int) -> MonthState:
+        state = self.months.get((year, month))
+        if state is None:
+            state = self.months[(year, month)] = MonthState(year, month)
+            self._refresh(state)
+        state.clients += 1
+        return state
+
+    def leave(self, state: MonthState):
+        state.clients -= 1
+        # Unwatched months are dropped rather than kept current
+        if state.clients <= 0 and self.months.get((state.year, state.month)) is state:
+            del self.months[(state.year, state.month)]
+
+
+_hub: Optional[Hub] = None
+
+
+def _event(name: str, data: Dict[str, Any], event_id: int) -> str:
+    return f"event: {name}\nid: {event_id}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream(year: int, month: int) -> AsyncIterator[str]:
+    """SSE frames for one client: a snapshot, then a delta after every change."""
+    state = await _hub.join(year, month)
+    try:
+        while not state.ready.is_set():
+            waiter = state.changed
+            if _hub.months.get((year, month)) is not state:
+                yield _event("error", {"detail": "Budget status could not be loaded"}, 0)
+                return
+            await waiter.wait()
+        version = state.version
+        yield _event("snapshot", state.snapshot(), version)
+        while True:
+            waiter = state.changed
+            if state.version == version:
+                await waiter.wait()
+                if state.version == version:
+                    yield ": keep-alive\n\n"
+                    continue
+            categories = state.changed_since(version)
+            version = state.version
+            if categories is None:
+                yield _event("snapshot", state.snapshot(), version)
+            else:
+                yield _event("delta", state.delta(categories), version)
+    finally:
+        _hub.leave(state)
+
+
+def start(engine: Engine = default_engine):
+    """Start the hub on the running event loop; call once per process."""
+    global _hub
+    if _hub is None:
+        channel = PostgresChannel(engine) if CHANNEL == "postgres" else LocalChannel()
+        _hub = Hub(engine, channel)
+        _hub.start()
+
+
+async def stop():
+    global _hub
+    if _hub is not None:
+        await _hub.stop()
+        _hub = None
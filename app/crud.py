@@ -1,12 +1,17 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, extract
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, extract, insert, select, update
 from sqlalchemy.exc import IntegrityError
-from typing import List, Optional, Dict, Any
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import List, Optional, Dict, Any, BinaryIO, Mapping
 from datetime import date, datetime, timedelta
+import time
 from fastapi import HTTPException
+from pydantic import ValidationError
 from decimal import Decimal
 
-from . import models, schemas
+from . import models, schemas, archive, events, analytics, balances, search, suggest, refcache, duplicates, imports, receipts, sync, budget_alerts, metrics
+from .utils.date_utils import get_month_range
+from .utils.recurrence import compile_rule
 
 # Category CRUD operations
 def get_category(db: Session, category_id: int):
@@ -15,10 +20,23 @@ def get_category(db: Session, category_id: int):
 def get_categories(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Category).offset(skip).limit(limit).all()
 
+# Tag and category writes are published for the in-memory indexes built on them
+def _named_snapshot(db_item) -> Dict[str, Any]:
+    return {"id": db_item.id, "name": db_item.name}
+
+def _record_named_change(db: Session, topic: str, before: Optional[Dict[str, Any]], after):
+    refcache.bump(db, "categories" if topic == "category.changed" else "tags")
+    events.publish_after_commit(db, topic, {"before": before, "after": _named_snapshot(after) if after is not None else None})
+
+def list_categories(db: Session, skip: int = 0, limit: int = 100):
+    return refcache.rows(db, "categories", skip, limit)
+
 def create_category(db: Session, category: schemas.CategoryCreate):
     db_category = models.Category(**category.dict())
     db.add(db_category)
     try:
+        db.flush()
+        _record_named_change(db, "category.changed", None, db_category)
         db.commit()
         db.refresh(db_category)
         return db_category
@@ -31,11 +49,13 @@ def update_category(db: Session, category_id: int, category: schemas.CategoryUpd
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
 
+    before = _named_snapshot(db_category)
     update_data = category.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_category, key, value)
 
     try:
+        _record_named_change(db, "category.changed", before, db_category)
         db.commit()
         db.refresh(db_category)
         return db_category
@@ -48,18 +68,54 @@ def delete_category(db: Session, category_id: int):
     if not db_category:
         raise HTTPException(status_code=404, detail="Category not found")
 
+    _record_named_change(db, "category.changed", _named_snapshot(db_category), None)
+    # The ORM cascade deletes the category's expenses without crud's bookkeeping
+    _record_cascaded_expense_deletes(db, models.Expense.category_id == category_id)
     db.delete(db_category)
     db.commit()
     return {"message": "Category deleted successfully"}
 
+def suggest_categories(db: Session, prefix: str, limit: int = 10):
+    suggest.ensure_loaded(db.get_bind())
+    return suggest.categories.suggest(prefix, limit)
+
+def get_duplicate_expenses(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    account_id: Optional[int] = None,
+    window_days: int = duplicates.WINDOW_DAYS,
+    limit: int = 100
+):
+    return duplicates.report(db, start_date, end_date, account_id, window_days, limit)
+
 # Expense CRUD operations
 def get_expense(db: Session, expense_id: int):
+    # Tags are loaded by key: SQLite answers a LIMITed row joined to
+    # (expense_tags JOIN tags) by materializing the whole tag join
     return db.query(models.Expense).options(
         joinedload(models.Expense.category),
         joinedload(models.Expense.account),
-        joinedload(models.Expense.tags)
+        selectinload(models.Expense.tags)
     ).filter(models.Expense.id == expense_id).first()
 
+def _expense_filters(
+    category_id: Optional[int] = None,
+    account_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> list:
+    filters = []
+    if category_id:
+        filters.append(models.Expense.category_id == category_id)
+    if account_id:
+        filters.append(models.Expense.account_id == account_id)
+    if start_date:
+        filters.append(models.Expense.date >= start_date)
+    if end_date:
+        filters.append(models.Expense.date <= end_date)
+    return filters
+
 def get_expenses(
     db: Session, 
     skip: int = 0, 
@@ -73,31 +129,67 @@ def get_expenses(
         joinedload(models.Expense.category),
         joinedload(models.Expense.account),
         joinedload(models.Expense.tags)
-    )
-
-    if category_id:
-        query = query.filter(models.Expense.category_id == category_id)
-    if account_id:
-        query = query.filter(models.Expense.account_id == account_id)
-    if start_date:
-        query = query.filter(models.Expense.date >= start_date)
-    if end_date:
-        query = query.filter(models.Expense.date <= end_date)
+    ).filter(*_expense_filters(category_id, account_id, start_date, end_date))
 
     return query.order_by(models.Expense.date.desc()).offset(skip).limit(limit).all()
 
+def search_expenses(
+    db: Session,
+    q: str,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[int] = None,
+    account_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    """Expenses matching ``q`` in their description, best match first, with rank and highlight."""
+    hits = search.search(db, q, _expense_filters(category_id, account_id, start_date, end_date), skip, limit)
+    if not hits:
+        return []
+    expenses = {e.id: e for e in db.query(models.Expense).options(
+        joinedload(models.Expense.category),
+        joinedload(models.Expense.account),
+        joinedload(models.Expense.tags)
+    ).filter(models.Expense.id.in_([expense_id for expense_id, _, _ in hits])).all()}
+    return [(expenses[expense_id], rank, snippet) for expense_id, rank, snippet in hits if expense_id in expenses]
+
 def create_expense(db: Session, expense: schemas.ExpenseCreate):
+    return _insert_expense(db, expense)
+
+def create_expense_deduped(db: Session, expense: schemas.ExpenseCreate, dedupe: str):
+    """Create an expense unless it duplicates an existing one; returns ``(expense, skipped)``.
+
+    With ``dedupe="skip"`` a duplicate is not created and ``(existing, True)`` is
+    returned; with ``"flag"`` it is created with ``duplicate_of_id`` set.
+    """
+    _check_expense_refs(db, expense)
+    duplicate_id = duplicates.find_duplicate(
+        db, expense.date, expense.amount, expense.account_id, expense.description
+    )
+    if duplicate_id is not None and dedupe == "skip":
+        return get_expense(db, duplicate_id), True
+    return _insert_expense(db, expense, duplicate_id), False
+
+def _check_expense_refs(db: Session, expense: schemas.ExpenseCreate):
     # Verify category_id exists
-    if not get_category(db, expense.category_id):
+    if not refcache.exists(db, "categories", expense.category_id):
         raise HTTPException(status_code=400, detail="Category not found")
 
     # Verify account_id if provided
-    if expense.account_id and not get_account(db, expense.account_id):
+    if expense.account_id and not refcache.exists(db, "accounts", expense.account_id):
         raise HTTPException(status_code=400, detail="Account not found")
 
+def _insert_expense(db: Session, expense: schemas.ExpenseCreate, duplicate_of_id: Optional[int] = None):
+    _check_expense_refs(db, expense)
+
     # Extract tag_ids for many-to-many relationship handling
     tag_ids = expense.tag_ids or []
     expense_data = expense.dict(exclude={"tag_ids"})
+    expense_data["fingerprint"] = duplicates.fingerprint(
+        expense.date, expense.amount, expense.account_id, expense.description
+    )
+    expense_data["duplicate_of_id"] = duplicate_of_id
 
     db_expense = models.Expense(**expense_data)
     db.add(db_expense)
@@ -107,9 +199,11 @@ def create_expense(db: Session, expense: schemas.ExpenseCreate):
     if tag_ids:
         _add_tags_to_expense(db, db_expense.id, tag_ids)
 
+    snapshot = _expense_snapshot(db_expense, tag_ids)
+    _record_expense_change(db, None, snapshot)
     db.commit()
-    db.refresh(db_expense)
-    return db_expense
+    # Two queries (expense with category and account, then tags) instead of a refresh plus a lazy load each
+    return get_expense(db, snapshot["id"])
 
 def update_expense(db: Session, expense_id: int, expense: schemas.ExpenseUpdate):
     db_expense = get_expense(db, expense_id)
@@ -117,11 +211,11 @@ def update_expense(db: Session, expense_id: int, expense: schemas.ExpenseUpdate)
         raise HTTPException(status_code=404, detail="Expense not found")
 
     # Verify category_id if provided
-    if expense.category_id and not get_category(db, expense.category_id):
+    if expense.category_id and not refcache.exists(db, "categories", expense.category_id):
         raise HTTPException(status_code=400, detail="Category not found")
 
     # Verify account_id if provided
-    if expense.account_id is not None and expense.account_id != 0 and not get_account(db, expense.account_id):
+    if expense.account_id is not None and expense.account_id != 0 and not refcache.exists(db, "accounts", expense.account_id):
         raise HTTPException(status_code=400, detail="Account not found")
 
     # Handle tag updates if provided
@@ -129,10 +223,15 @@ def update_expense(db: Session, expense_id: int, expense: schemas.ExpenseUpdate)
     if hasattr(expense, "tag_ids"):
         tag_ids = expense.tag_ids
 
+    before = _expense_snapshot(db_expense, [tag.id for tag in db_expense.tags])
+
     # Update expense fields
     update_data = expense.dict(exclude={"tag_ids"}, exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_expense, key, value)
+    db_expense.fingerprint = duplicates.fingerprint(
+        db_expense.date, db_expense.amount, db_expense.account_id, db_expense.description
+    )
 
     # Update tags if provided
     if tag_ids is not None:
@@ -141,7 +240,10 @@ def update_expense(db: Session, expense_id: int, expense: schemas.ExpenseUpdate)
         # Add new tags
         if tag_ids:
             _add_tags_to_expense(db, expense_id, tag_ids)
+        # The bulk delete above bypasses the unit of work
+        sync.record(db, "expense", [expense_id])
 
+    _record_expense_change(db, before, _expense_snapshot(db_expense, tag_ids if tag_ids is not None else before["tag_ids"]))
     db.commit()
     db.refresh(db_expense)
     return db_expense
@@ -151,15 +253,97 @@ def delete_expense(db: Session, expense_id: int):
     if not db_expense:
         raise HTTPException(status_code=404, detail="Expense not found")
 
+    _record_expense_change(db, _expense_snapshot(db_expense, [tag.id for tag in db_expense.tags]), None)
     db.delete(db_expense)
     db.commit()
     return {"message": "Expense deleted successfully"}
 
+def set_expense_receipt(db: Session, expense_id: int, source: BinaryIO):
+    db_expense = get_expense(db, expense_id)
+    if not db_expense:
+        raise HTTPException(status_code=404, detail="Expense not found")
+    try:
+        key, content_type, size = receipts.store(source)
+    except receipts.ReceiptError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+
+    db_expense.receipt_path = key
+    db.commit()
+    db.refresh(db_expense)
+    # Derived images are rendered off the request path
+    receipts.schedule_thumbnail(key)
+    return db_expense
+
+def get_expense_receipt(db: Session, expense_id: int, headers: Mapping[str, str], thumbnail: bool = False):
+    receipt_path = db.query(models.Expense.receipt_path).filter(models.Expense.id == expense_id).scalar()
+    if not receipt_path:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    try:
+        return receipts.response(receipt_path, headers, thumbnail=thumbnail)
+    except receipts.ReceiptError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
+
+# Helpers to describe an expense write to listeners (analytics, caches, ...)
+def _expense_snapshot(db_expense: models.Expense, tag_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    return {
+        "id": db_expense.id,
+        "date": db_expense.date,
+        "amount": Decimal(db_expense.amount),
+        "category_id": db_expense.category_id,
+        "account_id": db_expense.account_id,
+        "tag_ids": list(tag_ids or []),
+    }
+
+def _record_expense_change(db: Session, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    # Balance snapshots and budget running totals move in the same transaction as the expense itself
+    balances.apply_expense_change(db, before, after)
+    budget_alerts.apply_expense_change(db, before, after)
+    events.publish_after_commit(db, "expense.changed", {"before": before, "after": after})
+
+def _record_cascaded_expense_deletes(db: Session, condition):
+    """``_record_expense_change`` for the expenses a category or account delete cascades to.
+
+    Running totals move by one summed delta per (category, month) and
+    (account, month) rather than per expense; events go out per expense.
+    """
+    rows = db.query(
+        models.Expense.id, models.Expense.date, models.Expense.amount,
+        models.Expense.category_id, models.Expense.account_id
+    ).filter(condition).all()
+    if not rows:
+        return
+    tag_ids: Dict[int, List[int]] = {}
+    for expense_id, tag_id in db.query(models.ExpenseTag.expense_id, models.ExpenseTag.tag_id).filter(
+        models.ExpenseTag.expense_id.in_(db.query(models.Expense.id).filter(condition))
+    ):
+        tag_ids.setdefault(expense_id, []).append(tag_id)
+
+    category_spend: Dict[tuple, Decimal] = {}
+    account_spend: Dict[tuple, Decimal] = {}
+    for row in rows:
+        month = row.date.replace(day=1)
+        category_spend[(row.category_id, month)] = category_spend.get((row.category_id, month), Decimal(0)) + Decimal(row.amount)
+        if row.account_id:
+            account_spend[(row.account_id, month)] = account_spend.get((row.account_id, month), Decimal(0)) + Decimal(row.amount)
+    for (category_id, month), total in category_spend.items():
+        budget_alerts.apply_spend(db, category_id, month, -total)
+    for (account_id, month), total in account_spend.items():
+        balances.apply_spend(db, account_id, month, -total)
+    for row in rows:
+        events.publish_after_commit(db, "expense.changed", {"before": {
+            "id": row.id,
+            "date": row.date,
+            "amount": Decimal(row.amount),
+            "category_id": row.category_id,
+            "account_id": row.account_id,
+            "tag_ids": tag_ids.get(row.id, []),
+        }, "after": None})
+
 # Helper function to add tags to an expense
 def _add_tags_to_expense(db: Session, expense_id: int, tag_ids: List[int]):
     for tag_id in tag_ids:
         # Verify tag exists
-        if not get_tag(db, tag_id):
+        if not refcache.exists(db, "tags", tag_id):
             raise HTTPException(status_code=400, detail=f"Tag with id {tag_id} not found")
         # Add the relationship
         db_expense_tag = models.ExpenseTag(expense_id=expense_id, tag_id=tag_id)
@@ -176,9 +360,22 @@ def get_budgets(db: Session, skip: int = 0, limit: int = 100):
         joinedload(models.Budget.category)
     ).offset(skip).limit(limit).all()
 
+# Budget writes are published like expense writes so derived views can refresh
+def _budget_snapshot(db_budget: models.Budget) -> Dict[str, Any]:
+    return {
+        "id": db_budget.id,
+        "category_id": db_budget.category_id,
+        "year": db_budget.year,
+        "month": db_budget.month,
+        "amount": Decimal(db_budget.amount),
+    }
+
+def _record_budget_change(db: Session, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    events.publish_after_commit(db, "budget.changed", {"before": before, "after": after})
+
 def create_budget(db: Session, budget: schemas.BudgetCreate):
     # Verify category exists
-    if not get_category(db, budget.category_id):
+    if not refcache.exists(db, "categories", budget.category_id):
         raise HTTPException(status_code=400, detail="Category not found")
 
     # Check for existing budget for this category/year/month
@@ -194,8 +391,13 @@ def create_budget(db: Session, budget: schemas.BudgetCreate):
             detail=f"Budget for category_id {budget.category_id} for {budget.year}-{budget.month} already exists"
         )
 
-    db_budget = models.Budget(**budget.dict())
+    data = budget.dict()
+    data["thresholds"] = budget_alerts.format_thresholds(data["thresholds"])
+    db_budget = models.Budget(**data)
     db.add(db_budget)
+    db.flush()
+    budget_alerts.check_budget(db, db_budget)
+    _record_budget_change(db, None, _budget_snapshot(db_budget))
     db.commit()
     db.refresh(db_budget)
     return db_budget
@@ -206,7 +408,7 @@ def update_budget(db: Session, budget_id: int, budget: schemas.BudgetUpdate):
         raise HTTPException(status_code=404, detail="Budget not found")
 
     # Verify category if changing
-    if budget.category_id and not get_category(db, budget.category_id):
+    if budget.category_id and not refcache.exists(db, "categories", budget.category_id):
         raise HTTPException(status_code=400, detail="Category not found")
 
     # Check if update would create a duplicate
@@ -234,9 +436,15 @@ def update_budget(db: Session, budget_id: int, budget: schemas.BudgetUpdate):
             )
 
     # Update budget fields
+    before = _budget_snapshot(db_budget)
+    if "thresholds" in update_data:
+        update_data["thresholds"] = budget_alerts.format_thresholds(update_data["thresholds"])
     for key, value in update_data.items():
         setattr(db_budget, key, value)
+    db.flush()
+    budget_alerts.check_budget(db, db_budget)
 
+    _record_budget_change(db, before, _budget_snapshot(db_budget))
     db.commit()
     db.refresh(db_budget)
     return db_budget
@@ -246,66 +454,254 @@ def delete_budget(db: Session, budget_id: int):
     if not db_budget:
         raise HTTPException(status_code=404, detail="Budget not found")
 
+    _record_budget_change(db, _budget_snapshot(db_budget), None)
     db.delete(db_budget)
     db.commit()
     return {"message": "Budget deleted successfully"}
 
-def get_budget_status(db: Session, year: int, month: int):
-    # Get all budgets for the specified month and year
-    budgets = db.query(
-        models.Budget,
-        models.Category.name.label("category_name")
-    ).join(
-        models.Category,
-        models.Budget.category_id == models.Category.id
-    ).filter(
-        models.Budget.year == year,
-        models.Budget.month == month
+def upsert_budgets(db: Session, rows: List[Dict[str, Any]], on_conflict: str = "skip"):
+    """Write many budgets in one INSERT ... ON CONFLICT on uq_budget_cat_month and commit.
+
+    ``rows`` hold category_id, year, month, amount and thresholds (stored form).
+    Existing budgets are left alone (``skip``) or get the new amount and
+    thresholds (``update``). Returns the created, updated and skipped counts.
+    """
+    keys = [(row["category_id"], row["year"], row["month"]) for row in rows]
+    if len(set(keys)) != len(keys):
+        raise HTTPException(status_code=400, detail="Each category may appear once per month")
+
+    category_ids = {row["category_id"] for row in rows}
+    found = set(db.execute(select(models.Category.id).where(models.Category.id.in_(category_ids))).scalars())
+    if category_ids - found:
+        raise HTTPException(status_code=400, detail=f"Categories not found: {sorted(category_ids - found)}")
+
+    # Budgets already there, for the counts and the change events
+    month_index = models.Budget.year * 12 + models.Budget.month
+    wanted = set(keys)
+    existing = {
+        (budget.category_id, budget.year, budget.month): budget
+        for budget in db.execute(
+            select(models.Budget.id, models.Budget.category_id, models.Budget.year, models.Budget.month, models.Budget.amount)
+            .where(
+                models.Budget.category_id.in_(category_ids),
+                month_index.between(min(y * 12 + m for _, y, m in keys), max(y * 12 + m for _, y, m in keys))
+            )
+        )
+        if (budget.category_id, budget.year, budget.month) in wanted
+    }
+
+    table = models.Budget.__table__
+    returning = (table.c.id, table.c.category_id, table.c.year, table.c.month, table.c.amount, table.c.thresholds)
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(db.get_bind().dialect.name)
+    if dialect is not None:
+        statement = dialect.insert(table)
+        if on_conflict == "update":
+            statement = statement.on_conflict_do_update(
+                index_elements=["category_id", "year", "month"],
+                set_={"amount": statement.excluded.amount, "thresholds": statement.excluded.thresholds, "updated_at": func.now()}
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=["category_id", "year", "month"])
+        written = db.execute(statement.returning(*returning), rows).all()
+    else:
+        new_rows = [row for row, key in zip(rows, keys) if key not in existing]
+        written = db.execute(insert(table).returning(*returning), new_rows).all() if new_rows else []
+        if on_conflict == "update":
+            for row, key in zip(rows, keys):
+                if key in existing:
+                    db.execute(update(table).where(table.c.id == existing[key].id).values(
+                        amount=row["amount"], thresholds=row["thresholds"], updated_at=func.now()
+                    ))
+            written += db.execute(
+                select(*returning).where(table.c.id.in_([budget.id for budget in existing.values()]))
+            ).all()
+
+    sync.record(db, "budget", [budget.id for budget in written])
+    budget_alerts.check_budgets(db, written)
+    for budget in written:
+        before = existing.get((budget.category_id, budget.year, budget.month))
+        _record_budget_change(db, _budget_snapshot(before) if before else None, _budget_snapshot(budget))
+    db.commit()
+
+    updated = sum(1 for budget in written if (budget.category_id, budget.year, budget.month) in existing)
+    return {"created": len(written) - updated, "updated": updated, "skipped": len(rows) - len(written)}
+
+def create_budgets(db: Session, bulk: schemas.BudgetBulkCreate):
+    return upsert_budgets(db, [{
+        **budget.dict(),
+        "thresholds": budget_alerts.format_thresholds(budget.thresholds)
+    } for budget in bulk.budgets], bulk.on_conflict)
+
+def copy_budgets(db: Session, source: tuple, first: tuple, last: tuple):
+    """Copy the budgets of month ``source`` to every month from ``first`` to ``last``; existing ones are kept."""
+    budgets = db.execute(
+        select(models.Budget.category_id, models.Budget.amount, models.Budget.thresholds)
+        .where(models.Budget.year == source[0], models.Budget.month == source[1])
     ).all()
+    rows = []
+    for index in range(first[0] * 12 + first[1] - 1, last[0] * 12 + last[1]):
+        year, month = divmod(index, 12)
+        rows.extend({
+            "category_id": budget.category_id,
+            "year": year,
+            "month": month + 1,
+            "amount": budget.amount,
+            "thresholds": budget.thresholds
+        } for budget in budgets)
+    if not rows:
+        return {"created": 0, "updated": 0, "skipped": 0}
+    return upsert_budgets(db, rows)
+
+def get_budget_alerts(db: Session, status: Optional[str] = None, year: Optional[int] = None,
+                      month: Optional[int] = None, skip: int = 0, limit: int = 100):
+    query = db.query(models.BudgetAlert)
+    if status:
+        query = query.filter(models.BudgetAlert.status == status)
+    if year:
+        query = query.filter(models.BudgetAlert.year == year)
+    if month:
+        query = query.filter(models.BudgetAlert.month == month)
+    return query.order_by(models.BudgetAlert.id.desc()).offset(skip).limit(limit).all()
+
+def _percent(spent: Decimal, budget: Decimal) -> float:
+    return float(spent) / float(budget) * 100 if budget > 0 else 0
+
+def get_budget_stats(db: Session, start: tuple, end: tuple, rollover: bool = False):
+    """Budget versus spend for every month from ``start`` to ``end`` ((year, month), inclusive).
+
+    Spend comes from one query grouped by month and category over the whole
+    date range, budgets from one query over the range. With ``rollover``, the
+    unspent part of a category's budget is added to its next budget
+    (overspending does not carry over). The carry is computed from the first
+    budgeted month, before ``start`` if need be, and survives months without
+    a budget, whose spend draws it down.
+    """
+    first, last = start[0] * 12 + start[1] - 1, end[0] * 12 + end[1] - 1
+    month_index = models.Budget.year * 12 + models.Budget.month - 1
+    # Months before ``start`` are only walked to work out the carry into it
+    history = first
+    if rollover:
+        earliest = db.query(func.min(month_index)).filter(month_index < first).scalar()
+        if earliest is not None:
+            history = earliest
+    range_start, _ = get_month_range(history // 12, history % 12 + 1)
+    _, range_end = get_month_range(*end)
+
+    budgets: Dict[tuple, list] = {}
+    for budget, category_name in db.query(models.Budget, models.Category.name).join(
+        models.Category, models.Budget.category_id == models.Category.id
+    ).filter(
+        month_index.between(history, last)
+    ):
+        budgets.setdefault((budget.year, budget.month), []).append((budget.category_id, category_name, Decimal(budget.amount)))
+
+    # Filter on a plain date range so the date index (and partition pruning) applies
+    expense_year = extract("year", models.Expense.date)
+    expense_month = extract("month", models.Expense.date)
+    spent = {
+        (int(year), int(month), category_id): Decimal(total)
+        for year, month, category_id, total in db.query(
+            expense_year, expense_month, models.Expense.category_id, func.sum(models.Expense.amount)
+        ).filter(
+            models.Expense.date >= range_start,
+            models.Expense.date <= range_end
+        ).group_by(expense_year, expense_month, models.Expense.category_id)
+    }
+
+    # Unbudgeted categories count towards the month totals too
+    spent_by_month: Dict[tuple, Decimal] = {}
+    for (year, month, _), total in spent.items():
+        spent_by_month[(year, month)] = spent_by_month.get((year, month), Decimal(0)) + total
+
+    months = []
+    carry: Dict[int, Decimal] = {}
+    totals: Dict[int, Dict[str, Any]] = {}
+    range_budget = range_spent = Decimal(0)
+    for index in range(history, last + 1):
+        year, month = divmod(index, 12)
+        month += 1
+        month_budgets = sorted(budgets.get((year, month), []))
+        rolled = carry
+        if rollover:
+            amounts = {category_id: amount for category_id, _, amount in month_budgets}
+            carry = {
+                category_id: max(
+                    amounts.get(category_id, Decimal(0)) + rolled.get(category_id, Decimal(0))
+                    - spent.get((year, month, category_id), Decimal(0)),
+                    Decimal("0.00")
+                )
+                for category_id in amounts.keys() | rolled.keys()
+            }
+        if index < first:
+            continue
+        month_spent = spent_by_month.get((year, month), Decimal(0))
+        month_budget = Decimal(0)
+        categories = []
+        for category_id, category_name, amount in month_budgets:
+            category_spent = spent.get((year, month, category_id), Decimal(0))
+            rolled_amount = rolled.get(category_id, Decimal("0.00"))
+            available = amount + rolled_amount
+            month_budget += amount
+            categories.append({
+                "category_id": category_id,
+                "category_name": category_name,
+                "budget_amount": str(amount),
+                "rollover": str(rolled_amount),
+                "available": str(available),
+                "total_spent": str(category_spent),
+                "percent": _percent(category_spent, available)
+            })
+            total = totals.setdefault(category_id, {
+                "category_id": category_id, "category_name": category_name, "budget": Decimal(0), "spent": Decimal(0)
+            })
+            total["budget"] += amount
+            total["spent"] += category_spent
+        range_budget += month_budget
+        range_spent += month_spent
+        months.append({
+            "year": year,
+            "month": month,
+            "summary": {
+                "total_budget": str(month_budget),
+                "total_spent": str(month_spent),
+                "percent": _percent(month_spent, month_budget)
+            },
+            "categories": categories
+        })
 
-    # Calculate overall total budget for the month/year
-    total_budget_overall = db.query(func.sum(models.Budget.amount)).filter(
-        models.Budget.year == year,
-        models.Budget.month == month
-    ).scalar() or 0
-
-    # Calculate total expenses for the specified month and year across all categories
-    total_spent_overall = db.query(func.sum(models.Expense.amount)).filter(
-        extract('year', models.Expense.date) == year,
-        extract('month', models.Expense.date) == month
-    ).scalar() or 0
-
-    # Calculate overall percentage spent
-    overall_percent = (float(total_spent_overall) / float(total_budget_overall)) * 100 if total_budget_overall > 0 else 0
-
-    # For each budget, calculate how much has been spent
-    categories_status = []
-    for budget, category_name in budgets:
-        # Calculate total spent for this category in this month/year
-        total_spent = db.query(func.sum(models.Expense.amount)).filter(
-            models.Expense.category_id == budget.category_id,
-            extract('year', models.Expense.date) == year,
-            extract('month', models.Expense.date) == month
-        ).scalar() or 0
-
-        # Calculate percentage spent
-        percent = (float(total_spent) / float(budget.amount)) * 100 if budget.amount > 0 else 0
-
-        # Add to result
-        categories_status.append(schemas.BudgetStatus(\
-            category_id=budget.category_id,\
-            category_name=category_name,\
-            budget_amount=str(budget.amount),\
-            total_spent=str(total_spent),\
-            percent=percent\
-        ))
-
-    return {\
-        "summary": {\
-            "total_budget": str(total_budget_overall),\
-            "percent": overall_percent\
-        },\
-        "categories": categories_status\
+    return {
+        "start": f"{start[0]:04d}-{start[1]:02d}",
+        "end": f"{end[0]:04d}-{end[1]:02d}",
+        "rollover": rollover,
+        "months": months,
+        "totals": {
+            "total_budget": str(range_budget),
+            "total_spent": str(range_spent),
+            "percent": _percent(range_spent, range_budget),
+            "categories": [{
+                "category_id": total["category_id"],
+                "category_name": total["category_name"],
+                "budget_amount": str(total["budget"]),
+                "total_spent": str(total["spent"]),
+                "percent": _percent(total["spent"], total["budget"])
+            } for total in sorted(totals.values(), key=lambda t: t["category_id"])]
+        }
+    }
+
+def get_budget_status(db: Session, year: int, month: int):
+    stats = get_budget_stats(db, (year, month), (year, month))["months"][0]
+    return {
+        "summary": {
+            "total_budget": stats["summary"]["total_budget"],
+            "percent": stats["summary"]["percent"]
+        },
+        "categories": [schemas.BudgetStatus(
+            category_id=c["category_id"],
+            category_name=c["category_name"],
+            budget_amount=c["budget_amount"],
+            total_spent=c["total_spent"],
+            percent=c["percent"]
+        ) for c in stats["categories"]]
     }
 
 # Account CRUD operations
@@ -315,10 +711,14 @@ def get_account(db: Session, account_id: int):
 def get_accounts(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Account).offset(skip).limit(limit).all()
 
+def list_accounts(db: Session, skip: int = 0, limit: int = 100):
+    return refcache.rows(db, "accounts", skip, limit)
+
 def create_account(db: Session, account: schemas.AccountCreate):
     db_account = models.Account(**account.dict())
     db.add(db_account)
     try:
+        refcache.bump(db, "accounts")
         db.commit()
         db.refresh(db_account)
         return db_account
@@ -332,10 +732,15 @@ def update_account(db: Session, account_id: int, account: schemas.AccountUpdate)
         raise HTTPException(status_code=404, detail="Account not found")
 
     update_data = account.dict(exclude_unset=True)
+    if "initial_balance" in update_data:
+        balances.apply_initial_balance_change(
+            db, account_id, Decimal(update_data["initial_balance"] or 0) - Decimal(db_account.initial_balance or 0)
+        )
     for key, value in update_data.items():
         setattr(db_account, key, value)
 
     try:
+        refcache.bump(db, "accounts")
         db.commit()
         db.refresh(db_account)
         return db_account
@@ -348,10 +753,30 @@ def delete_account(db: Session, account_id: int):
     if not db_account:
         raise HTTPException(status_code=404, detail="Account not found")
 
+    _record_cascaded_expense_deletes(db, models.Expense.account_id == account_id)
+    db.query(models.AccountBalanceSnapshot).filter(
+        models.AccountBalanceSnapshot.account_id == account_id
+    ).delete(synchronize_session=False)
+    refcache.bump(db, "accounts")
     db.delete(db_account)
     db.commit()
     return {"message": "Account deleted successfully"}
 
+def get_account_balance(db: Session, account_id: int, as_of: Optional[date] = None):
+    db_account = get_account(db, account_id)
+    if not db_account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    return balances.balance_as_of(db, db_account, as_of or date.today())
+
+def get_account_balances(db: Session, as_of: Optional[date] = None):
+    return balances.balances_as_of(db, db.query(models.Account).order_by(models.Account.id).all(), as_of or date.today())
+
+def get_account_balance_history(db: Session, account_id: int, start_date: date, end_date: date):
+    db_account = get_account(db, account_id)
+    if not db_account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    return balances.history(db, db_account, start_date, end_date)
+
 # Tag CRUD operations
 def get_tag(db: Session, tag_id: int):
     return db.query(models.Tag).filter(models.Tag.id == tag_id).first()
@@ -359,10 +784,15 @@ def get_tag(db: Session, tag_id: int):
 def get_tags(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Tag).offset(skip).limit(limit).all()
 
+def list_tags(db: Session, skip: int = 0, limit: int = 100):
+    return refcache.rows(db, "tags", skip, limit)
+
 def create_tag(db: Session, tag: schemas.TagCreate):
     db_tag = models.Tag(**tag.dict())
     db.add(db_tag)
     try:
+        db.flush()
+        _record_named_change(db, "tag.changed", None, db_tag)
         db.commit()
         db.refresh(db_tag)
         return db_tag
@@ -375,11 +805,13 @@ def update_tag(db: Session, tag_id: int, tag: schemas.TagUpdate):
     if not db_tag:
         raise HTTPException(status_code=404, detail="Tag not found")
 
+    before = _named_snapshot(db_tag)
     update_data = tag.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_tag, key, value)
 
     try:
+        _record_named_change(db, "tag.changed", before, db_tag)
         db.commit()
         db.refresh(db_tag)
         return db_tag
@@ -387,11 +819,16 @@ def update_tag(db: Session, tag_id: int, tag: schemas.TagUpdate):
         db.rollback()
         raise HTTPException(status_code=400, detail="Tag with this name already exists")
 
+def suggest_tags(db: Session, prefix: str, limit: int = 10):
+    suggest.ensure_loaded(db.get_bind())
+    return suggest.tags.suggest(prefix, limit)
+
 def delete_tag(db: Session, tag_id: int):
     db_tag = get_tag(db, tag_id)
     if not db_tag:
         raise HTTPException(status_code=404, detail="Tag not found")
 
+    _record_named_change(db, "tag.changed", _named_snapshot(db_tag), None)
     db.delete(db_tag)
     db.commit()
     return {"message": "Tag deleted successfully"}
@@ -409,11 +846,12 @@ def get_recurring_expenses(db: Session, skip: int = 0, limit: int = 100):
 
 def create_recurring_expense(db: Session, recurring: schemas.RecurringExpenseCreate):
     # Verify category exists
-    if not get_category(db, recurring.category_id):
+    if not refcache.exists(db, "categories", recurring.category_id):
         raise HTTPException(status_code=400, detail="Category not found")
 
-    db_recurring = models.RecurringExpense(**recurring.dict())
+    db_recurring = models.RecurringExpense(**recurring.dict(), start_date=recurring.next_date)
     db.add(db_recurring)
+    events.publish_after_commit(db, "recurring.changed", {"category_id": db_recurring.category_id})
     db.commit()
     db.refresh(db_recurring)
     return db_recurring
@@ -424,13 +862,17 @@ def update_recurring_expense(db: Session, recurring_id: int, recurring: schemas.
         raise HTTPException(status_code=404, detail="Recurring expense not found")
 
     # Verify category if changing
-    if recurring.category_id and not get_category(db, recurring.category_id):
+    if recurring.category_id and not refcache.exists(db, "categories", recurring.category_id):
         raise HTTPException(status_code=400, detail="Category not found")
 
     update_data = recurring.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_recurring, key, value)
+    # A new schedule starts a new series at its next date
+    if "next_date" in update_data or "interval" in update_data:
+        db_recurring.start_date = db_recurring.next_date
 
+    events.publish_after_commit(db, "recurring.changed", {"id": recurring_id, "category_id": db_recurring.category_id})
     db.commit()
     db.refresh(db_recurring)
     return db_recurring
@@ -440,105 +882,188 @@ def delete_recurring_expense(db: Session, recurring_id: int):
     if not db_recurring:
         raise HTTPException(status_code=404, detail="Recurring expense not found")
 
+    events.publish_after_commit(db, "recurring.changed", {"id": recurring_id, "category_id": db_recurring.category_id})
     db.delete(db_recurring)
     db.commit()
     return {"message": "Recurring expense deleted successfully"}
 
-def generate_recurring_expenses(db: Session, date_today: Optional[date] = None):
+def _insert_occurrences(db: Session):
+    """INSERT for generated expenses that skips occurrences another worker already wrote."""
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(db.get_bind().dialect.name)
+    if dialect is None:
+        return insert(models.Expense)
+    return dialect.insert(models.Expense).on_conflict_do_nothing(index_elements=["recurring_id", "date"])
+
+def generate_recurring_expenses(db: Session, date_today: Optional[date] = None, batch_size: Optional[int] = None):
+    """Generate every due occurrence of due recurring rules and commit.
+
+    With ``batch_size`` only that many rules are claimed (FOR UPDATE SKIP LOCKED
+    on PostgreSQL), so several workers calling this in a loop split the backlog
+    without waiting on each other. The unique (recurring_id, date) index makes a
+    repeated occurrence a no-op rather than a duplicate expense.
+    """
     if date_today is None:
         date_today = date.today()
+    started = time.perf_counter()
 
-    # Find all recurring expenses where next_date <= today and end_date is None or end_date >= today
-    due_recurring = db.query(models.RecurringExpense).filter(
+    # Rules with at least one occurrence due on or before today that is not past end_date
+    query = db.query(models.RecurringExpense).filter(
         models.RecurringExpense.next_date <= date_today,
-        (models.RecurringExpense.end_date.is_(None) | 
-         (models.RecurringExpense.end_date >= date_today))
-    ).all()
-
-    generated_expenses = []
-
+        (models.RecurringExpense.end_date.is_(None) |
+         (models.RecurringExpense.next_date <= models.RecurringExpense.end_date))
+    ).order_by(models.RecurringExpense.id).with_for_update(skip_locked=True)
+    if batch_size:
+        query = query.limit(batch_size)
+    due_recurring = query.all()
+
+    # Expand every missed occurrence in memory, then write them in one statement
+    expense_rows = []
+    next_dates = []
+    by_rule = []
     for recurring in due_recurring:
-        # Create a new expense
-        expense = models.Expense(
-            amount=recurring.amount,
-            date=recurring.next_date,
-            description=f"Auto-generated from recurring: {recurring.name}",
-            category_id=recurring.category_id
-        )
-        db.add(expense)
-        db.flush()  # To get the new expense ID
-        generated_expenses.append(expense)
+        rule = compile_rule(recurring.interval)
+        anchor = recurring.start_date or recurring.next_date
+        last_date = min(date_today, recurring.end_date) if recurring.end_date else date_today
+        occurrences = rule.between(anchor, last_date, start=recurring.next_date)
+        description = f"Auto-generated from recurring: {recurring.name}"
+        expense_rows.extend({
+            "amount": recurring.amount,
+            "date": day,
+            "description": description,
+            "category_id": recurring.category_id,
+            "recurring_id": recurring.id,
+            "fingerprint": duplicates.fingerprint(day, recurring.amount, None, description)
+        } for day in occurrences)
+        count = len(occurrences)
+        occurrence = rule.first_on_or_after(anchor, last_date + timedelta(days=1))
+
+        # Past end_date, park next_date just beyond it so the rule is never due again
+        # but the record stays for reference
+        if recurring.end_date and occurrence > recurring.end_date:
+            occurrence = recurring.end_date + timedelta(days=1)
+        next_dates.append({"id": recurring.id, "next_date": occurrence, "start_date": anchor})
+        by_rule.append({
+            "recurring_id": recurring.id,
+            "name": recurring.name,
+            "occurrences": count,
+            "next_date": occurrence.isoformat()
+        })
+
+    generated = 0
+    if expense_rows:
+        # Skipped conflicts return no row, so the events are built from what was written
+        inserted = db.execute(
+            _insert_occurrences(db).returning(
+                models.Expense.id, models.Expense.date, models.Expense.amount, models.Expense.category_id
+            ),
+            expense_rows
+        ).all()
+        generated = len(inserted)
+        sync.record(db, "expense", [row.id for row in inserted])
+        # Generated expenses have no account, so only budget totals move: once per category and month
+        category_spend: Dict[tuple, Decimal] = {}
+        for row in inserted:
+            key = (row.category_id, row.date.replace(day=1))
+            category_spend[key] = category_spend.get(key, Decimal(0)) + Decimal(row.amount)
+            events.publish_after_commit(db, "expense.changed", {"before": None, "after": {
+                "id": row.id,
+                "date": row.date,
+                "amount": Decimal(row.amount),
+                "category_id": row.category_id,
+                "account_id": None,
+                "tag_ids": []
+            }})
+        for (category_id, month), delta in category_spend.items():
+            budget_alerts.apply_spend(db, category_id, month, delta)
+    if next_dates:
+        db.execute(update(models.RecurringExpense), next_dates)
+        sync.record(db, "recurring", [row["id"] for row in next_dates])
+        events.publish_after_commit(db, "recurring.changed", {"ids": [row["id"] for row in next_dates]})
+
+    db.commit()
+    metrics.inc("recurring_expenses_generated_total", (), generated)
+    metrics.inc("recurring_rules_processed_total", (), len(due_recurring))
+    metrics.observe("recurring_generation_seconds", (), time.perf_counter() - started)
 
-        # Update the next_date based on interval
-        recurring.next_date = _calculate_next_date(recurring.next_date, recurring.interval)
+    return {
+        "date_today": date_today.isoformat(),
+        "generated": generated,
+        "rules": len(due_recurring),
+        "by_rule": by_rule
+    }
 
-        # If new next_date is beyond end_date, mark it as expired or handle appropriately
-        if recurring.end_date and recurring.next_date > recurring.end_date:
-            # Option 1: Delete the recurring expense
-            # db.delete(recurring)
+# Import job operations
+def get_import_job(db: Session, job_id: int):
+    return db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
 
-            # Option 2: Set next_date to a date beyond end_date to prevent future generation
-            # but keep the record for reference
-            recurring.next_date = recurring.end_date + timedelta(days=1)
+def get_import_jobs(db: Session, skip: int = 0, limit: int = 100):
+    return db.query(models.ImportJob).order_by(models.ImportJob.id.desc()).offset(skip).limit(limit).all()
 
+def create_import_job(
+    db: Session,
+    source: BinaryIO,
+    filename: Optional[str],
+    fmt: Optional[str] = None,
+    mapping: Optional[str] = None,
+    dedupe: Optional[str] = None
+):
+    """Store the upload and queue it for background processing; the job is returned at once."""
+    fmt = fmt or imports.detect_format(filename)
+    if fmt not in imports.FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported import format; use csv, qif or ofx")
+    try:
+        parsed = schemas.ImportMapping.model_validate_json(mapping) if mapping else schemas.ImportMapping()
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid mapping: {exc}")
+
+    # Ids named by the mapping are checked once here rather than on every row
+    referenced = (
+        [("categories", "Category", parsed.default_category_id), ("accounts", "Account", parsed.default_account_id)]
+        + [("categories", "Category", rule.category_id) for rule in parsed.rules]
+        + [("accounts", "Account", rule.account_id) for rule in parsed.rules]
+        + [("tags", "Tag", tag_id) for rule in parsed.rules for tag_id in rule.tag_ids]
+    )
+    for name, label, item_id in referenced:
+        if item_id is not None and not refcache.exists(db, name, item_id):
+            raise HTTPException(status_code=400, detail=f"{label} with id {item_id} not found")
+
+    db_job = models.ImportJob(
+        filename=filename,
+        format=fmt,
+        mapping=parsed.model_dump_json(),
+        dedupe=dedupe,
+        baseline_expense_id=db.query(func.max(models.Expense.id)).scalar() or 0,
+        status="uploading"
+    )
+    db.add(db_job)
+    # Committed before the copy so a large upload does not hold the transaction
+    # open; workers only claim pending jobs, so this one waits for its file
     db.commit()
-    # Refresh all expenses to get their complete data with relationships
-    for expense in generated_expenses:
-        db.refresh(expense)
-
-    return generated_expenses
-
-# Helper function to calculate next date based on interval
-def _calculate_next_date(current_date: date, interval: str) -> date:
-    if interval.lower() == "daily":
-        return current_date + timedelta(days=1)
-    elif interval.lower() == "weekly":
-        return current_date + timedelta(days=7)
-    elif interval.lower() == "biweekly":
-        return current_date + timedelta(days=14)
-    elif interval.lower() == "monthly":
-        # Handle month rollover properly
-        month = current_date.month + 1
-        year = current_date.year
-
-        if month > 12:
-            month = 1
-            year += 1
-
-        # Handle cases where the day might not exist in the next month
-        day = min(current_date.day, _get_days_in_month(year, month))
-
-        return date(year, month, day)
-    elif interval.lower() == "quarterly":
-        # Add 3 months
-        month = current_date.month + 3
-        year = current_date.year
-
-        if month > 12:
-            month = month - 12
-            year += 1
-
-        day = min(current_date.day, _get_days_in_month(year, month))
-
-        return date(year, month, day)
-    elif interval.lower() == "yearly" or interval.lower() == "annually":
-        return date(current_date.year + 1, current_date.month, current_date.day)
-    else:
-        # Default to monthly if interval is not recognized
-        return _calculate_next_date(current_date, "monthly")
-
-# Helper function to get the number of days in a month
-def _get_days_in_month(year: int, month: int) -> int:
-    if month in [4, 6, 9, 11]:
-        return 30
-    elif month == 2:
-        # Check for leap year
-        if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
-            return 29
-        else:
-            return 28
-    else:
-        return 31
+    try:
+        db_job.upload_path, db_job.size_bytes = imports.store_upload(source, db_job.id, fmt)
+    except OSError as exc:
+        db_job.status = "failed"
+        db_job.error = f"Could not store upload: {exc}"
+        db.commit()
+        raise HTTPException(status_code=500, detail="Could not store upload")
+    db_job.status = "pending"
+    db.commit()
+    db.refresh(db_job)
+    imports.submit(db.get_bind(), db_job.id)
+    return db_job
+
+def resume_import_job(db: Session, job_id: int):
+    db_job = get_import_job(db, job_id)
+    if not db_job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if db_job.status == "completed":
+        raise HTTPException(status_code=400, detail="Import job already completed")
+    if db_job.upload_path is None:
+        raise HTTPException(status_code=400, detail="Import job has no stored upload")
+    if not imports.resumable(db_job):
+        raise HTTPException(status_code=409, detail="Import job is still running")
+    imports.submit(db.get_bind(), db_job.id)
+    return db_job
 
 # User CRUD operations
 def get_user(db: Session, user_id: int):
@@ -605,6 +1130,50 @@ def delete_user(db: Session, user_id: int):
     return {"message": "User deleted successfully"}
 
 def get_expense_summary(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category_id: Optional[int] = None,
+    use_engine: bool = True
+):
+    # Serve from the in-memory columnar engine when it is enabled and loaded
+    if use_engine and analytics.ENABLED and analytics.engine_store.ready:
+        total_amount, count, by_category, by_tag = analytics.engine_store.expense_summary(
+            db, start_date, end_date, category_id
+        )
+    else:
+        total_amount, count, by_category, by_tag = _sql_expense_summary(db, start_date, end_date, category_id)
+
+    # Calculate average
+    average_amount = total_amount / count if count > 0 else Decimal('0')
+
+    # Fold in cold-archived months when the range reaches into them
+    if archive.months_in_range(start_date, end_date):
+        archived = archive.summarize(start_date, end_date, category_id)
+        if archived["count"]:
+            total_amount = Decimal(total_amount) + Decimal(archived["total"]).scaleb(-2)
+            count += archived["count"]
+            average_amount = total_amount / count
+            by_category = _merge_archived_groups(
+                db, by_category, archived["by_category"], models.Category, "category_id", "category_name"
+            )
+            by_tag = _merge_archived_groups(
+                db, by_tag, archived["by_tag"], models.Tag, "tag_id", "tag_name"
+            )
+
+    return {
+        "total_amount": str(total_amount),
+        "average_amount": str(average_amount),
+        "count": count,
+        "by_category": by_category,
+        "by_tag": by_tag,
+        "period": {
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None
+        }
+    }
+
+def _sql_expense_summary(
     db: Session,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
@@ -623,9 +1192,6 @@ def get_expense_summary(
     total_amount = query.with_entities(func.sum(models.Expense.amount)).scalar() or Decimal('0')
     count = query.count()
 
-    # Calculate average
-    average_amount = total_amount / count if count > 0 else Decimal('0')
-
     # Get summary by category
     category_summary = db.query(
         models.Category.id.label('category_id'),
@@ -675,30 +1241,38 @@ def get_expense_summary(
         models.Tag.name
     ).all()
 
-    return {
-        "total_amount": str(total_amount),
-        "average_amount": str(average_amount),
-        "count": count,
-        "by_category": [
-            {
-                "category_id": item.category_id,
-                "category_name": item.category_name,
-                "total_amount": str(item.total_amount),
-                "count": item.count
-            }
-            for item in category_summary
-        ],
-        "by_tag": [
-            {
-                "tag_id": item.tag_id,
-                "tag_name": item.tag_name,
-                "total_amount": str(item.total_amount),
-                "count": item.count
-            }
-            for item in tag_summary
-        ],
-        "period": {
-            "start_date": start_date.isoformat() if start_date else None,
-            "end_date": end_date.isoformat() if end_date else None
+    by_category = [
+        {
+            "category_id": item.category_id,
+            "category_name": item.category_name,
+            "total_amount": str(item.total_amount),
+            "count": item.count
+        }
+        for item in category_summary
+    ]
+    by_tag = [
+        {
+            "tag_id": item.tag_id,
+            "tag_name": item.tag_name,
+            "total_amount": str(item.total_amount),
+            "count": item.count
         }
-    }
\ No newline at end of file
+        for item in tag_summary
+    ]
+    return total_amount, count, by_category, by_tag
+
+# Helper to merge archived {id: [cents, count]} groups into summary rows
+def _merge_archived_groups(db: Session, rows: List[dict], archived: Dict[int, List[int]], model, id_key: str, name_key: str):
+    merged = {row[id_key]: row for row in rows}
+    missing = [group_id for group_id in archived if group_id not in merged]
+    names = dict(db.query(model.id, model.name).filter(model.id.in_(missing)).all()) if missing else {}
+
+    for group_id, (cents, group_count) in archived.items():
+        row = merged.get(group_id)
+        if row is None:
+            if group_id not in names:
+                continue  # category/tag deleted since archiving
+            row = merged[group_id] = {id_key: group_id, name_key: names[group_id], "total_amount": "0", "count": 0}
+        row["total_amount"] = str(Decimal(row["total_amount"]) + Decimal(cents).scaleb(-2))
+        row["count"] += group_count
+    return list(merged.values())
@@ -7,6 +7,12 @@ from dotenv import load_dotenv
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# SQLite has one writer at a time; queued writers wait up to this long for the lock
+# (pysqlite's 5 second default fails requests under a burst of concurrent writes)
+connect_args = {}
+if DATABASE_URL and DATABASE_URL.startswith("sqlite"):
+    connect_args["timeout"] = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+
 # Configure the database engine with connection pooling
 engine = create_engine(
     DATABASE_URL,
@@ -14,7 +20,8 @@ engine = create_engine(
     max_overflow=10,  # max number of connections to create beyond pool_size
     pool_timeout=30,  # timeout for getting a connection from pool
     pool_recycle=1800,  # recycle connections after 30 minutes
-    echo=False  # set to True to log all SQL
+    echo=False,  # set to True to log all SQL
+    connect_args=connect_args,
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -0,0 +1,141 @@
+# backend/app/duplicates.py
+"""Duplicate expense detection.
+
+Every expense stores a ``fingerprint``: a SHA-1 of its normalized date,
+amount in cents, account and description, so an exact re-entry (e.g. a
+bank import re-sending a window) is a single indexed lookup. Fuzzy
+duplicates have the same account and amount, dates within a window and
+similar descriptions. The report finds them with one sort-and-sweep pass
+over rows ordered by (account, amount, date), comparing each row only to
+the rows still inside its date window, instead of comparing all pairs.
+"""
+import hashlib
+import os
+import re
+from collections import deque
+from datetime import date, timedelta
+from decimal import Decimal
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+WINDOW_DAYS = int(os.getenv("DUPLICATE_WINDOW_DAYS", "1"))
+SIMILARITY = float(os.getenv("DUPLICATE_SIMILARITY", "0.8"))
+DEDUPE_MODES = ("skip", "flag")
+
+Expense = models.Expense
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_description(description: Optional[str]) -> str:
+    text = _PUNCTUATION.sub(" ", (description or "").lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+def fingerprint(day: date, amount, account_id: Optional[int], description: Optional[str]) -> str:
+    cents = int(Decimal(amount) * 100)
+    key = f"{day.isoformat()}|{cents}|{account_id or ''}|{normalize_description(description)}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def similar(a: str, b: str, threshold: float = SIMILARITY) -> bool:
+    """Fuzzy match of normalized descriptions; two empty descriptions match."""
+    if a == b:
+        return True
+    if not a or not b:
+        return False
+    return SequenceMatcher(None, a, b).ratio() >= threshold
+
+
+def find_duplicate(
+    db: Session,
+    day: date,
+    amount,
+    account_id: Optional[int],
+    description: Optional[str],
+    window_days: int = WINDOW_DAYS,
+    exclude_id: Optional[int] = None,
+) -> Optional[int]:
+    """Id of an existing expense that duplicates the given values, if any."""
+    exact = select(Expense.id).where(Expense.fingerprint == fingerprint(day, amount, account_id, description))
+    if exclude_id is not None:
+        exact = exact.where(Expense.id != exclude_id)
+    found = db.execute(exact.limit(1)).scalar()
+    if found is not None:
+        return found
+
+    # Candidates share account and amount within the window (served by the account/date index)
+    candidates = select(Expense.id, Expense.description).where(
+        Expense.account_id.is_(None) if account_id is None else Expense.account_id == account_id,
+        Expense.amount == amount,
+        Expense.date >= day - timedelta(days=window_days),
+        Expense.date <= day + timedelta(days=window_days),
+    )
+    if exclude_id is not None:
+        candidates = candidates.where(Expense.id != exclude_id)
+    wanted = normalize_description(description)
+    for candidate_id, candidate_description in db.execute(candidates.order_by(Expense.id)):
+        if similar(wanted, normalize_description(candidate_description)):
+            return candidate_id
+    return None
+
+
+def _item(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "date": row.date.isoformat(),
+        "amount": str(row.amount),
+        "account_id": row.account_id,
+        "description": row.description,
+    }
+
+
+def report(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    account_id: Optional[int] = None,
+    window_days: int = WINDOW_DAYS,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """Groups of likely duplicates, largest first, from one sort-and-sweep pass."""
+    query = select(Expense.id, Expense.date, Expense.amount, Expense.account_id, Expense.description)
+    if start_date:
+        query = query.where(Expense.date >= start_date)
+    if end_date:
+        query = query.where(Expense.date <= end_date)
+    if account_id:
+        query = query.where(Expense.account_id == account_id)
+    query = query.order_by(Expense.account_id, Expense.amount, Expense.date, Expense.id)
+
+    # Rows still inside the date window: [account_id, amount, date, normalized description, row, group]
+    window: deque = deque()
+    groups: List[List[Dict[str, Any]]] = []
+    for row in db.execute(query.execution_options(yield_per=5000)):
+        # Drop rows that can no longer match: different account/amount or too old
+        while window and (
+            window[0][0] != row.account_id
+            or window[0][1] != row.amount
+            or (row.date - window[0][2]).days > window_days
+        ):
+            window.popleft()
+
+        normalized = normalize_description(row.description)
+        group = None
+        match = next((entry for entry in window if similar(normalized, entry[3])), None)
+        if match is not None:
+            # Groups are only materialized once a second member shows up
+            if match[5] is None:
+                match[5] = len(groups)
+                groups.append([_item(match[4])])
+            group = match[5]
+            groups[group].append(_item(row))
+        window.append([row.account_id, row.amount, row.date, normalized, row, group])
+
+    groups.sort(key=lambda g: (-len(g), g[0]["date"]))
+    return [{"expenses": g, "count": len(g)} for g in groups[:limit]]
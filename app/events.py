@@ -0,0 +1,58 @@
+# backend/app/events.py
+"""Minimal in-process event bus for reacting to data changes.
+
+crud functions stage events on the session with ``publish_after_commit``;
+they are delivered to subscribers only once the transaction commits and
+dropped if it rolls back, so listeners never see phantom writes.
+"""
+import logging
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], None]
+
+_handlers: Dict[str, List[Handler]] = defaultdict(list)
+
+
+def subscribe(topic: str, handler: Handler):
+    if handler not in _handlers[topic]:
+        _handlers[topic].append(handler)
+
+
+def unsubscribe(topic: str, handler: Handler):
+    if handler in _handlers[topic]:
+        _handlers[topic].remove(handler)
+
+
+def publish(topic: str, payload: Dict[str, Any]):
+    for handler in list(_handlers.get(topic, ())):
+        try:
+            handler(payload)
+        except Exception:
+            # A failing listener must never break the write that triggered it
+            logger.exception("Event handler %r failed for %s", handler, topic)
+
+
+def publish_after_commit(db: Session, topic: str, payload: Dict[str, Any]):
+    if not _handlers.get(topic):
+        return
+    db.info.setdefault("pending_events", []).append((topic, payload))
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_pending(session: Session):
+    if session.info.get("hold_events"):
+        return
+    pending = session.info.pop("pending_events", None)
+    for topic, payload in pending or ():
+        publish(topic, payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop("pending_events", None)
@@ -0,0 +1,203 @@
+# backend/app/forecast.py
+"""Cash-flow forecast from recurring rules, budgets and trailing spend.
+
+Every source is spread onto a (category x day) matrix of cents for the
+horizon and then summed into periods with one ``np.add.reduceat``:
+
+- recurring: every occurrence of every active rule, expanded per rule with
+  the vectorized occurrence engine;
+- discretionary: the daily average of actual non-recurring spend per
+  category over the trailing window before the horizon;
+- budgeted: each monthly budget spread evenly over the days of its month,
+  so week and day granularities get a prorated share.
+
+``projected`` is recurring plus discretionary. Results are cached per
+horizon and dropped whenever an expense, budget or recurring rule changes
+in this process; the TTL bounds staleness from writes in other workers.
+"""
+import os
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import events, metrics, models
+from .utils.date_utils import add_months
+from .utils.recurrence import compile_rule
+
+GRANULARITIES = ("day", "week", "month")
+MAX_DAYS = int(os.getenv("FORECAST_MAX_DAYS", "3660"))
+TRAILING_DAYS = int(os.getenv("FORECAST_TRAILING_DAYS", "90"))
+CACHE_SECONDS = float(os.getenv("FORECAST_CACHE_SECONDS", "300"))
+CACHE_SIZE = 64
+
+_cache: Dict[Tuple, Tuple[float, dict]] = {}
+_cache_lock = threading.Lock()
+_generation = 0
+
+
+def invalidate(payload=None):
+    global _generation
+    with _cache_lock:
+        _generation += 1
+        _cache.clear()
+
+
+for _topic in ("expense.changed", "budget.changed", "recurring.changed"):
+    events.subscribe(_topic, invalidate)
+
+
+def _money(cents) -> str:
+    return str(Decimal(int(round(cents))).scaleb(-2))
+
+
+def period_starts(start: date, end: date, granularity: str) -> List[date]:
+    """First day of every period overlapping [start, end]; the first period is cut at ``start``."""
+    starts = [start]
+    if granularity == "day":
+        step = lambda d: d + timedelta(days=1)
+    elif granularity == "week":
+        step = lambda d: d - timedelta(days=d.weekday()) + timedelta(days=7)
+    else:
+        step = lambda d: add_months(d.replace(day=1), 1)
+    while True:
+        nxt = step(starts[-1])
+        if nxt > end:
+            return starts
+        starts.append(nxt)
+
+
+def _recurring_occurrences(db: Session, start: date, end: date) -> List[Tuple[int, np.ndarray, int]]:
+    """(category_id, day offsets from ``start``, cents) for every rule with occurrences in the horizon."""
+    rules = db.query(
+        models.RecurringExpense.category_id,
+        models.RecurringExpense.amount,
+        models.RecurringExpense.interval,
+        models.RecurringExpense.next_date,
+        models.RecurringExpense.start_date,
+        models.RecurringExpense.end_date,
+    ).filter(
+        models.RecurringExpense.next_date <= end,
+        models.RecurringExpense.end_date.is_(None) | (models.RecurringExpense.end_date >= start)
+    ).all()
+    origin = np.datetime64(start, "D")
+    result = []
+    for category_id, amount, interval, next_date, start_date, end_date in rules:
+        last = min(end, end_date) if end_date else end
+        days = (compile_rule(interval).dates(start_date or next_date, last, max(start, next_date)) - origin).astype(np.int64)
+        if len(days):
+            result.append((category_id, days, int(Decimal(amount) * 100)))
+    return result
+
+
+def _trailing_cents(db: Session, start: date) -> Tuple[Dict[int, int], int]:
+    """Non-recurring spend per category over the trailing window, and the days of history it covers."""
+    window_end = min(start, date.today()) - timedelta(days=1)
+    window_start = window_end - timedelta(days=TRAILING_DAYS - 1)
+    # With less history than the window, a daily rate over the full window understates spend
+    first = db.query(func.min(models.Expense.date)).scalar()
+    covered = (window_end - max(window_start, first)).days + 1 if first is not None else 0
+    if covered <= 0:
+        return {}, 0
+    rows = db.query(models.Expense.category_id, func.sum(models.Expense.amount)).filter(
+        models.Expense.date >= window_start,
+        models.Expense.date <= window_end,
+        models.Expense.recurring_id.is_(None)
+    ).group_by(models.Expense.category_id).all()
+    return {category_id: int(Decimal(total) * 100) for category_id, total in rows}, covered
+
+
+def _budget_rows(db: Session, start: date, end: date):
+    month_key = models.Budget.year * 12 + models.Budget.month
+    return db.query(
+        models.Budget.category_id, models.Budget.year, models.Budget.month, models.Budget.amount
+    ).filter(
+        month_key >= start.year * 12 + start.month,
+        month_key <= end.year * 12 + end.month
+    ).all()
+
+
+def compute(db: Session, start: date, end: date, granularity: str = "month") -> dict:
+    n_days = (end - start).days + 1
+    categories: Dict[int, int] = {}
+
+    occurrences = _recurring_occurrences(db, start, end)
+    trailing, trailing_days = _trailing_cents(db, start)
+    budgets = _budget_rows(db, start, end)
+    for category_id in [o[0] for o in occurrences] + list(trailing) + [b.category_id for b in budgets]:
+        categories.setdefault(category_id, len(categories))
+
+    shape = (len(categories), n_days)
+    recurring = np.zeros(shape)
+    discretionary = np.zeros(shape)
+    budgeted = np.zeros(shape)
+
+    for category_id, days, cents in occurrences:
+        np.add.at(recurring[categories[category_id]], days, cents)
+    for category_id, cents in trailing.items():
+        discretionary[categories[category_id]] = cents / trailing_days
+    origin = np.datetime64(start, "D")
+    for category_id, year, month, amount in budgets:
+        month_start = date(year, month, 1)
+        month_end = add_months(month_start, 1)
+        lo = max(int((np.datetime64(month_start, "D") - origin).astype(int)), 0)
+        hi = min(int((np.datetime64(month_end, "D") - origin).astype(int)), n_days)
+        budgeted[categories[category_id], lo:hi] = int(Decimal(amount) * 100) / (month_end - month_start).days
+
+    starts = period_starts(start, end, granularity)
+    offsets = [(d - start).days for d in starts]
+    sums = {
+        name: np.add.reduceat(matrix, offsets, axis=1) if len(categories) else np.zeros((0, len(starts)))
+        for name, matrix in (("recurring", recurring), ("discretionary", discretionary), ("budgeted", budgeted))
+    }
+    sums["projected"] = sums["recurring"] + sums["discretionary"]
+
+    category_ids = sorted(categories, key=categories.get)
+    periods = []
+    for i, period_start in enumerate(starts):
+        period_end = starts[i + 1] - timedelta(days=1) if i + 1 < len(starts) else end
+        periods.append({
+            "start": period_start.isoformat(),
+            "end": period_end.isoformat(),
+            **{name: _money(values[:, i].sum()) for name, values in sums.items()},
+            "by_category": [
+                {"category_id": category_id, **{name: _money(values[row, i]) for name, values in sums.items()}}
+                for row, category_id in enumerate(category_ids)
+                if any(values[row, i] for values in sums.values())
+            ],
+        })
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "granularity": granularity,
+        "trailing_days": trailing_days,
+        "totals": {name: _money(values.sum()) for name, values in sums.items()},
+        "periods": periods,
+    }
+
+
+def get_forecast(db: Session, start: date, end: date, granularity: str = "month") -> dict:
+    key = (start, end, granularity, date.today())
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and now - hit[0] < CACHE_SECONDS:
+            metrics.inc("cache_requests_total", ("forecast", "hit"))
+            return hit[1]
+        generation = _generation
+    metrics.inc("cache_requests_total", ("forecast", "miss"))
+    result = compute(db, start, end, granularity)
+    with _cache_lock:
+        # Do not cache a result computed while a write invalidated the cache
+        if generation != _generation:
+            return result
+        if len(_cache) >= CACHE_SIZE:
+            _cache.pop(next(iter(_cache)))
+        _cache[key] = (now, result)
+    return result
@@ -0,0 +1,322 @@
+# backend/app/idempotency.py
+"""Idempotency-Key support for retried writes.
+
+The first request with a given ``Idempotency-Key`` (scoped per caller by
+the id of the user its bearer token authenticates) claims a row in ``idempotency_keys``;
+its response is stored zlib-compressed and replayed, without running the
+endpoint again, for every retry until the key expires. A retry that
+arrives while the first request is still running waits for it (woken
+at once within the same process, by polling across processes). The
+running request refreshes its claim every ``HEARTBEAT_SECONDS``, so only a
+claim left behind by a crashed worker goes stale and is taken over after
+``LOCK_SECONDS``.
+Reusing a key for a different request is rejected with 422.
+
+5xx responses are not stored, so the client's retry runs again. Request
+bodies above ``MAX_BODY_BYTES``, and requests without a bearer token for a
+known user, are passed through without idempotency.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, or_, and_, select, tuple_, update
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response
+
+from . import models
+from .database import engine as default_engine
+from .utils.security import verify_token
+
+TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# An in-progress claim older than this belongs to a worker that died
+LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+HEARTBEAT_SECONDS = LOCK_SECONDS / 3
+# How long a concurrent duplicate waits for the first request before giving up with 409
+WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+POLL_SECONDS = 0.2
+MAX_BODY_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BODY_BYTES", str(1024 * 1024)))
+MAX_RESPONSE_BYTES = int(os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", str(1024 * 1024)))
+PURGE_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_SECONDS", "300"))
+PURGE_BATCH = 1000
+HEADER = "idempotency-key"
+METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+logger = logging.getLogger(__name__)
+
+keys = models.IdempotencyKey.__table__
+
+# Requests this process is executing, so local duplicates are woken as soon as they finish
+_inflight: Dict[Tuple[str, str], Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+_task: Optional[asyncio.Task] = None
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _where(scope: str, key: str):
+    return and_(keys.c.scope == scope, keys.c.key == key)
+
+
+def caller_scope(engine: Engine, authorization: Optional[str]) -> Optional[str]:
+    """The scope for a request's keys: its authenticated user's id, None when unauthenticated.
+
+    Unauthenticated callers get no scope rather than a shared one: nothing
+    identifies them reliably (addresses are shared behind proxies and NAT),
+    and in a shared scope one client's key would replay another's response.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        username = verify_token(token).get("sub")
+    except HTTPException:
+        return None
+    with engine.connect() as conn:
+        user_id = conn.execute(select(models.User.id).where(models.User.username == username)).scalar()
+    return None if user_id is None else f"user:{user_id}"
+
+
+def claim(engine: Engine, scope: str, key: str, request_hash: str) -> Optional[Row]:
+    """Claim the key for this request; None when claimed, else the existing row."""
+    now = _now()
+    claimed = {
+        "request_hash": request_hash,
+        "status": "in_progress",
+        "response_status": None,
+        "content_type": None,
+        "body": None,
+        "locked_at": now,
+        "expires_at": now + timedelta(seconds=TTL_SECONDS),
+    }
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(keys).values(scope=scope, key=key, **claimed))
+        return None
+    except IntegrityError:
+        pass
+    with engine.begin() as conn:
+        # Expired, or abandoned by a worker that died mid-request
+        taken_over = conn.execute(
+            update(keys)
+            .where(_where(scope, key), or_(
+                keys.c.expires_at < now,
+                and_(keys.c.status == "in_progress", keys.c.locked_at < now - timedelta(seconds=LOCK_SECONDS)),
+            ))
+            .values(**claimed)
+        ).rowcount
+        if taken_over:
+            return None
+        return conn.execute(select(keys).where(_where(scope, key))).first()
+
+
+def heartbeat(engine: Engine, scope: str, key: str):
+    with engine.begin() as conn:
+        conn.execute(
+            update(keys).where(_where(scope, key), keys.c.status == "in_progress").values(locked_at=_now())
+        )
+
+
+async def _keep_alive(engine: Engine, scope: str, key: str):
+    """Refresh the claim until cancelled, so a long request is not taken over."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        try:
+            await run_in_threadpool(heartbeat, engine, scope, key)
+        except Exception:
+            logger.exception("Idempotency key heartbeat failed")
+
+
+def complete(engine: Engine, scope: str, key: str, status_code: int, content_type: Optional[str], body: bytes):
+    with engine.begin() as conn:
+        conn.execute(
+            update(keys)
+            .where(_where(scope, key))
+            .values(
+                status="done",
+                response_status=status_code,
+                content_type=content_type,
+                body=zlib.compress(body),
+                expires_at=_now() + timedelta(seconds=TTL_SECONDS),
+            )
+        )
+
+
+def release(engine: Engine, scope: str, key: str):
+    with engine.begin() as conn:
+        conn.execute(delete(keys).where(_where(scope, key), keys.c.status == "in_progress"))
+
+
+def purge_expired(engine: Engine = default_engine, batch_size: int = PURGE_BATCH) -> int:
+    """Delete expired keys in batches; returns the number deleted."""
+    deleted = 0
+    while True:
+        expired = select(keys.c.scope, keys.c.key).where(keys.c.expires_at < _now()).limit(batch_size)
+        with engine.begin() as conn:
+            count = conn.execute(delete(keys).where(tuple_(keys.c.scope, keys.c.key).in_(expired))).rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def _replay(row: Row) -> Response:
+    return Response(
+        content=zlib.decompress(row.body) if row.body else b"",
+        status_code=row.response_status,
+        media_type=row.content_type,
+        headers={"idempotent-replayed": "true"},
+    )
+
+
+async def _read_body(receive) -> Tuple[Optional[bytes], List[Dict[str, Any]]]:
+    """Buffer the request body; (None, messages read) when it exceeds MAX_BODY_BYTES."""
+    messages = []
+    size = 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            return None, messages
+        size += len(message.get("body", b""))
+        if size > MAX_BODY_BYTES:
+            return None, messages
+        if not message.get("more_body", False):
+            return b"".join(m.get("body", b"") for m in messages), messages
+
+
+def _replaying(messages: List[Dict[str, Any]], receive):
+    """A receive callable that yields the buffered messages before reading on."""
+    pending = list(messages)
+
+    async def wrapped():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+    return wrapped
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app, engine: Optional[Engine] = None):
+        self.app = app
+        self.engine = engine or default_engine
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METHODS:
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        key = headers.get(HEADER)
+        if key is None:
+            return await self.app(scope, receive, send)
+        if not key or len(key) > 255:
+            response = JSONResponse({"detail": "Idempotency-Key must be 1 to 255 characters"}, status_code=400)
+            return await response(scope, receive, send)
+
+        body, messages = await _read_body(receive)
+        receive = _replaying(messages, receive)
+        if body is None:
+            return await self.app(scope, receive, send)
+
+        owner = await run_in_threadpool(caller_scope, self.engine, headers.get("authorization"))
+        if owner is None:
+            return await self.app(scope, receive, send)
+        request_hash = hashlib.sha256(b"\0".join([
+            scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body
+        ])).hexdigest()
+
+        deadline = asyncio.get_running_loop().time() + WAIT_SECONDS
+        while (existing := await run_in_threadpool(claim, self.engine, owner, key, request_hash)) is not None:
+            if existing.request_hash != request_hash:
+                response = JSONResponse(
+                    {"detail": "Idempotency-Key was already used for a different request"}, status_code=422
+                )
+                return await response(scope, receive, send)
+            if existing.status == "done":
+                return await _replay(existing)(scope, receive, send)
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                response = JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is still in progress"},
+                    status_code=409,
+                    headers={"retry-after": "1"},
+                )
+                return await response(scope, receive, send)
+            loop, event = _inflight.get((owner, key), (None, None))
+            try:
+                if loop is asyncio.get_running_loop():
+                    await asyncio.wait_for(event.wait(), remaining)
+                else:
+                    await asyncio.sleep(min(POLL_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+        event = asyncio.Event()
+        _inflight[(owner, key)] = (asyncio.get_running_loop(), event)
+        keep_alive = asyncio.create_task(_keep_alive(self.engine, owner, key))
+        captured: Dict[str, Any] = {"status": None, "content_type": None, "chunks": [], "size": 0}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["content_type"] = Headers(raw=message.get("headers", [])).get("content-type")
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                captured["size"] += len(chunk)
+                if captured["size"] <= MAX_RESPONSE_BYTES:
+                    captured["chunks"].append(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+            keep_alive.cancel()
+            status_code = captured["status"]
+            if status_code is not None and status_code < 500 and captured["size"] <= MAX_RESPONSE_BYTES:
+                await run_in_threadpool(
+                    complete, self.engine, owner, key, status_code, captured["content_type"], b"".join(captured["chunks"])
+                )
+            else:
+                await run_in_threadpool(release, self.engine, owner, key)
+        except BaseException:
+            await run_in_threadpool(release, self.engine, owner, key)
+            raise
+        finally:
+            keep_alive.cancel()
+            _inflight.pop((owner, key), None)
+            event.set()
+
+
+async def run_cleanup(engine: Engine = default_engine):
+    while True:
+        try:
+            deleted = await asyncio.to_thread(purge_expired, engine)
+            if deleted:
+                logger.info("Purged %d expired idempotency keys", deleted)
+        except Exception:
+            logger.exception("Idempotency key cleanup failed")
+        await asyncio.sleep(PURGE_SECONDS)
+
+
+def start(engine: Engine = default_engine):
+    """Start the periodic cleanup on the running event loop; call once per process."""
+    global _task
+    if _task is None:
+        _task = asyncio.get_running_loop().create_task(run_cleanup(engine), name="idempotency-cleanup")
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,397 @@
+# backend/app/imports.py
+"""Streaming import of bank statements (CSV, QIF, OFX) into expenses.
+
+The upload is copied to ``IMPORT_DIR`` block by block and processed by a
+small background pool through a generator pipeline: records are parsed
+one at a time, resolved to a category, account and tags (file column
+first, then the first matching rule, then the mapping defaults) and
+written in chunks of ``IMPORT_CHUNK_SIZE`` rows with one multi-row INSERT
+each. Every chunk commits together with the job's progress counters, so
+an interrupted import resumes after the last committed chunk and no row
+is written twice. Neither the upload nor the parsed rows are ever held
+in memory as a whole.
+"""
+import csv
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import balances, budget_alerts, duplicates, events, models, schemas, sync
+
+logger = logging.getLogger(__name__)
+
+IMPORT_DIR = os.getenv("IMPORT_DIR", "data/imports")
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "2000"))
+WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+# A running job not updated for this long is treated as interrupted and may be resumed
+STALE_SECONDS = int(os.getenv("IMPORT_STALE_SECONDS", "300"))
+FORMATS = ("csv", "qif", "ofx")
+BLOCK_SIZE = 1024 * 1024
+MAX_ERRORS = 100
+
+Job = models.ImportJob
+Expense = models.Expense
+CENT = Decimal("0.01")
+
+# (row to insert or None when skipped, error message or None)
+Result = Tuple[Optional[Dict[str, Any]], Optional[str]]
+
+
+class RowError(ValueError):
+    """A record that cannot be imported; counted as failed, the import goes on."""
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return extension if extension in FORMATS else None
+
+
+def store_upload(source: BinaryIO, job_id: int, fmt: str, import_dir: str = IMPORT_DIR) -> Tuple[str, int]:
+    """Copy an upload to disk in fixed-size blocks; returns (path, size in bytes)."""
+    os.makedirs(import_dir, exist_ok=True)
+    path = os.path.join(import_dir, f"{job_id}.{fmt}")
+    size = 0
+    with open(path, "wb") as target:
+        while block := source.read(BLOCK_SIZE):
+            target.write(block)
+            size += len(block)
+    return path, size
+
+
+# Parsers: each yields raw records with the keys date, amount, description,
+# category, account and tags (strings or None)
+
+def _open_text(path: str):
+    return open(path, newline="", encoding="utf-8-sig", errors="replace")
+
+
+def _csv_records(path: str, mapping: schemas.ImportMapping) -> Iterator[Dict[str, Optional[str]]]:
+    column = lambda row, name: row.get(name) if name else None
+    with _open_text(path) as f:
+        for row in csv.DictReader(f, delimiter=mapping.delimiter):
+            yield {
+                "date": row.get(mapping.date_column),
+                "amount": row.get(mapping.amount_column),
+                "description": row.get(mapping.description_column),
+                "category": column(row, mapping.category_column),
+                "account": column(row, mapping.account_column),
+                "tags": column(row, mapping.tags_column),
+            }
+
+
+_QIF_FIELDS = {"D": "date", "T": "amount", "U": "amount", "P": "description", "M": "memo", "L": "category"}
+
+
+def _statement_record(fields: Dict[str, str]) -> Dict[str, Optional[str]]:
+    category = fields.get("category")
+    return {
+        "date": fields.get("date"),
+        "amount": fields.get("amount"),
+        "description": fields.get("description") or fields.get("memo"),
+        # "[Account]" in a QIF category marks a transfer, not a category
+        "category": None if not category or category.startswith("[") else category,
+        "account": None,
+        "tags": None,
+    }
+
+
+def _qif_records(path: str, mapping: schemas.ImportMapping) -> Iterator[Dict[str, Optional[str]]]:
+    fields: Dict[str, str] = {}
+    with _open_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("!"):
+                continue
+            if line.startswith("^"):
+                if fields:
+                    yield _statement_record(fields)
+                fields = {}
+            elif line[0] in _QIF_FIELDS:
+                fields.setdefault(_QIF_FIELDS[line[0]], line[1:].strip())
+    if fields:
+        yield _statement_record(fields)
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+_OFX_FIELDS = {"DTPOSTED": "date", "TRNAMT": "amount", "NAME": "description", "MEMO": "memo"}
+
+
+def _ofx_tokens(path: str) -> Iterator[Tuple[bool, str, str]]:
+    """(closing, tag, text) for every tag; works for SGML and XML OFX, any line layout."""
+    buffer = ""
+    with _open_text(path) as f:
+        while True:
+            block = f.read(BLOCK_SIZE)
+            buffer += block
+            # The last tag may continue in the next block
+            cut = max(buffer.rfind("<"), 0) if block else len(buffer)
+            for match in _OFX_TAG.finditer(buffer, 0, cut):
+                yield match.group(1) == "/", match.group(2).upper(), match.group(3).strip()
+            buffer = buffer[cut:]
+            if not block:
+                return
+
+
+def _ofx_records(path: str, mapping: schemas.ImportMapping) -> Iterator[Dict[str, Optional[str]]]:
+    fields: Optional[Dict[str, str]] = None
+    for closing, tag, text in _ofx_tokens(path):
+        if tag == "STMTTRN":
+            if fields:
+                yield _statement_record(fields)
+            fields = None if closing else {}
+        elif fields is not None and not closing and tag in _OFX_FIELDS:
+            fields[_OFX_FIELDS[tag]] = text
+    if fields:
+        yield _statement_record(fields)
+
+
+PARSERS = {"csv": _csv_records, "qif": _qif_records, "ofx": _ofx_records}
+DATE_FORMATS = {"csv": "%Y-%m-%d", "qif": "%m/%d/%Y", "ofx": "%Y%m%d"}
+_AMOUNT_NOISE = re.compile(r"[^\d.+-]")
+
+
+class _Resolver:
+    """Turns a raw record into expense column values, or raises RowError."""
+
+    def __init__(self, db: Session, mapping: schemas.ImportMapping, fmt: str):
+        lowered = lambda model: {name.lower(): item_id for item_id, name in db.execute(select(model.id, model.name))}
+        self.categories = lowered(models.Category)
+        self.accounts = lowered(models.Account)
+        self.tags = lowered(models.Tag)
+        self.mapping = mapping
+        self.fmt = fmt
+        self.date_format = mapping.date_format or DATE_FORMATS[fmt]
+        self.debits_negative = fmt != "csv" if mapping.debits_negative is None else mapping.debits_negative
+        self.rules = [(rule.contains.lower(), rule) for rule in mapping.rules]
+
+    def _date(self, raw: Optional[str]) -> date:
+        text = (raw or "").strip()
+        if self.fmt == "ofx":
+            text = text[:8]
+        elif self.fmt == "qif":
+            # Quicken writes 1/ 5'24 for 01/05/2024
+            text = text.replace("'", "/").replace(" ", "")
+        if self.date_format == "%Y-%m-%d":
+            # strptime dominates parsing time; ISO dates have a much faster path
+            try:
+                return date.fromisoformat(text)
+            except ValueError:
+                raise RowError(f"invalid date {raw!r}")
+        for fmt in (self.date_format, "%m/%d/%y") if self.fmt == "qif" else (self.date_format,):
+            try:
+                return datetime.strptime(text, fmt).date()
+            except ValueError:
+                continue
+        raise RowError(f"invalid date {raw!r}")
+
+    def _amount(self, raw: Optional[str]) -> Optional[Decimal]:
+        text = (raw or "").strip()
+        negative = text.startswith("(") and text.endswith(")")
+        try:
+            amount = Decimal(_AMOUNT_NOISE.sub("", text)).quantize(CENT)
+        except InvalidOperation:
+            raise RowError(f"invalid amount {raw!r}")
+        if negative:
+            amount = -amount
+        if self.debits_negative:
+            # Credits (deposits, refunds) are not expenses
+            return -amount if amount < 0 else None
+        if amount <= 0:
+            raise RowError(f"amount must be positive, got {raw!r}")
+        return amount
+
+    def __call__(self, record: Dict[str, Optional[str]]) -> Optional[Dict[str, Any]]:
+        amount = self._amount(record["amount"])
+        if amount is None:
+            return None
+        day = self._date(record["date"])
+        description = (record["description"] or "").strip() or None
+        rule = None
+        if description and self.rules:
+            lowered = description.lower()
+            rule = next((rule for pattern, rule in self.rules if pattern in lowered), None)
+
+        category_id = self.categories.get((record["category"] or "").strip().lower())
+        if category_id is None:
+            category_id = (rule and rule.category_id) or self.mapping.default_category_id
+        if category_id is None:
+            raise RowError(f"no category for {record['category'] or description!r}")
+        account_id = self.accounts.get((record["account"] or "").strip().lower())
+        if account_id is None:
+            account_id = (rule and rule.account_id) or self.mapping.default_account_id
+
+        tag_ids = set(rule.tag_ids) if rule else set()
+        if record["tags"]:
+            for name in record["tags"].split(self.mapping.tag_separator):
+                tag_id = self.tags.get(name.strip().lower())
+                if tag_id is not None:
+                    tag_ids.add(tag_id)
+        return {
+            "date": day,
+            "amount": amount,
+            "description": description,
+            "category_id": category_id,
+            "account_id": account_id,
+            "tag_ids": sorted(tag_ids),
+        }
+
+
+def _resolved(records: Iterable[Tuple[int, Dict[str, Optional[str]]]], resolve: _Resolver) -> Iterator[Result]:
+    for number, record in records:
+        try:
+            yield resolve(record), None
+        except RowError as exc:
+            yield None, f"record {number}: {exc}"
+
+
+def _chunks(results: Iterable[Result], size: int) -> Iterator[List[Result]]:
+    iterator = iter(results)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _write_chunk(db: Session, job: models.ImportJob, chunk: List[Result]):
+    rows = [row for row, _ in chunk if row is not None]
+    errors = [error for _, error in chunk if error]
+    skipped = len(chunk) - len(rows) - len(errors)
+    for row in rows:
+        row["fingerprint"] = duplicates.fingerprint(row["date"], row["amount"], row["account_id"], row["description"])
+
+    if job.dedupe and rows:
+        # Exact fingerprint matches against what existed before the import started
+        existing = dict(db.execute(
+            select(Expense.fingerprint, func.min(Expense.id))
+            .where(Expense.fingerprint.in_({row["fingerprint"] for row in rows}), Expense.id <= job.baseline_expense_id)
+            .group_by(Expense.fingerprint)
+        ).all())
+        if job.dedupe == "skip":
+            kept = [row for row in rows if row["fingerprint"] not in existing]
+            skipped += len(rows) - len(kept)
+            rows = kept
+        else:
+            for row in rows:
+                row["duplicate_of_id"] = existing.get(row["fingerprint"])
+
+    if rows:
+        # Batched multi-row INSERT; RETURNING order is not guaranteed, so ids are matched
+        # back on the row values (rows equal in all of them are interchangeable)
+        pending: Dict[Tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for row in rows:
+            pending[(row["fingerprint"], row["description"], row["category_id"])].append(row)
+        table = Expense.__table__
+        for inserted in db.execute(
+            insert(table).returning(table.c.id, table.c.fingerprint, table.c.description, table.c.category_id),
+            [{key: value for key, value in row.items() if key != "tag_ids"} for row in rows]
+        ):
+            pending[(inserted.fingerprint, inserted.description, inserted.category_id)].pop()["id"] = inserted.id
+        links = [{"expense_id": row["id"], "tag_id": tag_id} for row in rows for tag_id in row["tag_ids"]]
+        if links:
+            db.execute(insert(models.ExpenseTag.__table__), links)
+        sync.record(db, "expense", [row["id"] for row in rows])
+
+        # One snapshot and budget total adjustment per account (category) and month instead of one per row
+        spend: Dict[Tuple[int, date], Decimal] = defaultdict(Decimal)
+        category_spend: Dict[Tuple[int, date], Decimal] = defaultdict(Decimal)
+        for row in rows:
+            month = row["date"].replace(day=1)
+            if row["account_id"]:
+                spend[(row["account_id"], month)] += row["amount"]
+            category_spend[(row["category_id"], month)] += row["amount"]
+        for (account_id, month), delta in spend.items():
+            balances.apply_spend(db, account_id, month, delta)
+        for (category_id, month), delta in category_spend.items():
+            budget_alerts.apply_spend(db, category_id, month, delta)
+
+        for row in rows:
+            events.publish_after_commit(db, "expense.changed", {"before": None, "after": {
+                key: row[key] for key in ("id", "date", "amount", "category_id", "account_id", "tag_ids")
+            }})
+
+    job.rows_read += len(chunk)
+    job.rows_imported += len(rows)
+    job.rows_skipped += skipped
+    job.rows_failed += len(errors)
+    job.chunks_committed += 1
+    if errors:
+        kept_errors = json.loads(job.errors or "[]")
+        if len(kept_errors) < MAX_ERRORS:
+            job.errors = json.dumps((kept_errors + errors)[:MAX_ERRORS])
+    db.commit()
+
+
+def resumable(job: models.ImportJob) -> bool:
+    if job.status in ("pending", "failed"):
+        return True
+    if job.status != "running" or job.updated_at is None:
+        return False
+    updated_at = job.updated_at if job.updated_at.tzinfo else job.updated_at.replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc) - updated_at > timedelta(seconds=STALE_SECONDS)
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Mark the job running unless another worker is actively processing it."""
+    stale = datetime.now(timezone.utc) - timedelta(seconds=STALE_SECONDS)
+    claimed = db.execute(
+        update(Job)
+        .where(Job.id == job_id, or_(
+            Job.status.in_(("pending", "failed")),
+            and_(Job.status == "running", Job.updated_at < stale),
+        ))
+        .values(status="running", error=None, updated_at=func.now())
+    ).rowcount
+    db.commit()
+    return bool(claimed)
+
+
+def run(engine: Engine, job_id: int):
+    """Process (or resume) an import job; safe to call for a job that is already running."""
+    with Session(engine) as db:
+        if not _claim(db, job_id):
+            return
+        job = db.get(Job, job_id)
+        try:
+            mapping = schemas.ImportMapping.model_validate_json(job.mapping or "{}")
+            resolve = _Resolver(db, mapping, job.format)
+            records = enumerate(PARSERS[job.format](job.upload_path, mapping), start=1)
+            # Records up to rows_read were committed by an earlier run
+            remaining = itertools.islice(records, job.rows_read, None)
+            for chunk in _chunks(_resolved(remaining, resolve), CHUNK_SIZE):
+                _write_chunk(db, job, chunk)
+        except Exception as exc:
+            logger.exception("Import job %s failed", job_id)
+            db.rollback()
+            db.execute(update(Job).where(Job.id == job_id).values(status="failed", error=str(exc)))
+            db.commit()
+            return
+
+        job.status = "completed"
+        job.finished_at = func.now()
+        db.commit()
+        try:
+            os.remove(job.upload_path)
+        except OSError:
+            pass
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def submit(engine: Engine, job_id: int) -> Future:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="import")
+    return _executor.submit(run, engine, job_id)
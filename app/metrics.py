@@ -0,0 +1,317 @@
+# backend/app/metrics.py
+"""Prometheus metrics for the API, the database pool and background work.
+
+Recording takes no lock: every thread updates its own shard (plain dicts
+reached through a ``threading.local``) and the shards are only summed when
+``/metrics`` is scraped, so a request costs a few dict updates.
+
+With several worker processes set ``METRICS_DIR``: every process writes
+its totals to ``METRICS_DIR/<pid>.json`` every ``METRICS_FLUSH_SECONDS``
+and on each scrape, and a scrape merges the files of all workers.
+Counters and histograms of exited workers keep counting towards the
+totals; their gauges are dropped. Empty the directory on deploy.
+"""
+import asyncio
+import bisect
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+# name -> (type, help, label names)
+METRICS: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    "http_requests_total": ("counter", "HTTP requests by route and status", ("method", "route", "status")),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency", ("method", "route")),
+    "http_requests_in_progress": ("gauge", "HTTP requests being served", ("method",)),
+    "db_queries_total": ("counter", "SQL statements executed", ()),
+    "db_query_seconds_total": ("counter", "Time spent executing SQL statements", ()),
+    "db_pool_size": ("gauge", "Connections the pool keeps open", ()),
+    "db_pool_checked_out": ("gauge", "Connections in use", ()),
+    "db_pool_checked_in": ("gauge", "Idle connections in the pool", ()),
+    "db_pool_overflow": ("gauge", "Connections open beyond the pool size", ()),
+    "cache_requests_total": ("counter", "Cache lookups by result", ("cache", "result")),
+    "recurring_expenses_generated_total": ("counter", "Expenses generated from recurring rules", ()),
+    "recurring_rules_processed_total": ("counter", "Due recurring rules processed", ()),
+    "recurring_generation_seconds": ("histogram", "Duration of one recurring generation batch", ()),
+}
+
+
+class _Shard:
+    __slots__ = ("values", "histograms")
+
+    def __init__(self):
+        # Counters and gauges, by (name, labels)
+        self.values: Dict[Tuple[str, Labels], float] = {}
+        # Non-cumulative bucket counts followed by the sum, by (name, labels)
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+
+
+_local = threading.local()
+_shards: List[_Shard] = []
+_shards_lock = threading.Lock()
+_collectors: List[Callable[[], Iterable[Tuple[str, Labels, float]]]] = []
+
+
+def _shard() -> _Shard:
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+        return shard
+
+
+def inc(name: str, labels: Labels = (), value: float = 1):
+    """Add to a counter, or to a gauge when ``value`` is negative."""
+    values = _shard().values
+    key = (name, labels)
+    values[key] = values.get(key, 0) + value
+
+
+def observe(name: str, labels: Labels, value: float):
+    histograms = _shard().histograms
+    key = (name, labels)
+    buckets = histograms.get(key)
+    if buckets is None:
+        buckets = histograms[key] = [0] * (len(BUCKETS) + 2)
+    buckets[bisect.bisect_left(BUCKETS, value)] += 1
+    buckets[-1] += value
+
+
+def register_collector(collector: Callable[[], Iterable[Tuple[str, Labels, float]]]):
+    """Gauges computed at scrape time, e.g. pool statistics."""
+    _collectors.append(collector)
+
+
+# Aggregation
+
+def snapshot() -> Dict[str, Any]:
+    """This process's totals, JSON-serializable: {"values": [...], "histograms": [...], "gauges": [...]}."""
+    values: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], List[float]] = {}
+    with _shards_lock:
+        shards = list(_shards)
+    for shard in shards:
+        # list() copies in one step, so owners may keep writing meanwhile
+        for key, value in list(shard.values.items()):
+            values[key] = values.get(key, 0) + value
+        for key, buckets in list(shard.histograms.items()):
+            total = histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+            for index, count in enumerate(list(buckets)):
+                total[index] += count
+    gauges = []
+    for collector in _collectors:
+        try:
+            gauges.extend(collector())
+        except Exception:
+            logger.exception("Metrics collector %r failed", collector)
+    return {
+        "values": [[name, list(labels), value] for (name, labels), value in values.items()],
+        "histograms": [[name, list(labels), buckets] for (name, labels), buckets in histograms.items()],
+        "gauges": [[name, list(labels), value] for name, labels, value in gauges],
+    }
+
+
+def flush(metrics_dir: Optional[str] = METRICS_DIR):
+    if not metrics_dir:
+        return
+    os.makedirs(metrics_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=metrics_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, os.path.join(metrics_dir, f"{os.getpid()}.json"))
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _snapshots(metrics_dir: Optional[str]) -> List[Tuple[bool, Dict[str, Any]]]:
+    """(process alive, snapshot) for every worker, this one included."""
+    if not metrics_dir:
+        return [(True, snapshot())]
+    flush(metrics_dir)
+    result = []
+    for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced or truncated
+        pid = os.path.splitext(os.path.basename(path))[0]
+        result.append((pid.isdigit() and _alive(int(pid)), data))
+    return result
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Iterable[str], values: Iterable[Any], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render(metrics_dir: Optional[str] = METRICS_DIR) -> str:
+    """All workers' metrics in the Prometheus text exposition format."""
+    values: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], List[float]] = {}
+    for alive, data in _snapshots(metrics_dir):
+        for name, labels, value in data["values"] + (data["gauges"] if alive else []):
+            if alive or METRICS.get(name, ("gauge",))[0] != "gauge":
+                key = (name, tuple(labels))
+                values[key] = values.get(key, 0) + value
+        for name, labels, buckets in data["histograms"]:
+            total = histograms.setdefault((name, tuple(labels)), [0] * (len(BUCKETS) + 2))
+            for index, count in enumerate(buckets):
+                total[index] += count
+
+    lines = []
+    for name, (kind, help_text, label_names) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for (metric, labels), buckets in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), buckets):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(label_names, labels)} {buckets[-1]}")
+                lines.append(f"{name}_count{_labels(label_names, labels)} {cumulative}")
+        else:
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(label_names, labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Instrumentation
+
+def _route_path(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        # Answered before reaching the router (idempotent replays, 409, 422):
+        # match the app's routes here so the request keeps its route label
+        for candidate in getattr(getattr(scope.get("app"), "router", None), "routes", ()):
+            if candidate.matches(scope)[0] == Match.FULL:
+                route = candidate
+                break
+    return route.path if route is not None else "unmatched"
+
+
+class MetricsMiddleware:
+    """Counts and times requests per route template (``/api/v1/expenses/{expense_id}``)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        inc("http_requests_in_progress", (method,))
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            # Unmatched paths share one label
+            path = _route_path(scope)
+            inc("http_requests_in_progress", (method,), -1)
+            inc("http_requests_total", (method, path, str(status[0])))
+            observe("http_request_duration_seconds", (method, path), elapsed)
+
+
+def instrument_engine(engine: Engine):
+    """Count and time SQL statements and report pool statistics of ``engine``."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_query_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        inc("db_queries_total")
+        started = conn.info.pop("metrics_query_start", None)
+        if started is not None:
+            inc("db_query_seconds_total", (), time.perf_counter() - started)
+
+    def pool_stats():
+        pool = engine.pool
+        for name, attribute in (
+            ("db_pool_size", "size"),
+            ("db_pool_checked_out", "checkedout"),
+            ("db_pool_checked_in", "checkedin"),
+            ("db_pool_overflow", "overflow"),
+        ):
+            if hasattr(pool, attribute):
+                # QueuePool.overflow() counts up from -size while the pool fills
+                yield name, (), max(getattr(pool, attribute)(), 0)
+
+    register_collector(pool_stats)
+
+
+_task: Optional[asyncio.Task] = None
+
+
+async def run_flusher(metrics_dir: str):
+    while True:
+        await asyncio.sleep(FLUSH_SECONDS)
+        try:
+            await asyncio.to_thread(flush, metrics_dir)
+        except Exception:
+            logger.exception("Writing metrics snapshot failed")
+
+
+def start(metrics_dir: Optional[str] = METRICS_DIR):
+    """Start writing this worker's snapshot file; no-op without METRICS_DIR."""
+    global _task
+    if _task is None and metrics_dir:
+        _task = asyncio.get_running_loop().create_task(run_flusher(metrics_dir), name="metrics-flush")
+
+
+async def stop(metrics_dir: Optional[str] = METRICS_DIR):
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+        flush(metrics_dir)
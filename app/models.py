@@ -1,5 +1,5 @@
 # backend/app/models.py
-from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Numeric, UniqueConstraint, func, Boolean
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Numeric, UniqueConstraint, Index, func, Boolean, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -40,8 +40,16 @@ class Expense(Base):
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     account_id = Column(Integer, ForeignKey("accounts.id"), nullable=True)
     receipt_path = Column(String(255), nullable=True)
+    recurring_id = Column(Integer, ForeignKey("recurring_expenses.id", ondelete="SET NULL"), nullable=True)
+    fingerprint = Column(String(40), nullable=True, index=True)  # see app/duplicates.py
+    duplicate_of_id = Column(Integer, nullable=True)  # no FK: ids are not unique alone once partitioned
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+    # One generated expense per recurring rule and occurrence date
+    __table_args__ = (
+        Index("uq_expense_recurring_occurrence", "recurring_id", "date", unique=True),
+        Index("ix_expenses_account_date", "account_id", "date"),
+    )
     category = relationship("Category", back_populates="expenses")
     account = relationship("Account", back_populates="expenses")
     tags = relationship("Tag", secondary="expense_tags", back_populates="expenses")
@@ -58,6 +66,7 @@ class Budget(Base):
     year = Column(Integer, nullable=False)
     month = Column(Integer, nullable=False)
     amount = Column(Numeric(12, 2), nullable=False)
+    thresholds = Column(String(100), nullable=True)  # alert percents, e.g. "50,80,100"; NULL = default
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     __table_args__ = (UniqueConstraint("category_id", "year", "month", name="uq_budget_cat_month"),)
@@ -71,6 +80,8 @@ class RecurringExpense(Base):
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     interval = Column(String(20), nullable=False)  # 'monthly', 'weekly', dll
     next_date = Column(Date, nullable=False)
+    # Anchor of the series: every occurrence is computed from it, never from next_date
+    start_date = Column(Date, nullable=True)
     end_date = Column(Date, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
@@ -86,3 +97,101 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+# Closing balance of an account at the end of every month that has expenses on it
+class AccountBalanceSnapshot(Base):
+    __tablename__ = "account_balance_snapshots"
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    spent = Column(Numeric(14, 2), nullable=False, default=0)
+    closing_balance = Column(Numeric(14, 2), nullable=False)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+# Change counter per reference table, used to invalidate per-process caches
+class ReferenceVersion(Base):
+    __tablename__ = "reference_versions"
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# Statement import processed in the background; progress commits with every chunk
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String(255), nullable=True)
+    format = Column(String(10), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # uploading, pending, running, completed, failed
+    mapping = Column(Text, nullable=True)  # schemas.ImportMapping as JSON
+    dedupe = Column(String(10), nullable=True)
+    upload_path = Column(String(255), nullable=True)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    # Duplicates are only looked for among expenses that existed before the import
+    baseline_expense_id = Column(Integer, nullable=False, default=0)
+    rows_read = Column(Integer, nullable=False, default=0)
+    rows_imported = Column(Integer, nullable=False, default=0)
+    rows_skipped = Column(Integer, nullable=False, default=0)
+    rows_failed = Column(Integer, nullable=False, default=0)
+    chunks_committed = Column(Integer, nullable=False, default=0)
+    errors = Column(Text, nullable=True)  # JSON list of the first row errors
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+# First response to a request sent with an Idempotency-Key, replayed on retries
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    scope = Column(String(64), primary_key=True)  # "user:<id>"
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(20), nullable=False, default="in_progress")  # in_progress, done
+    response_status = Column(Integer, nullable=True)
+    content_type = Column(String(100), nullable=True)
+    body = Column(LargeBinary, nullable=True)  # zlib-compressed
+    locked_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+# Latest change per synced row; seq comes from the "sync" counter in reference_versions
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    id = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False)
+    entity = Column(String(20), nullable=False)  # expense, category, tag, account, budget, recurring
+    entity_id = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+    archived = Column(Boolean, nullable=False, default=False)  # deleted by moving to the cold archive
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    __table_args__ = (
+        UniqueConstraint("entity", "entity_id", name="uq_change_log_entity"),
+        Index("ix_change_log_seq", "seq", "entity", "entity_id"),
+    )
+
+# Running spend per category and month, adjusted by every expense write
+class BudgetSpend(Base):
+    __tablename__ = "budget_spend"
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    spent = Column(Numeric(14, 2), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+# Budget threshold crossings; pending rows are the webhook outbox
+class BudgetAlert(Base):
+    __tablename__ = "budget_alerts"
+    id = Column(Integer, primary_key=True, index=True)
+    budget_id = Column(Integer, ForeignKey("budgets.id", ondelete="CASCADE"), nullable=False)
+    category_id = Column(Integer, nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    threshold = Column(Integer, nullable=False)  # percent of the budget amount
+    spent = Column(Numeric(14, 2), nullable=False)
+    budget_amount = Column(Numeric(12, 2), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, delivered, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+    __table_args__ = (
+        UniqueConstraint("budget_id", "threshold", name="uq_budget_alert_threshold"),
+        Index("ix_budget_alerts_outbox", "status", "next_attempt_at"),
+    )
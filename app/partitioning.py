@@ -0,0 +1,339 @@
+# backend/app/partitioning.py
+"""Optional native monthly range partitioning of ``expenses`` on ``date`` (PostgreSQL only).
+
+Partitions are named ``expenses_pYYYYMM`` and cover ``[first day, first day of next month)``.
+Every helper is a no-op on other dialects or when ``expenses`` is a plain table,
+so it is safe to call them unconditionally (e.g. from application startup).
+"""
+import gzip
+import logging
+import os
+import time
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+from .utils.date_utils import add_months, get_month_range
+
+TABLE = "expenses"
+DEFAULT_PARTITION = "expenses_default"
+MONTHS_AHEAD = int(os.getenv("EXPENSE_PARTITIONS_AHEAD", "3"))
+ARCHIVE_DIR = os.getenv("EXPENSE_PARTITION_ARCHIVE_DIR", "archive/partitions")
+DETACH_LOCK_TIMEOUT = os.getenv("EXPENSE_PARTITION_LOCK_TIMEOUT", "5s")
+DETACH_RETRIES = int(os.getenv("EXPENSE_PARTITION_LOCK_RETRIES", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"{TABLE}_p{year:04d}{month:02d}"
+
+
+def partition_bounds(year: int, month: int) -> Tuple[date, date]:
+    start, _ = get_month_range(year, month)
+    return start, add_months(start, 1)
+
+
+def is_partitioned(conn: Connection, table: str = TABLE) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :table"
+    ), {"table": table}).first())
+
+
+def list_partitions(conn: Connection, table: str = TABLE) -> List[str]:
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table ORDER BY c.relname"
+    ), {"table": table})
+    return [row[0] for row in rows]
+
+
+def create_partition(conn: Connection, year: int, month: int, table: str = TABLE):
+    start, end = partition_bounds(year, month)
+    name = partition_name(year, month).replace(TABLE, table, 1)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+
+
+def _create_partition_from_default(conn: Connection, year: int, month: int, table: str = TABLE):
+    """``create_partition`` that first moves the month's rows out of the DEFAULT partition.
+
+    PostgreSQL refuses a new partition while the DEFAULT one holds rows in its
+    range (e.g. an expense dated a few months ahead), so the DEFAULT partition
+    is detached, the month's rows moved over and the DEFAULT reattached, all
+    in the caller's transaction.
+    """
+    default_name = DEFAULT_PARTITION.replace(TABLE, table, 1)
+    name = partition_name(year, month).replace(TABLE, table, 1)
+    start, end = partition_bounds(year, month)
+    in_range = "date >= :start AND date < :end"
+    bounds = {"start": start, "end": end}
+    if not conn.execute(text(f"SELECT 1 FROM {default_name} WHERE {in_range} LIMIT 1"), bounds).first():
+        create_partition(conn, year, month, table)
+        return
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default_name}"))
+    create_partition(conn, year, month, table)
+    moved = conn.execute(text(f"INSERT INTO {name} SELECT * FROM {default_name} WHERE {in_range}"), bounds).rowcount
+    conn.execute(text(f"DELETE FROM {default_name} WHERE {in_range}"), bounds)
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default_name} DEFAULT"))
+    logger.info("Moved %d rows from %s into the new partition %s", moved, default_name, name)
+
+
+def ensure_partitions(
+    engine: Engine,
+    months_ahead: int = MONTHS_AHEAD,
+    start: Optional[date] = None,
+    table: str = TABLE,
+) -> int:
+    """Create monthly partitions from ``start`` (default: this month) through ``months_ahead`` months ahead.
+
+    Rows outside all partitions land in a DEFAULT partition so inserts never fail.
+    Each month is created in its own transaction and a failure is logged rather
+    than raised, so application startup survives it.
+    Returns the number of partitions that exist for the requested window.
+    """
+    with engine.connect() as conn:
+        if not is_partitioned(conn, table):
+            return 0
+        existing = set(list_partitions(conn, table))
+    default_name = DEFAULT_PARTITION.replace(TABLE, table, 1)
+    current = (start or date.today()).replace(day=1)
+    created = 0
+    for offset in range(months_ahead + 1):
+        month_start = add_months(current, offset)
+        name = partition_name(month_start.year, month_start.month).replace(TABLE, table, 1)
+        if name not in existing:
+            try:
+                with engine.begin() as conn:
+                    if default_name in existing:
+                        _create_partition_from_default(conn, month_start.year, month_start.month, table)
+                    else:
+                        create_partition(conn, month_start.year, month_start.month, table)
+            except Exception:
+                logger.exception("Could not create partition %s", name)
+                continue
+        created += 1
+    if default_name not in existing:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default_name} PARTITION OF {table} DEFAULT"))
+    return created
+
+
+def detach_partition(engine: Engine, year: int, month: int, table: str = TABLE) -> Optional[str]:
+    """Detach one month from ``expenses``; the partition survives as a standalone table.
+
+    PostgreSQL refuses DETACH ... CONCURRENTLY while the table has a DEFAULT
+    partition, which ``ensure_partitions`` always creates. The plain DETACH
+    used then needs a short exclusive lock on ``expenses``; it is taken under
+    a ``lock_timeout`` and retried, so it never queues behind a long
+    transaction while blocking every other query. Without a DEFAULT
+    partition the detach runs CONCURRENTLY (PostgreSQL 14+).
+    """
+    name = partition_name(year, month).replace(TABLE, table, 1)
+    with engine.connect() as conn:
+        partitions = list_partitions(conn, table)
+    if name not in partitions:
+        return None
+    if DEFAULT_PARTITION.replace(TABLE, table, 1) not in partitions:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY"))
+        return name
+    for attempt in range(1, DETACH_RETRIES + 1):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+                conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            return name
+        except OperationalError as e:
+            if "lock timeout" not in str(e).lower() or attempt == DETACH_RETRIES:
+                raise
+            logger.warning("Detaching %s timed out waiting for a lock, retrying (%d/%d)", name, attempt, DETACH_RETRIES)
+            time.sleep(min(2 ** attempt, 30))
+
+
+def archive_partitions(engine: Engine, before: date, archive_dir: str = ARCHIVE_DIR, table: str = TABLE) -> List[str]:
+    """Detach every partition that ends on or before ``before``, dump it to a gzip CSV and drop it.
+
+    The dump includes the matching ``expense_tags`` rows so the month can be
+    restored with COPY.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    with engine.connect() as conn:
+        partitions = [p for p in list_partitions(conn, table) if p != DEFAULT_PARTITION.replace(TABLE, table, 1)]
+
+    archived = []
+    for name in partitions:
+        suffix = name.rsplit("_p", 1)[-1]
+        year, month = int(suffix[:4]), int(suffix[4:])
+        _, end = partition_bounds(year, month)
+        if end > before:
+            continue
+
+        detach_partition(engine, year, month, table)
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            with gzip.open(os.path.join(archive_dir, f"{name}.csv.gz"), "wt") as out:
+                cursor.copy_expert(f"COPY {name} TO STDOUT WITH CSV HEADER", out)
+            with gzip.open(os.path.join(archive_dir, f"{name}_tags.csv.gz"), "wt") as out:
+                cursor.copy_expert(
+                    f"COPY (SELECT et.* FROM expense_tags et JOIN {name} e ON e.id = et.expense_id) "
+                    "TO STDOUT WITH CSV HEADER",
+                    out,
+                )
+            cursor.execute(f"DELETE FROM expense_tags WHERE expense_id IN (SELECT id FROM {name})")
+            cursor.execute(f"DROP TABLE {name}")
+            raw.commit()
+        finally:
+            raw.close()
+        archived.append(name)
+    return archived
+
+
+def convert_to_partitioned(engine: Engine, batch_size: Optional[int] = None, throttle: Optional[float] = None):
+    """Turn the plain ``expenses`` table into a monthly range-partitioned one, online.
+
+    A shadow table is filled in resumable primary-key batches while a trigger
+    mirrors concurrent writes into it; the final swap is one short transaction.
+    The partition key must be part of every unique constraint, so the primary
+    key becomes ``(id, date)`` and the ``expense_tags.expense_id`` foreign key
+    is dropped (PostgreSQL cannot reference a partitioned table by ``id`` alone).
+    ``LIKE`` does not copy foreign keys, so those of ``expenses`` (with their
+    ON DELETE actions) are added to the shadow table before the copy and
+    checked for every copied row. Every other index of ``expenses`` is rebuilt on the shadow table before the
+    copy and takes over its name at the swap; a unique index without ``date``
+    cannot exist on the partitioned table and is skipped with a warning.
+    Returns False when ``expenses`` was already partitioned.
+    """
+    from migrations.ops import Operations
+
+    shadow = f"{TABLE}_partitioned"
+    op = Operations(engine, "expenses_partitioning")
+
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            return False
+        bounds = conn.execute(text(f"SELECT MIN(date), MAX(date) FROM {TABLE}")).first()
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {shadow} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (date)"
+        ))
+        conn.execute(text(
+            f"DO $$ BEGIN "
+            f"IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{shadow}_pkey') THEN "
+            f"ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_pkey PRIMARY KEY (id, date); "
+            f"END IF; END $$"
+        ))
+
+    _copy_foreign_keys(engine, TABLE, shadow)
+    indexes = _copy_indexes(engine, TABLE, shadow)
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_category_date ON {shadow} (category_id, date)"))
+
+    first = (bounds[0] or date.today()).replace(day=1)
+    last = (bounds[1] or date.today()).replace(day=1)
+    months = (last.year - first.year) * 12 + last.month - first.month
+    ensure_partitions(engine, months_ahead=months + MONTHS_AHEAD, start=first, table=shadow)
+
+    with engine.begin() as conn:
+        # Mirror writes that happen while the copy runs
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {shadow}_sync() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM {shadow} WHERE id = OLD.id;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {shadow} SELECT NEW.* ON CONFLICT DO NOTHING;
+                END IF;
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {shadow}_sync ON {TABLE}"))
+        conn.execute(text(
+            f"CREATE TRIGGER {shadow}_sync AFTER INSERT OR UPDATE OR DELETE ON {TABLE} "
+            f"FOR EACH ROW EXECUTE FUNCTION {shadow}_sync()"
+        ))
+
+    def copy_batch(conn: Connection, lo: int, hi: int):
+        conn.execute(text(
+            f"INSERT INTO {shadow} SELECT * FROM {TABLE} WHERE id > :lo AND id <= :hi ON CONFLICT DO NOTHING"
+        ), {"lo": lo, "hi": hi})
+
+    op.run_batched("copy", TABLE, copy_batch, batch_size=batch_size, throttle=throttle)
+
+    with engine.begin() as conn:
+        conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+        conn.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {shadow}_sync ON {TABLE}"))
+        conn.execute(text(f"DROP FUNCTION IF EXISTS {shadow}_sync()"))
+        conn.execute(text("ALTER TABLE expense_tags DROP CONSTRAINT IF EXISTS expense_tags_expense_id_fkey"))
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned"))
+        conn.execute(text(f"ALTER TABLE {shadow} RENAME TO {TABLE}"))
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS {TABLE}_id_seq OWNED BY {TABLE}.id"))
+        for name in list_partitions(conn, TABLE):
+            conn.execute(text(f"ALTER TABLE {name} RENAME TO {name.replace(shadow, TABLE, 1)}"))
+        for name, shadow_name in indexes:
+            conn.execute(text(f"ALTER INDEX {name} RENAME TO {_index_name(name, 'unpartitioned')}"))
+            conn.execute(text(f"ALTER INDEX {shadow_name} RENAME TO {name}"))
+    op.clear_progress()
+    logger.info("expenses is now partitioned; the old table is kept as %s_unpartitioned", TABLE)
+    return True
+
+
+def _index_name(name: str, suffix: str) -> str:
+    # PostgreSQL truncates identifiers to 63 bytes
+    return f"{name[:62 - len(suffix)]}_{suffix}"
+
+
+def _copy_foreign_keys(engine: Engine, table: str, shadow: str) -> List[str]:
+    """Add every foreign key of ``table`` to ``shadow`` under the same name; returns the names."""
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            "SELECT c.conname, pg_get_constraintdef(c.oid) FROM pg_constraint c "
+            "JOIN pg_class t ON t.oid = c.conrelid WHERE t.relname = :table AND c.contype = 'f' ORDER BY c.conname"
+        ), {"table": table}).all()
+        present = set(conn.execute(text(
+            "SELECT c.conname FROM pg_constraint c JOIN pg_class t ON t.oid = c.conrelid WHERE t.relname = :table"
+        ), {"table": shadow}).scalars())
+        for name, definition in rows:
+            # Constraint names are per table, so the shadow keeps the original names through the swap
+            if name not in present:
+                conn.execute(text(f"ALTER TABLE {shadow} ADD CONSTRAINT {name} {definition}"))
+    return [name for name, _ in rows]
+
+
+def _copy_indexes(engine: Engine, table: str, shadow: str) -> List[Tuple[str, str]]:
+    """Create every non-primary-key index of ``table`` on ``shadow``; returns (name, shadow name) pairs."""
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT i.relname, pg_get_indexdef(i.oid), x.indisunique, "
+            "EXISTS (SELECT 1 FROM pg_attribute a WHERE a.attrelid = x.indrelid "
+            "AND a.attname = 'date' AND a.attnum = ANY(x.indkey)) "
+            "FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid JOIN pg_class t ON t.oid = x.indrelid "
+            "WHERE t.relname = :table AND NOT x.indisprimary ORDER BY i.relname"
+        ), {"table": table}).all()
+    indexes = []
+    for name, definition, unique, has_date in rows:
+        if unique and not has_date:
+            logger.warning("Skipping unique index %s: a partitioned table needs date in every unique index", name)
+            continue
+        shadow_name = _index_name(name, "new")
+        # "CREATE [UNIQUE] INDEX name ON [ONLY] schema.table USING ..." -> same index on the shadow table
+        head, _, rest = definition.partition(" ON ")
+        using = rest[rest.index(" USING "):]
+        statement = head.replace(f" INDEX {name}", f" INDEX IF NOT EXISTS {shadow_name}", 1) + f" ON {shadow}{using}"
+        with engine.begin() as conn:
+            conn.execute(text(statement))
+        indexes.append((name, shadow_name))
+    return indexes
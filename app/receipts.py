@@ -0,0 +1,289 @@
+# backend/app/receipts.py
+"""Content-addressed receipt storage.
+
+Uploads are streamed to a temporary file while their SHA-256 is computed
+and then moved to ``RECEIPT_DIR/ab/cd/<sha256><ext>``, so identical
+receipts are stored once and a stored file never changes: the hash is a
+strong ETag and responses can be cached forever. ``Expense.receipt_path``
+holds the key relative to ``RECEIPT_DIR``.
+
+Downloads honour ``If-None-Match``/``If-Modified-Since`` and single
+``Range`` requests. The body is handed to the server with the ASGI
+zero-copy extension when it is available and read in blocks otherwise.
+Image thumbnails are rendered by a background pool (Pillow is optional;
+without it there are no thumbnails).
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from typing import BinaryIO, Mapping, Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are optional
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_DIR = os.getenv("RECEIPT_DIR", "data/receipts")
+MAX_BYTES = int(os.getenv("RECEIPT_MAX_BYTES", str(10 * 1024 * 1024)))
+THUMBNAIL_SIZE = int(os.getenv("RECEIPT_THUMBNAIL_SIZE", "320"))
+THUMBNAIL_WORKERS = int(os.getenv("RECEIPT_THUMBNAIL_WORKERS", "2"))
+BLOCK_SIZE = 64 * 1024
+
+# Leading bytes -> (content type, extension); the client's Content-Type is not trusted
+SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+    (b"GIF87a", "image/gif", ".gif"),
+    (b"GIF89a", "image/gif", ".gif"),
+    (b"%PDF-", "application/pdf", ".pdf"),
+)
+CONTENT_TYPES = {extension: content_type for _, content_type, extension in SIGNATURES}
+CONTENT_TYPES[".webp"] = "image/webp"
+THUMBNAIL_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+THUMBNAIL_SUFFIX = ".thumb.jpg"
+
+_KEY = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z]+)$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class ReceiptError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff(head: bytes) -> Optional[Tuple[str, str]]:
+    """(content type, extension) from the first bytes of a file, or None if not accepted."""
+    for signature, content_type, extension in SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    return None
+
+
+def parse_key(key: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(sha256, extension) for keys written by ``store``; None for legacy paths."""
+    match = _KEY.match(key or "")
+    return (match.group(1), match.group(2)) if match else None
+
+
+def path_for(key: str, receipt_dir: str = RECEIPT_DIR) -> str:
+    return os.path.join(receipt_dir, *key.split("/"))
+
+
+def store(source: BinaryIO, receipt_dir: str = RECEIPT_DIR, max_bytes: int = MAX_BYTES) -> Tuple[str, str, int]:
+    """Stream ``source`` into the store; returns (key, content type, size in bytes)."""
+    tmp_dir = os.path.join(receipt_dir, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        digest = hashlib.sha256()
+        head = b""
+        size = 0
+        with os.fdopen(fd, "wb") as target:
+            while block := source.read(BLOCK_SIZE):
+                if len(head) < 16:
+                    head += block[:16 - len(head)]
+                size += len(block)
+                if size > max_bytes:
+                    raise ReceiptError(413, f"Receipt larger than {max_bytes} bytes")
+                digest.update(block)
+                target.write(block)
+        if not size:
+            raise ReceiptError(400, "Receipt file is empty")
+        detected = sniff(head)
+        if detected is None:
+            raise ReceiptError(415, "Receipt must be a JPEG, PNG, GIF, WebP or PDF file")
+        content_type, extension = detected
+
+        sha256 = digest.hexdigest()
+        key = f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+        path = path_for(key, receipt_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            # Same content already stored
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+        return key, content_type, size
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Thumbnails
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_scheduled = set()
+
+
+def _render_thumbnail(source: str, target: str):
+    try:
+        with Image.open(source) as image:
+            image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+            with os.fdopen(fd, "wb") as out:
+                image.convert("RGB").save(out, "JPEG", quality=80)
+            os.replace(tmp_path, target)
+    except Exception:
+        logger.exception("Thumbnail for %s failed", source)
+    finally:
+        with _executor_lock:
+            _scheduled.discard(target)
+
+
+def schedule_thumbnail(key: str, receipt_dir: str = RECEIPT_DIR) -> bool:
+    """Queue a thumbnail for an image receipt; False if none will be made."""
+    parsed = parse_key(key)
+    if Image is None or parsed is None or CONTENT_TYPES.get(parsed[1]) not in THUMBNAIL_TYPES:
+        return False
+    source = path_for(key, receipt_dir)
+    target = source + THUMBNAIL_SUFFIX
+    if os.path.exists(target):
+        return True
+    global _executor
+    with _executor_lock:
+        if target in _scheduled:
+            return True
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnail")
+        _scheduled.add(target)
+    _executor.submit(_render_thumbnail, source, target)
+    return True
+
+
+# Downloads
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single byte range; None to send the whole file.
+
+    Raises ValueError when the range cannot be satisfied. Multiple ranges are
+    answered with the full body, which RFC 9110 allows.
+    """
+    match = _RANGE.match(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        if start >= size or start > end:
+            raise ValueError(header)
+        return start, end
+    suffix = int(match.group(2))
+    if not suffix:
+        raise ValueError(header)
+    return max(size - suffix, 0), size - 1
+
+
+def _not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class FileRangeResponse(Response):
+    """Sends ``count`` bytes of a file from ``offset``, zero-copy when the server supports it."""
+
+    def __init__(self, path: str, offset: int, count: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers={**headers, "content-length": str(count)}, media_type=media_type)
+        self.path = path
+        self.offset = offset
+        self.count = count
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD" or not self.count:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": f,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+                return
+            f.seek(self.offset)
+            remaining = self.count
+            while remaining:
+                block = await anyio.to_thread.run_sync(f.read, min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                await send({"type": "http.response.body", "body": block, "more_body": bool(remaining)})
+            if remaining:
+                # File shorter than announced; end the body rather than hang the client
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def response(key: str, headers: Mapping[str, str], thumbnail: bool = False, receipt_dir: str = RECEIPT_DIR) -> Response:
+    """Response for a stored receipt (or its thumbnail), honouring conditional and Range headers."""
+    parsed = parse_key(key)
+    if parsed is None:
+        raise ReceiptError(404, "Receipt not found")
+    sha256, extension = parsed
+    path = path_for(key, receipt_dir)
+    content_type = CONTENT_TYPES.get(extension, "application/octet-stream")
+    etag = f'"{sha256}"'
+    if thumbnail:
+        if not schedule_thumbnail(key, receipt_dir):
+            raise ReceiptError(404, "No thumbnail for this receipt")
+        path += THUMBNAIL_SUFFIX
+        content_type, extension, etag = "image/jpeg", ".jpg", f'"{sha256}-thumb"'
+        if not os.path.exists(path):
+            raise ReceiptError(404, "Thumbnail not available yet")
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise ReceiptError(404, "Receipt file missing from store")
+    common = {
+        "etag": etag,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        # Content-addressed: the bytes behind this ETag never change
+        "cache-control": "private, max-age=31536000, immutable",
+        "accept-ranges": "bytes",
+        "content-disposition": f'inline; filename="receipt{extension}"',
+    }
+    if _not_modified(headers, etag, stat.st_mtime):
+        return Response(status_code=304, headers=common)
+
+    size = stat.st_size
+    range_header = headers.get("range")
+    if_range = headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**common, "content-range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return FileRangeResponse(
+                path, start, end - start + 1, 206,
+                {**common, "content-range": f"bytes {start}-{end}/{size}"}, content_type
+            )
+    return FileRangeResponse(path, 0, size, 200, common, content_type)
@@ -0,0 +1,119 @@
+# backend/app/refcache.py
+"""Process-local cache of the small reference tables (categories, accounts, tags).
+
+Every write to one of the tables bumps its counter in ``reference_versions``
+inside the same transaction. Readers compare the cached version with the
+table at most once every ``REFCACHE_CHECK_SECONDS`` (one query for all
+tables), so writes from other workers become visible within that window
+and local writes immediately. In between, existence checks and list
+endpoints are answered from memory.
+
+Only positive existence answers are trusted from the cache; an unknown id
+is confirmed against the database so a row created moments ago by another
+worker is never rejected.
+
+Sessions with ``db.info["bypass_refcache"]`` set (batches, whose outer
+transaction may still roll back) read the tables directly and never touch
+the shared cache, so uncommitted rows cannot leak into it.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from . import events, metrics, models, schemas
+
+CHECK_SECONDS = float(os.getenv("REFCACHE_CHECK_SECONDS", "1"))
+# Upper bound for writes that bypass crud (bulk SQL, generate_data, ...)
+MAX_AGE_SECONDS = float(os.getenv("REFCACHE_MAX_AGE_SECONDS", "300"))
+
+TABLES = {
+    "categories": (models.Category, schemas.Category),
+    "accounts": (models.Account, schemas.Account),
+    "tags": (models.Tag, schemas.Tag),
+}
+
+Version = models.ReferenceVersion
+
+
+@dataclass
+class _Entry:
+    version: int
+    loaded_at: float
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    ids: Set[int] = field(default_factory=set)
+
+
+_lock = threading.Lock()
+_entries: Dict[str, _Entry] = {}
+_versions: Dict[str, int] = {}
+_checked_at = 0.0
+
+
+def bump(db: Session, name: str):
+    """Record a write to ``name``; call inside the writing transaction."""
+    updated = db.execute(
+        update(Version).where(Version.name == name).values(version=Version.version + 1)
+    ).rowcount
+    if not updated:
+        db.add(Version(name=name, version=1))
+    events.publish_after_commit(db, "reference.changed", {"name": name})
+
+
+def invalidate(payload: Optional[Dict[str, Any]] = None):
+    global _checked_at
+    with _lock:
+        if payload and payload.get("name"):
+            _entries.pop(payload["name"], None)
+        else:
+            _entries.clear()
+        _checked_at = 0.0
+
+
+events.subscribe("reference.changed", invalidate)
+
+
+def _load(db: Session, name: str, version: int, loaded_at: float) -> _Entry:
+    model, schema = TABLES[name]
+    rows = [schema.from_orm(item).model_dump(mode="json") for item in db.query(model).order_by(model.id)]
+    return _Entry(version=version, loaded_at=loaded_at, rows=rows, ids={row["id"] for row in rows})
+
+
+def _entry(db: Session, name: str) -> _Entry:
+    global _checked_at
+    now = time.monotonic()
+    if db.info.get("bypass_refcache"):
+        return _load(db, name, 0, now)
+    with _lock:
+        if now - _checked_at >= CHECK_SECONDS:
+            _versions.clear()
+            _versions.update(db.execute(select(Version.name, Version.version)).all())
+            _checked_at = now
+        version = _versions.get(name, 0)
+        entry = _entries.get(name)
+        if entry is not None and entry.version == version and now - entry.loaded_at < MAX_AGE_SECONDS:
+            metrics.inc("cache_requests_total", ("refcache", "hit"))
+            return entry
+    metrics.inc("cache_requests_total", ("refcache", "miss"))
+
+    entry = _load(db, name, version, now)
+    with _lock:
+        # A newer version seen meanwhile wins; this one is reloaded on next use
+        if _versions.get(name, 0) == version:
+            _entries[name] = entry
+    return entry
+
+
+def rows(db: Session, name: str, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+    return _entry(db, name).rows[skip:skip + limit]
+
+
+def exists(db: Session, name: str, item_id: int) -> bool:
+    if item_id in _entry(db, name).ids:
+        return True
+    model, _ = TABLES[name]
+    return db.query(model.id).filter(model.id == item_id).first() is not None
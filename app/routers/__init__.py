@@ -5,4 +5,9 @@ from . import budgets
 from . import accounts
 from . import tags
 from . import recurring
-from . import health
\ No newline at end of file
+from . import health
+from . import forecast
+from . import imports
+from . import batch
+from . import sync
+from . import metrics
\ No newline at end of file
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from fastapi.responses import JSONResponse
-from typing import List
+from typing import List, Optional
+from datetime import date, timedelta
 
 from .. import crud, schemas
 from ..database import get_db
@@ -18,20 +19,20 @@ def create_account(account: schemas.AccountCreate, db: Session = Depends(get_db)
         status_code=201,
         content={
             "status": "success",
-            "data": schemas.Account.from_orm(new_acc).dict(),
+            "data": schemas.Account.from_orm(new_acc).model_dump(mode="json"),
             "message": "Account created successfully"
         }
     )
 
 @router.get("/")
 def read_accounts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    accounts = crud.get_accounts(db, skip=skip, limit=limit)
+    accounts = crud.list_accounts(db, skip=skip, limit=limit)
     return JSONResponse(
         status_code=200,
         content={
             "status": "success",
             "data": {
-                "items": [schemas.Account.from_orm(acc).dict() for acc in accounts],
+                "items": accounts,
                 "total": len(accounts),
                 "page": 1,
                 "size": len(accounts),
@@ -41,6 +42,63 @@ def read_accounts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
         }
     )
 
+# Declared before /{account_id} so "balances" is not parsed as an id
+@router.get("/balances")
+def read_account_balances(
+    as_of: Optional[date] = Query(None, description="Balance at the end of this day (default: today)"),
+    db: Session = Depends(get_db)
+):
+    items = crud.get_account_balances(db, as_of=as_of)
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": {
+                "items": items,
+                "total": len(items),
+                "page": 1,
+                "size": len(items),
+                "pages": 1
+            },
+            "message": None
+        }
+    )
+
+@router.get("/{account_id}/balance")
+def read_account_balance(
+    account_id: int,
+    as_of: Optional[date] = Query(None, description="Balance at the end of this day (default: today)"),
+    db: Session = Depends(get_db)
+):
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": crud.get_account_balance(db, account_id=account_id, as_of=as_of),
+            "message": None
+        }
+    )
+
+@router.get("/{account_id}/balance/history")
+def read_account_balance_history(
+    account_id: int,
+    start_date: Optional[date] = Query(None, description="First day of the series (default: 90 days before end)"),
+    end_date: Optional[date] = Query(None, description="Last day of the series (default: today)"),
+    db: Session = Depends(get_db)
+):
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=90)
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="End date must not be before start date")
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": crud.get_account_balance_history(db, account_id, start_date, end_date),
+            "message": None
+        }
+    )
+
 @router.get("/{account_id}")
 def read_account(account_id: int, db: Session = Depends(get_db)):
     db_account = crud.get_account(db, account_id=account_id)
@@ -50,7 +108,7 @@ def read_account(account_id: int, db: Session = Depends(get_db)):
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.Account.from_orm(db_account).dict(),
+            "data": schemas.Account.from_orm(db_account).model_dump(mode="json"),
             "message": None
         }
     )
@@ -62,7 +120,7 @@ def update_account(account_id: int, account: schemas.AccountUpdate, db: Session
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.Account.from_orm(updated).dict(),
+            "data": schemas.Account.from_orm(updated).model_dump(mode="json"),
             "message": "Account updated successfully"
         }
     )
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+
+from .. import batch, schemas
+from ..database import get_db
+
+router = APIRouter(
+    prefix="/batch",
+    tags=["Batch"]
+)
+
+@router.post("/")
+def run_batch(request: schemas.BatchRequest, db: Session = Depends(get_db)):
+    if not request.operations:
+        raise HTTPException(status_code=400, detail="Batch has no operations")
+    if len(request.operations) > batch.MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"Batch cannot exceed {batch.MAX_OPERATIONS} operations")
+
+    outcome = batch.run(db.get_bind(), request.operations, atomic=request.atomic)
+    if not outcome["committed"]:
+        failed = outcome["results"][-1]
+        return JSONResponse(
+            status_code=failed["status"],
+            content={
+                "status": "error",
+                "data": outcome,
+                "message": f"Operation {failed['index']} ({failed['op']}) failed; batch rolled back"
+            }
+        )
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": outcome,
+            "message": f"{outcome['succeeded']} of {len(request.operations)} operations succeeded"
+        }
+    )
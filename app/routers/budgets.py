@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from fastapi.responses import JSONResponse
-from typing import List
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional
 
-from .. import crud, schemas
+from .. import budget_stream, crud, schemas
 from ..database import get_db
 
 router = APIRouter(
@@ -11,6 +11,14 @@ router = APIRouter(
     tags=["Budgets"]
 )
 
+MAX_MONTHS = 120
+
+def _parse_month(value: str, name: str):
+    year, month = (int(part) for part in value.split("-"))
+    if month < 1 or month > 12:
+        raise HTTPException(status_code=400, detail=f"{name} month must be between 1 and 12")
+    return year, month
+
 @router.post("/")
 def create_budget(budget: schemas.BudgetCreate, db: Session = Depends(get_db)):
     new_budget = crud.create_budget(db=db, budget=budget)
@@ -18,11 +26,47 @@ def create_budget(budget: schemas.BudgetCreate, db: Session = Depends(get_db)):
         status_code=201,
         content={
             "status": "success",
-            "data": schemas.Budget.from_orm(new_budget).dict(),
+            "data": schemas.Budget.from_orm(new_budget).model_dump(mode="json"),
             "message": "Budget created successfully"
         }
     )
 
+@router.post("/bulk")
+def create_budgets(bulk: schemas.BudgetBulkCreate, db: Session = Depends(get_db)):
+    counts = crud.create_budgets(db=db, bulk=bulk)
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": counts,
+            "message": f"{counts['created']} created, {counts['updated']} updated, {counts['skipped']} skipped"
+        }
+    )
+
+@router.post("/copy")
+def copy_budgets(
+    source: str = Query(..., alias="from", pattern=r"^\d{4}-\d{2}$", description="Month to copy from (YYYY-MM)"),
+    to: str = Query(..., pattern=r"^\d{4}-\d{2}$", description="First month to copy to (YYYY-MM)"),
+    through: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="Last month to copy to; default: to"),
+    db: Session = Depends(get_db)
+):
+    first = _parse_month(to, "to")
+    last = _parse_month(through, "through") if through else first
+    months = (last[0] - first[0]) * 12 + last[1] - first[1] + 1
+    if months < 1:
+        raise HTTPException(status_code=400, detail="through must not be before to")
+    if months > MAX_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_MONTHS} months")
+    counts = crud.copy_budgets(db=db, source=_parse_month(source, "from"), first=first, last=last)
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": counts,
+            "message": f"{counts['created']} created, {counts['skipped']} skipped"
+        }
+    )
+
 @router.get("/")
 def read_budgets(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     budgets = crud.get_budgets(db, skip=skip, limit=limit)
@@ -31,7 +75,7 @@ def read_budgets(skip: int = 0, limit: int = 100, db: Session = Depends(get_db))
         content={
             "status": "success",
             "data": {
-                "items": [schemas.Budget.from_orm(b).dict() for b in budgets],
+                "items": [schemas.Budget.from_orm(b).model_dump(mode="json") for b in budgets],
                 "total": len(budgets),
                 "page": 1,
                 "size": len(budgets),
@@ -43,13 +87,29 @@ def read_budgets(skip: int = 0, limit: int = 100, db: Session = Depends(get_db))
 
 @router.get("/stats")
 def read_budget_status(
-    year: int = Query(..., description="Year for budget status"),
-    month: int = Query(..., description="Month for budget status (1-12)"),
+    year: Optional[int] = Query(None, description="Year for budget status"),
+    month: Optional[int] = Query(None, description="Month for budget status (1-12)"),
+    start: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="First month of a range (YYYY-MM)"),
+    end: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="Last month of a range (YYYY-MM); default: start"),
+    rollover: bool = Query(False, description="Carry unspent budget into the next month of the range"),
     db: Session = Depends(get_db)
 ):
-    if month < 1 or month > 12:
-        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
-    status_data = crud.get_budget_status(db=db, year=year, month=month)
+    if start is not None:
+        first = _parse_month(start, "start")
+        last = _parse_month(end, "end") if end else first
+        months = (last[0] - first[0]) * 12 + last[1] - first[1] + 1
+        if months < 1:
+            raise HTTPException(status_code=400, detail="end must not be before start")
+        if months > MAX_MONTHS:
+            raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_MONTHS} months")
+        status_data = crud.get_budget_stats(db=db, start=first, end=last, rollover=rollover)
+    else:
+        if year is None or month is None:
+            raise HTTPException(status_code=400, detail="Pass year and month, or start (and end)")
+        if month < 1 or month > 12:
+            raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
+        status_data = crud.get_budget_status(db=db, year=year, month=month)
+        status_data["categories"] = [c.model_dump(mode="json") for c in status_data["categories"]]
     return JSONResponse(
         status_code=200,
         content={
@@ -59,6 +119,45 @@ def read_budget_status(
         }
     )
 
+@router.get("/alerts")
+def read_budget_alerts(
+    status: Optional[str] = Query(None, pattern="^(pending|delivered|failed)$"),
+    year: Optional[int] = None,
+    month: Optional[int] = Query(None, ge=1, le=12),
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    alerts = crud.get_budget_alerts(db, status=status, year=year, month=month, skip=skip, limit=limit)
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": {
+                "items": [schemas.BudgetAlert.from_orm(a).model_dump(mode="json") for a in alerts],
+                "total": len(alerts),
+                "page": 1,
+                "size": len(alerts),
+                "pages": 1
+            },
+            "message": None
+        }
+    )
+
+@router.get("/stream")
+async def stream_budget_status(
+    year: int = Query(..., description="Year for budget status"),
+    month: int = Query(..., description="Month for budget status (1-12)")
+):
+    if month < 1 or month > 12:
+        raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
+    budget_stream.start()
+    return StreamingResponse(
+        budget_stream.stream(year, month),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"}
+    )
+
 @router.get("/{budget_id}")
 def read_budget(budget_id: int, db: Session = Depends(get_db)):
     db_budget = crud.get_budget(db, budget_id=budget_id)
@@ -68,7 +167,7 @@ def read_budget(budget_id: int, db: Session = Depends(get_db)):
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.Budget.from_orm(db_budget).dict(),
+            "data": schemas.Budget.from_orm(db_budget).model_dump(mode="json"),
             "message": None
         }
     )
@@ -80,7 +179,7 @@ def update_budget(budget_id: int, budget: schemas.BudgetUpdate, db: Session = De
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.Budget.from_orm(updated).dict(),
+            "data": schemas.Budget.from_orm(updated).model_dump(mode="json"),
             "message": "Budget updated successfully"
         }
     )
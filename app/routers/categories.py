@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from fastapi.responses import JSONResponse
@@ -18,20 +18,20 @@ def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_
         status_code=201,
         content={
             "status": "success",
-            "data": schemas.Category.from_orm(new_cat).dict(),
+            "data": schemas.Category.from_orm(new_cat).model_dump(mode="json"),
             "message": "Category created successfully"
         }
     )
 
 @router.get("/")
 def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    categories = crud.get_categories(db, skip=skip, limit=limit)
+    categories = crud.list_categories(db, skip=skip, limit=limit)
     return JSONResponse(
         status_code=200,
         content={
             "status": "success",
             "data": {
-                "items": [schemas.Category.from_orm(cat).dict() for cat in categories],
+                "items": categories,
                 "total": len(categories),
                 "page": 1,
                 "size": len(categories),
@@ -41,6 +41,23 @@ def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_d
         }
     )
 
+# Declared before /{category_id} so "suggest" is not parsed as an id
+@router.get("/suggest")
+def suggest_categories(
+    prefix: str = Query("", max_length=100, description="Start of the name, case-insensitive"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    items = crud.suggest_categories(db, prefix=prefix, limit=limit)
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": items,
+            "message": None
+        }
+    )
+
 @router.get("/{category_id}")
 def read_category(category_id: int, db: Session = Depends(get_db)):
     db_category = crud.get_category(db, category_id=category_id)
@@ -50,7 +67,7 @@ def read_category(category_id: int, db: Session = Depends(get_db)):
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.Category.from_orm(db_category).dict(),
+            "data": schemas.Category.from_orm(db_category).model_dump(mode="json"),
             "message": None
         }
     )
@@ -62,7 +79,7 @@ def update_category(category_id: int, category: schemas.CategoryUpdate, db: Sess
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.Category.from_orm(updated).dict(),
+            "data": schemas.Category.from_orm(updated).model_dump(mode="json"),
             "message": "Category updated successfully"
         }
     )
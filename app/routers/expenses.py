@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, File, Request, UploadFile
 from sqlalchemy.orm import Session
 from fastapi.responses import JSONResponse
 from typing import Optional
 from datetime import date
 
-from .. import crud, schemas
+from .. import crud, schemas, duplicates
 from ..database import get_db
 
 router = APIRouter(
@@ -13,13 +13,29 @@ router = APIRouter(
 )
 
 @router.post("/")
-def create_expense(expense: schemas.ExpenseCreate, db: Session = Depends(get_db)):
-    new_exp = crud.create_expense(db=db, expense=expense)
+def create_expense(
+    expense: schemas.ExpenseCreate,
+    dedupe: Optional[str] = Query(None, pattern="^(skip|flag)$", description="skip: return an existing duplicate instead; flag: create and mark it"),
+    db: Session = Depends(get_db)
+):
+    if dedupe:
+        new_exp, skipped = crud.create_expense_deduped(db=db, expense=expense, dedupe=dedupe)
+        if skipped:
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "status": "success",
+                    "data": schemas.Expense.from_orm(new_exp).model_dump(mode="json"),
+                    "message": "Duplicate of an existing expense; not created"
+                }
+            )
+    else:
+        new_exp = crud.create_expense(db=db, expense=expense)
     return JSONResponse(
         status_code=201,
         content={
             "status": "success",
-            "data": schemas.Expense.from_orm(new_exp).dict(),
+            "data": schemas.Expense.from_orm(new_exp).model_dump(mode="json"),
             "message": "Expense created successfully"
         }
     )
@@ -32,26 +48,44 @@ def read_expenses(
     account_id: Optional[int] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    q: Optional[str] = Query(None, min_length=1, max_length=200, description="Search in descriptions"),
     db: Session = Depends(get_db)
 ):
-    expenses = crud.get_expenses(
-        db,
-        skip=skip,
-        limit=limit,
-        category_id=category_id,
-        account_id=account_id,
-        start_date=start_date,
-        end_date=end_date
-    )
+    if q and q.strip():
+        hits = crud.search_expenses(
+            db,
+            q=q,
+            skip=skip,
+            limit=limit,
+            category_id=category_id,
+            account_id=account_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+        items = [
+            {**schemas.Expense.from_orm(e).model_dump(mode="json"), "rank": rank, "highlight": snippet}
+            for e, rank, snippet in hits
+        ]
+    else:
+        expenses = crud.get_expenses(
+            db,
+            skip=skip,
+            limit=limit,
+            category_id=category_id,
+            account_id=account_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+        items = [schemas.Expense.from_orm(e).model_dump(mode="json") for e in expenses]
     return JSONResponse(
         status_code=200,
         content={
             "status": "success",
             "data": {
-                "items": [schemas.Expense.from_orm(e).dict() for e in expenses],
-                "total": len(expenses),
+                "items": items,
+                "total": len(items),
                 "page": 1,
-                "size": len(expenses),
+                "size": len(items),
                 "pages": 1
             },
             "message": None
@@ -80,6 +114,38 @@ def get_expense_summary(
         }
     )
 
+@router.get("/duplicates")
+def get_duplicate_expenses(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    account_id: Optional[int] = None,
+    window_days: int = Query(duplicates.WINDOW_DAYS, ge=0, le=31),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    groups = crud.get_duplicate_expenses(
+        db,
+        start_date=start_date,
+        end_date=end_date,
+        account_id=account_id,
+        window_days=window_days,
+        limit=limit
+    )
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": {
+                "items": groups,
+                "total": len(groups),
+                "page": 1,
+                "size": len(groups),
+                "pages": 1
+            },
+            "message": None
+        }
+    )
+
 @router.get("/{expense_id}")
 def read_expense(expense_id: int, db: Session = Depends(get_db)):
     db_expense = crud.get_expense(db, expense_id=expense_id)
@@ -89,7 +155,7 @@ def read_expense(expense_id: int, db: Session = Depends(get_db)):
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.Expense.from_orm(db_expense).dict(),
+            "data": schemas.Expense.from_orm(db_expense).model_dump(mode="json"),
             "message": None
         }
     )
@@ -101,11 +167,36 @@ def update_expense(expense_id: int, expense: schemas.ExpenseUpdate, db: Session
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.Expense.from_orm(updated).dict(),
+            "data": schemas.Expense.from_orm(updated).model_dump(mode="json"),
             "message": "Expense updated successfully"
         }
     )
 
+@router.post("/{expense_id}/receipt")
+def upload_receipt(
+    expense_id: int,
+    file: UploadFile = File(..., description="JPEG, PNG, GIF, WebP or PDF"),
+    db: Session = Depends(get_db)
+):
+    updated = crud.set_expense_receipt(db=db, expense_id=expense_id, source=file.file)
+    return JSONResponse(
+        status_code=201,
+        content={
+            "status": "success",
+            "data": schemas.Expense.from_orm(updated).model_dump(mode="json"),
+            "message": "Receipt stored successfully"
+        }
+    )
+
+@router.api_route("/{expense_id}/receipt", methods=["GET", "HEAD"])
+def download_receipt(
+    expense_id: int,
+    request: Request,
+    thumbnail: bool = Query(False, description="Serve the image thumbnail instead of the original"),
+    db: Session = Depends(get_db)
+):
+    return crud.get_expense_receipt(db, expense_id=expense_id, headers=request.headers, thumbnail=thumbnail)
+
 @router.delete("/{expense_id}")
 def delete_expense(expense_id: int, db: Session = Depends(get_db)):
     crud.delete_expense(db=db, expense_id=expense_id)
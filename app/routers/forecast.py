@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+from typing import Optional
+from datetime import date, timedelta
+
+from .. import forecast
+from ..database import get_db
+from ..utils.date_utils import add_months
+
+router = APIRouter(
+    prefix="/forecast",
+    tags=["Forecast"]
+)
+
+@router.get("/")
+def read_forecast(
+    start: Optional[date] = Query(None, description="First day of the forecast (default: today)"),
+    end: Optional[date] = Query(None, description="Last day of the forecast (default: 12 months after start)"),
+    granularity: str = Query("month", description="Period size: day, week or month"),
+    db: Session = Depends(get_db)
+):
+    if granularity not in forecast.GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Granularity must be one of: day, week, month")
+    start = start or date.today()
+    end = end or add_months(start, 12) - timedelta(days=1)
+    if end < start:
+        raise HTTPException(status_code=400, detail="End date must not be before start date")
+    if (end - start).days >= forecast.MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Forecast horizon cannot exceed {forecast.MAX_DAYS} days")
+
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": forecast.get_forecast(db, start, end, granularity),
+            "message": None
+        }
+    )
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException, File, Form, Query, UploadFile
+from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from .. import crud, schemas
+from ..database import get_db
+
+router = APIRouter(
+    prefix="/imports",
+    tags=["Imports"]
+)
+
+@router.post("/")
+def create_import(
+    file: UploadFile = File(..., description="Statement file (CSV, QIF or OFX)"),
+    mapping: Optional[str] = Form(None, description="ImportMapping as JSON: columns, date format, defaults and rules"),
+    format: Optional[str] = Query(None, pattern="^(csv|qif|ofx)$", description="Default: from the file extension"),
+    dedupe: Optional[str] = Query(None, pattern="^(skip|flag)$", description="skip or flag rows matching existing expenses"),
+    db: Session = Depends(get_db)
+):
+    job = crud.create_import_job(
+        db,
+        source=file.file,
+        filename=file.filename,
+        fmt=format,
+        mapping=mapping,
+        dedupe=dedupe
+    )
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "success",
+            "data": schemas.ImportJob.from_orm(job).model_dump(mode="json"),
+            "message": "Import queued"
+        }
+    )
+
+@router.get("/")
+def read_imports(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    jobs = crud.get_import_jobs(db, skip=skip, limit=limit)
+    items = [schemas.ImportJob.from_orm(job).model_dump(mode="json") for job in jobs]
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": {
+                "items": items,
+                "total": len(items),
+                "page": 1,
+                "size": len(items),
+                "pages": 1
+            },
+            "message": None
+        }
+    )
+
+@router.get("/{job_id}")
+def read_import(job_id: int, db: Session = Depends(get_db)):
+    job = crud.get_import_job(db, job_id=job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": schemas.ImportJob.from_orm(job).model_dump(mode="json"),
+            "message": None
+        }
+    )
+
+@router.post("/{job_id}/resume")
+def resume_import(job_id: int, db: Session = Depends(get_db)):
+    job = crud.resume_import_job(db, job_id=job_id)
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "success",
+            "data": schemas.ImportJob.from_orm(job).model_dump(mode="json"),
+            "message": "Import resumed"
+        }
+    )
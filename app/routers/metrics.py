@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from .. import metrics
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"]
+)
+
+@router.get("", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -19,7 +19,7 @@ def create_recurring_expense(recurring: schemas.RecurringExpenseCreate, db: Sess
         status_code=201,
         content={
             "status": "success",
-            "data": schemas.RecurringExpense.from_orm(new_rec).dict(),
+            "data": schemas.RecurringExpense.from_orm(new_rec).model_dump(mode="json"),
             "message": "Recurring expense created successfully"
         }
     )
@@ -32,7 +32,7 @@ def read_recurring_expenses(skip: int = 0, limit: int = 100, db: Session = Depen
         content={
             "status": "success",
             "data": {
-                "items": [schemas.RecurringExpense.from_orm(r).dict() for r in recs],
+                "items": [schemas.RecurringExpense.from_orm(r).model_dump(mode="json") for r in recs],
                 "total": len(recs),
                 "page": 1,
                 "size": len(recs),
@@ -51,7 +51,7 @@ def read_recurring_expense(recurring_id: int, db: Session = Depends(get_db)):
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.RecurringExpense.from_orm(db_rec).dict(),
+            "data": schemas.RecurringExpense.from_orm(db_rec).model_dump(mode="json"),
             "message": None
         }
     )
@@ -63,7 +63,7 @@ def update_recurring_expense(recurring_id: int, recurring: schemas.RecurringExpe
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.RecurringExpense.from_orm(updated).dict(),
+            "data": schemas.RecurringExpense.from_orm(updated).model_dump(mode="json"),
             "message": "Recurring expense updated successfully"
         }
     )
@@ -84,12 +84,12 @@ def delete_recurring_expense(recurring_id: int, db: Session = Depends(get_db)):
 def generate_recurring_expenses(date_today: Optional[date] = None, db: Session = Depends(get_db)):
     if date_today is None:
         date_today = date.today()
-    generated = crud.generate_recurring_expenses(db=db, date_today=date_today)
+    summary = crud.generate_recurring_expenses(db=db, date_today=date_today)
     return JSONResponse(
         status_code=200,
         content={
             "status": "success",
-            "data": [schemas.Expense.from_orm(e).dict() for e in generated],
-            "message": "Successfully generated recurring expenses"
+            "data": summary,
+            "message": f"Successfully generated {summary['generated']} recurring expenses"
         }
     )
\ No newline at end of file
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from .. import sync
+from ..database import get_db
+
+router = APIRouter(
+    prefix="/sync",
+    tags=["Sync"]
+)
+
+@router.get("/")
+def read_changes(
+    since: Optional[str] = Query(None, description="Token from the previous response; omit for a full sync"),
+    limit: int = Query(sync.PAGE_SIZE, ge=1, le=sync.MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    try:
+        page = sync.changes_since(db, since, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except sync.TokenExpired:
+        raise HTTPException(status_code=410, detail="Sync token expired; start a full sync without 'since'")
+    return JSONResponse(
+        content={
+            "status": "success",
+            "data": page,
+            "message": "More changes available" if page["has_more"] else "Up to date"
+        }
+    )
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from fastapi.responses import JSONResponse
 
@@ -17,20 +17,20 @@ def create_tag(tag: schemas.TagCreate, db: Session = Depends(get_db)):
         status_code=201,
         content={
             "status": "success",
-            "data": schemas.Tag.from_orm(new_tag).dict(),
+            "data": schemas.Tag.from_orm(new_tag).model_dump(mode="json"),
             "message": "Tag created successfully"
         }
     )
 
 @router.get("/")
 def read_tags(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    tags = crud.get_tags(db, skip=skip, limit=limit)
+    tags = crud.list_tags(db, skip=skip, limit=limit)
     return JSONResponse(
         status_code=200,
         content={
             "status": "success",
             "data": {
-                "items": [schemas.Tag.from_orm(tag).dict() for tag in tags],
+                "items": tags,
                 "total": len(tags),
                 "page": 1,
                 "size": len(tags),
@@ -40,6 +40,23 @@ def read_tags(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
         }
     )
 
+# Declared before /{tag_id} so "suggest" is not parsed as an id
+@router.get("/suggest")
+def suggest_tags(
+    prefix: str = Query("", max_length=100, description="Start of the name, case-insensitive"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    items = crud.suggest_tags(db, prefix=prefix, limit=limit)
+    return JSONResponse(
+        status_code=200,
+        content={
+            "status": "success",
+            "data": items,
+            "message": None
+        }
+    )
+
 @router.get("/{tag_id}")
 def read_tag(tag_id: int, db: Session = Depends(get_db)):
     db_tag = crud.get_tag(db, tag_id=tag_id)
@@ -49,7 +66,7 @@ def read_tag(tag_id: int, db: Session = Depends(get_db)):
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.Tag.from_orm(db_tag).dict(),
+            "data": schemas.Tag.from_orm(db_tag).model_dump(mode="json"),
             "message": None
         }
     )
@@ -61,7 +78,7 @@ def update_tag(tag_id: int, tag: schemas.TagUpdate, db: Session = Depends(get_db
         status_code=200,
         content={
             "status": "success",
-            "data": schemas.Tag.from_orm(updated).dict(),
+            "data": schemas.Tag.from_orm(updated).model_dump(mode="json"),
             "message": "Tag updated successfully"
         }
     )
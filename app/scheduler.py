@@ -0,0 +1,113 @@
+# backend/app/scheduler.py
+"""Background generation of due recurring expenses.
+
+With RECURRING_SCHEDULER=true every API process runs a small asyncio loop;
+on PostgreSQL a session advisory lock elects one of them per tick so the
+workers do not all scan the same rules. The heavy lifting is done in
+batches of rules claimed with FOR UPDATE SKIP LOCKED, so additional
+processes started with ``python -m scripts.run_scheduler --no-leader``
+can help drain a large backlog, and the unique (recurring_id, date) index
+keeps every occurrence from being written twice.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import date
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from . import crud
+from .database import SessionLocal, engine as default_engine
+
+ENABLED = os.getenv("RECURRING_SCHEDULER", "False").lower() == "true"
+INTERVAL_SECONDS = float(os.getenv("RECURRING_SCHEDULER_INTERVAL", "60"))
+BATCH_SIZE = int(os.getenv("RECURRING_SCHEDULER_BATCH", "500"))
+
+# Arbitrary constant used as the PostgreSQL advisory lock key of the leader
+LEADER_LOCK_KEY = 73_610_033
+
+logger = logging.getLogger(__name__)
+
+_task: Optional[asyncio.Task] = None
+
+
+@contextmanager
+def leader_lock(engine: Engine) -> Iterator[bool]:
+    """Yield True when this process holds the scheduler lock for the duration of the block.
+
+    Other dialects are assumed to run a single process and always get the lock.
+    The lock is tied to the connection, so a crashed leader releases it at once.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": LEADER_LOCK_KEY}).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LEADER_LOCK_KEY})
+
+
+def run_once(date_today: Optional[date] = None, batch_size: int = BATCH_SIZE) -> dict:
+    """Drain every due rule in batches, each claimed and committed in its own transaction."""
+    started = time.perf_counter()
+    totals = {"generated": 0, "rules": 0, "batches": 0}
+    while True:
+        db = SessionLocal()
+        try:
+            summary = crud.generate_recurring_expenses(db, date_today, batch_size=batch_size)
+        finally:
+            db.close()
+        totals["generated"] += summary["generated"]
+        totals["rules"] += summary["rules"]
+        totals["batches"] += 1
+        # A short batch means nothing unclaimed is left for this worker
+        if summary["rules"] < batch_size:
+            break
+    totals["seconds"] = round(time.perf_counter() - started, 3)
+    if totals["rules"]:
+        logger.info(
+            "Generated %d recurring expenses for %d rules in %.1fs",
+            totals["generated"], totals["rules"], totals["seconds"]
+        )
+    return totals
+
+
+def tick(engine: Engine = default_engine) -> Optional[dict]:
+    with leader_lock(engine) as leader:
+        if not leader:
+            return None
+        return run_once()
+
+
+async def run_forever(engine: Engine = default_engine):
+    while True:
+        try:
+            await asyncio.to_thread(tick, engine)
+        except Exception:
+            logger.exception("Recurring scheduler tick failed")
+        await asyncio.sleep(INTERVAL_SECONDS)
+
+
+def start(engine: Engine = default_engine):
+    """Start the loop on the running event loop; call once per process."""
+    global _task
+    if _task is None:
+        _task = asyncio.get_running_loop().create_task(run_forever(engine), name="recurring-scheduler")
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -1,4 +1,5 @@
-from typing import List, Optional
+import json
+from typing import Any, Dict, List, Optional
 from datetime import date, datetime
 from pydantic import BaseModel, Field, validator, ConfigDict
 from decimal import Decimal
@@ -134,6 +135,8 @@ class ExpenseUpdate(BaseModel):
 class Expense(ExpenseBase):
     id: int
     receipt_path: Optional[str] = None
+    recurring_id: Optional[int] = None
+    duplicate_of_id: Optional[int] = None
     created_at: datetime
     updated_at: datetime
     category: Category
@@ -143,11 +146,20 @@ class Expense(ExpenseBase):
     model_config = BaseConfig.model_config
 
 # Budget Schemas
+def _parse_thresholds(v):
+    # Stored as "50,80,100"; None means the server default
+    if isinstance(v, str):
+        v = [int(p) for p in v.split(",") if p]
+    if v is not None and any(t < 1 or t > 1000 for t in v):
+        raise ValueError('Thresholds must be percents between 1 and 1000')
+    return v
+
 class BudgetBase(BaseModel):
     category_id: int
     year: int
     month: int
     amount: Decimal = Field(..., gt=0)
+    thresholds: Optional[List[int]] = None
 
     @validator('month')
     def validate_month(cls, v):
@@ -155,6 +167,8 @@ class BudgetBase(BaseModel):
             raise ValueError('Month must be between 1 and 12')
         return v
 
+    _thresholds = validator('thresholds', pre=True, allow_reuse=True)(_parse_thresholds)
+
 class BudgetCreate(BudgetBase):
     pass
 
@@ -163,6 +177,9 @@ class BudgetUpdate(BaseModel):
     year: Optional[int] = None
     month: Optional[int] = None
     amount: Optional[Decimal] = None
+    thresholds: Optional[List[int]] = None
+
+    _thresholds = validator('thresholds', pre=True, allow_reuse=True)(_parse_thresholds)
 
     @validator('month')
     def validate_month(cls, v):
@@ -184,6 +201,27 @@ class Budget(BudgetBase):
 
     model_config = BaseConfig.model_config
 
+class BudgetBulkCreate(BaseModel):
+    budgets: List[BudgetCreate] = Field(..., min_length=1, max_length=1000)
+    on_conflict: str = Field("skip", pattern="^(skip|update)$")  # update: replace amount and thresholds
+
+class BudgetAlert(BaseModel):
+    id: int
+    budget_id: int
+    category_id: int
+    year: int
+    month: int
+    threshold: int
+    spent: Decimal
+    budget_amount: Decimal
+    status: str
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
+
+    model_config = BaseConfig.model_config
+
 # Budget Status Schema for the budget status endpoint
 class BudgetStatus(BaseModel):
     category_id: int
@@ -220,8 +258,70 @@ class RecurringExpenseUpdate(BaseModel):
 
 class RecurringExpense(RecurringExpenseBase):
     id: int
+    start_date: Optional[date] = None
     created_at: datetime
     updated_at: datetime
     category: Category
 
-    model_config = BaseConfig.model_config
\ No newline at end of file
+    model_config = BaseConfig.model_config
+# Import Schemas
+class ImportRule(BaseModel):
+    contains: str  # case-insensitive match on the description
+    category_id: Optional[int] = None
+    account_id: Optional[int] = None
+    tag_ids: List[int] = []
+
+class ImportMapping(BaseModel):
+    # CSV column names; QIF and OFX fields are fixed
+    date_column: str = "date"
+    amount_column: str = "amount"
+    description_column: str = "description"
+    category_column: Optional[str] = "category"
+    account_column: Optional[str] = "account"
+    tags_column: Optional[str] = "tags"
+    tag_separator: str = ";"
+    delimiter: str = ","
+    date_format: Optional[str] = None  # default: %Y-%m-%d for CSV, %m/%d/%Y for QIF
+    # Debits are negative and credits are skipped; default true for QIF and OFX
+    debits_negative: Optional[bool] = None
+    default_category_id: Optional[int] = None
+    default_account_id: Optional[int] = None
+    rules: List[ImportRule] = []
+
+class ImportJob(BaseModel):
+    id: int
+    filename: Optional[str] = None
+    format: str
+    status: str
+    dedupe: Optional[str] = None
+    size_bytes: int
+    rows_read: int
+    rows_imported: int
+    rows_skipped: int
+    rows_failed: int
+    chunks_committed: int
+    errors: List[str] = []
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    @validator('errors', pre=True)
+    def parse_errors(cls, v):
+        if v is None:
+            return []
+        return json.loads(v) if isinstance(v, str) else v
+
+    model_config = BaseConfig.model_config
+
+# Batch Schemas
+class BatchOperation(BaseModel):
+    op: str  # e.g. "create_expense", "update_budget", "delete_tag"
+    ref: Optional[str] = None  # name for the created id; later operations use {"$ref": name}
+    id: Optional[Any] = None  # target of update/delete: an id or {"$ref": name}
+    data: Optional[Dict[str, Any]] = None
+    dedupe: Optional[str] = None  # create_expense only: skip or flag
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+    atomic: bool = True  # False: every operation commits or fails on its own
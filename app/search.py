@@ -0,0 +1,132 @@
+# backend/app/search.py
+"""Ranked search over expense descriptions.
+
+PostgreSQL uses a GIN full-text index on ``to_tsvector(config, description)``
+for word matches plus a pg_trgm GIN index that serves substring (ILIKE) and
+typo (``%`` similarity) matches. SQLite uses an FTS5 table with the trigram
+tokenizer, kept in sync with ``expenses`` by triggers. Both are created by
+migration 004. Without the FTS5 table SQLite falls back to a plain LIKE
+scan; without the pg_trgm extension PostgreSQL ranks and matches by
+full-text and ILIKE alone, with no typo matches.
+
+Only the page of ids is ranked and sorted first; highlight snippets are
+computed for those rows alone.
+"""
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import column, func, inspect, literal, literal_column, select, table
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import models
+
+TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "simple")
+SNIPPET_START = "<mark>"
+SNIPPET_STOP = "</mark>"
+FTS_TABLE = "expenses_fts"
+# Trigram matching needs at least this many characters per term
+MIN_TRIGRAM = 3
+# Backslash escapes render differently per dialect, so LIKE patterns escape with "!"
+LIKE_ESCAPE = "!"
+
+Expense = models.Expense
+
+# Index expression; queries must use exactly the same expression to hit the index
+TSVECTOR_SQL = f"to_tsvector('{TS_CONFIG}', coalesce(description, ''))"
+
+fts_table = table(FTS_TABLE, column("rowid"), column("description"))
+
+_fts_ready = False
+_trgm_ready = False
+
+
+def _has_fts(conn: Connection) -> bool:
+    # Only a positive answer is cached, so the index is picked up once a migration creates it
+    global _fts_ready
+    if not _fts_ready:
+        _fts_ready = inspect(conn).has_table(FTS_TABLE)
+    return _fts_ready
+
+
+def _has_trgm(conn: Connection) -> bool:
+    # Cached like _has_fts: similarity() and % only exist once pg_trgm is installed
+    global _trgm_ready
+    if not _trgm_ready:
+        _trgm_ready = bool(conn.exec_driver_sql("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").scalar())
+    return _trgm_ready
+
+
+def _like_pattern(q: str) -> str:
+    escaped = q.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    return f"%{escaped}%"
+
+
+def _fts5_query(q: str) -> Optional[str]:
+    """Quote every term so user input is never parsed as FTS5 syntax; terms are ANDed."""
+    terms = [t for t in q.split() if len(t) >= MIN_TRIGRAM]
+    if not terms:
+        return None
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def _postgres_ranked(q: str, filters: Sequence, trigram: bool):
+    config = literal_column(f"'{TS_CONFIG}'")
+    tsvector = literal_column(TSVECTOR_SQL)
+    tsquery = func.websearch_to_tsquery(config, q)
+    rank = func.ts_rank(tsvector, tsquery)
+    match = tsvector.op("@@")(tsquery) | Expense.description.ilike(_like_pattern(q), escape=LIKE_ESCAPE)
+    if trigram:
+        rank = rank + func.similarity(func.coalesce(Expense.description, ""), q)
+        match = match | Expense.description.op("%")(q)
+    snippet = func.ts_headline(
+        config, func.coalesce(Expense.description, ""), tsquery,
+        f"StartSel={SNIPPET_START}, StopSel={SNIPPET_STOP}, MaxWords=20, MinWords=5"
+    )
+    return select(Expense.id, rank.label("rank")).where(match, *filters), snippet
+
+
+def _sqlite_ranked(q: str, filters: Sequence):
+    fts = literal_column(FTS_TABLE)
+    match = _fts5_query(q)
+    if match is None:
+        return None
+    # bm25() is lower for better matches
+    rank = -func.bm25(fts)
+    snippet = func.snippet(fts, 0, SNIPPET_START, SNIPPET_STOP, "…", 12)
+    ranked = (
+        select(Expense.id, rank.label("rank"), snippet.label("snippet"))
+        .select_from(Expense)
+        .join(fts_table, fts_table.c.rowid == Expense.id)
+        .where(fts.op("MATCH")(match), *filters)
+    )
+    return ranked
+
+
+def search(
+    db: Session, q: str, filters: Sequence = (), skip: int = 0, limit: int = 100
+) -> List[Tuple[int, float, Optional[str]]]:
+    """(expense id, rank, snippet) for the requested page, best match first."""
+    q = q.strip()
+    conn = db.connection()
+    dialect = conn.dialect.name
+    order = lambda ranked: ranked.order_by(literal_column("rank").desc(), Expense.date.desc(), Expense.id.desc())
+
+    if dialect == "postgresql":
+        ranked, snippet = _postgres_ranked(q, filters, _has_trgm(conn))
+        page = order(ranked).offset(skip).limit(limit).subquery()
+        rows = db.execute(
+            select(page.c.id, page.c.rank, snippet.label("snippet"))
+            .join(Expense, Expense.id == page.c.id)
+            .order_by(page.c.rank.desc(), Expense.date.desc(), Expense.id.desc())
+        ).all()
+        return [(row.id, float(row.rank), row.snippet) for row in rows]
+
+    ranked = _sqlite_ranked(q, filters) if dialect == "sqlite" and _has_fts(conn) else None
+    if ranked is None:
+        # No index (or a term too short for trigrams): unranked substring scan
+        ranked = select(Expense.id, literal(0.0).label("rank"), Expense.description.label("snippet")).where(
+            Expense.description.ilike(_like_pattern(q), escape=LIKE_ESCAPE), *filters
+        )
+    rows = db.execute(order(ranked).offset(skip).limit(limit)).all()
+    return [(row.id, float(row.rank), row.snippet) for row in rows]
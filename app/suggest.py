@@ -0,0 +1,126 @@
+# backend/app/suggest.py
+"""In-memory prefix indexes for tag and category autocomplete.
+
+Each index keeps its names lower-cased in a sorted list, so the names
+starting with a prefix are one contiguous slice found with two bisects;
+the slice is ranked by usage (expenses per tag / per category). Both are
+loaded once from the database and then kept current from the
+``tag.changed``, ``category.changed`` and ``expense.changed`` events, so
+suggestions never query the database. ``SUGGEST_RELOAD_SECONDS`` bounds
+staleness from writes made by other worker processes.
+"""
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+
+from . import events, models
+
+RELOAD_SECONDS = float(os.getenv("SUGGEST_RELOAD_SECONDS", "300"))
+# Sorts after every character that can follow the prefix
+_MAX_CHAR = "\U0010ffff"
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: List[Tuple[str, int]] = []   # (lower-cased name, id), sorted
+        self._names: Dict[int, str] = {}
+        self.usage: Counter = Counter()
+        self.loaded_at: Optional[float] = None
+
+    def replace(self, names: Dict[int, str], usage: Counter):
+        keys = sorted((name.lower(), item_id) for item_id, name in names.items())
+        with self._lock:
+            self._keys, self._names, self.usage = keys, dict(names), usage
+            self.loaded_at = time.monotonic()
+
+    def put(self, item_id: int, name: str):
+        with self._lock:
+            self._remove(item_id)
+            self._names[item_id] = name
+            insort(self._keys, (name.lower(), item_id))
+
+    def remove(self, item_id: int):
+        with self._lock:
+            self._remove(item_id)
+            self.usage.pop(item_id, None)
+
+    def _remove(self, item_id: int):
+        name = self._names.pop(item_id, None)
+        if name is not None:
+            i = bisect_left(self._keys, (name.lower(), item_id))
+            if i < len(self._keys) and self._keys[i] == (name.lower(), item_id):
+                del self._keys[i]
+
+    def add_usage(self, item_id: int, delta: int):
+        with self._lock:
+            self.usage[item_id] += delta
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        prefix = prefix.strip().lower()
+        with self._lock:
+            lo = bisect_left(self._keys, (prefix,))
+            hi = bisect_right(self._keys, (prefix + _MAX_CHAR,), lo)
+            candidates = self._keys[lo:hi]
+            # Most used first, then alphabetical
+            best = heapq.nsmallest(limit, candidates, key=lambda k: (-self.usage[k[1]], k))
+            return [{"id": item_id, "name": self._names[item_id], "usage": self.usage[item_id]} for _, item_id in best]
+
+
+tags = PrefixIndex()
+categories = PrefixIndex()
+_load_lock = threading.Lock()
+
+
+def load(engine: Engine):
+    with engine.connect() as conn:
+        tag_names = dict(conn.execute(select(models.Tag.id, models.Tag.name)).all())
+        tag_usage = Counter(dict(conn.execute(
+            select(models.ExpenseTag.tag_id, func.count()).group_by(models.ExpenseTag.tag_id)
+        ).all()))
+        category_names = dict(conn.execute(select(models.Category.id, models.Category.name)).all())
+        category_usage = Counter(dict(conn.execute(
+            select(models.Expense.category_id, func.count()).group_by(models.Expense.category_id)
+        ).all()))
+    tags.replace(tag_names, tag_usage)
+    categories.replace(category_names, category_usage)
+
+
+def ensure_loaded(engine: Engine):
+    """Load on first use and again once the indexes are older than RELOAD_SECONDS."""
+    loaded_at = tags.loaded_at
+    if loaded_at is not None and time.monotonic() - loaded_at < RELOAD_SECONDS:
+        return
+    with _load_lock:
+        if tags.loaded_at == loaded_at:
+            load(engine)
+
+
+def _on_named_change(index: PrefixIndex):
+    def handler(payload: Dict[str, Any]):
+        if payload["after"] is None:
+            index.remove(payload["before"]["id"])
+        else:
+            index.put(payload["after"]["id"], payload["after"]["name"])
+    return handler
+
+
+def _on_expense_changed(payload: Dict[str, Any]):
+    for snapshot, delta in ((payload["before"], -1), (payload["after"], 1)):
+        if snapshot is None:
+            continue
+        categories.add_usage(snapshot["category_id"], delta)
+        for tag_id in snapshot["tag_ids"]:
+            tags.add_usage(tag_id, delta)
+
+
+events.subscribe("tag.changed", _on_named_change(tags))
+events.subscribe("category.changed", _on_named_change(categories))
+events.subscribe("expense.changed", _on_expense_changed)
@@ -0,0 +1,257 @@
+# backend/app/sync.py
+"""Incremental sync of expenses and reference data for offline clients.
+
+``change_log`` keeps one row per synced record with the sequence number of
+its latest change and a ``deleted`` flag (the tombstone). Expenses moved to
+the cold archive get tombstones marked ``archived``: they are gone from the
+API like deleted rows, but clients may keep their copies as history. Every transaction
+that writes synced rows takes the next value of the ``sync`` counter in
+``reference_versions`` once; the counter row stays locked until commit, so
+sequence order is commit order and a reader can never skip a change that
+commits late. Clients page through ``(seq, entity, entity_id)`` with an
+opaque token, so a sync reads only what changed since the last one.
+
+The counter is only taken in ``before_commit``, after the session's last
+flush, and nothing but ``change_log`` rows is locked after it. Writers are
+therefore serialized for the commit itself rather than the whole
+transaction, and the counter is always the last lock a transaction takes,
+so it cannot deadlock against the ``budget_spend`` or balance snapshot rows
+an expense write locks earlier. Sessions with ``info["hold_sync"]`` set
+(batches) leave their changes in ``info["sync_changes"]`` for the caller
+to collect after each operation and ``write`` just before the outer commit.
+
+ORM writes are captured by an ``after_flush`` hook; Core bulk writes
+(imports, recurring generation) call ``record`` themselves, and writers
+without a Session (the archiver) call ``record_connection``. Data loaded
+around the application entirely (``scripts/generate_data.py``) is logged
+afterwards with ``record_all``.
+"""
+import base64
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, event, false, insert, literal, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, joinedload
+
+from . import models, schemas
+
+PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+MAX_PAGE_SIZE = 5000
+# Tombstones older than this are purged; tokens from before that need a full sync
+TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "90"))
+COUNTER = "sync"
+PURGED_COUNTER = "sync_purged"
+
+Log = models.ChangeLog
+Version = models.ReferenceVersion
+
+# entity name -> (model, schema, loader options, response key)
+ENTITIES = {
+    "expense": (models.Expense, schemas.Expense, (
+        joinedload(models.Expense.category), joinedload(models.Expense.account), joinedload(models.Expense.tags)
+    ), "expenses"),
+    "category": (models.Category, schemas.Category, (), "categories"),
+    "tag": (models.Tag, schemas.Tag, (), "tags"),
+    "account": (models.Account, schemas.Account, (), "accounts"),
+    "budget": (models.Budget, schemas.Budget, (joinedload(models.Budget.category),), "budgets"),
+    "recurring": (models.RecurringExpense, schemas.RecurringExpense, (
+        joinedload(models.RecurringExpense.category),
+    ), "recurring"),
+}
+_ENTITY_OF = {model: name for name, (model, _, _, _) in ENTITIES.items()}
+
+
+class TokenExpired(Exception):
+    """The token predates purged tombstones; the client must start over."""
+
+
+def encode_token(seq: int, entity: str = "", entity_id: int = 0) -> str:
+    return base64.urlsafe_b64encode(f"{seq}:{entity}:{entity_id}".encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Tuple[int, str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        seq, entity, entity_id = raw.split(":")
+        return int(seq), entity, int(entity_id)
+    except ValueError:
+        raise ValueError("Invalid sync token")
+
+
+def _next_seq(conn: Connection) -> int:
+    # The row lock taken here is held until commit, serializing sync writers
+    seq = conn.execute(
+        update(Version).where(Version.name == COUNTER).values(version=Version.version + 1).returning(Version.version)
+    ).scalar()
+    if seq is None:
+        conn.execute(insert(Version).values(name=COUNTER, version=1))
+        seq = 1
+    return seq
+
+
+def _upsert(conn: Connection, rows: List[Dict[str, Any]]):
+    dialect = {"postgresql": postgresql, "sqlite": sqlite}.get(conn.dialect.name)
+    if dialect is None:
+        conn.execute(delete(Log).where(tuple_(Log.entity, Log.entity_id).in_(
+            [(row["entity"], row["entity_id"]) for row in rows]
+        )))
+        conn.execute(insert(Log), rows)
+        return
+    statement = dialect.insert(Log)
+    conn.execute(
+        statement.on_conflict_do_update(
+            index_elements=["entity", "entity_id"],
+            set_={
+                "seq": statement.excluded.seq, "deleted": statement.excluded.deleted,
+                "archived": statement.excluded.archived, "changed_at": datetime.now(timezone.utc),
+            },
+        ),
+        rows,
+    )
+
+
+def record(db: Session, entity: str, ids: Iterable[int], deleted: bool = False):
+    """Log changes made outside the ORM unit of work; written when the session commits."""
+    _collect(db, {(entity, entity_id): deleted for entity_id in ids})
+
+
+def record_connection(conn: Connection, entity: str, ids: Iterable[int], deleted: bool = False, archived: bool = False):
+    """``record`` for a Core connection, written at once under a new sequence number."""
+    write(conn, {(entity, entity_id): deleted for entity_id in ids}, archived=archived)
+
+
+def record_all(conn: Connection) -> int:
+    """Log every existing synced row under one sequence number; returns the number logged."""
+    seq = _next_seq(conn)
+    logged = 0
+    for entity, (model, _, _, _) in ENTITIES.items():
+        conn.execute(delete(Log).where(Log.entity == entity, Log.entity_id.in_(select(model.id))))
+        logged += conn.execute(insert(Log).from_select(
+            ["seq", "entity", "entity_id", "deleted", "archived"],
+            select(literal(seq), literal(entity), model.id, false(), false()),
+        )).rowcount
+    return logged
+
+
+def current_seq(conn: Connection) -> int:
+    """The newest committed sequence number; every change up to it is visible."""
+    return conn.execute(select(Version.version).where(Version.name == COUNTER)).scalar() or 0
+
+
+def write(conn: Connection, changes: Dict[Tuple[str, int], bool], archived: bool = False):
+    """Log ``changes`` ((entity, id) -> deleted) under one new sequence number."""
+    if changes:
+        seq = _next_seq(conn)
+        _upsert(conn, [
+            {"seq": seq, "entity": entity, "entity_id": entity_id, "deleted": deleted, "archived": archived}
+            for (entity, entity_id), deleted in changes.items()
+        ])
+
+
+def _collect(session: Session, changes: Dict[Tuple[str, int], bool]):
+    if changes:
+        session.info.setdefault("sync_changes", {}).update(changes)
+
+
+@event.listens_for(Session, "after_flush")
+def _capture(session: Session, context):
+    changes: Dict[Tuple[str, int], bool] = {}
+    for obj in session.new:
+        entity = _ENTITY_OF.get(type(obj))
+        if entity:
+            changes[(entity, obj.id)] = False
+        elif isinstance(obj, models.ExpenseTag):
+            changes.setdefault(("expense", obj.expense_id), False)
+    for obj in session.dirty:
+        entity = _ENTITY_OF.get(type(obj))
+        if entity and session.is_modified(obj, include_collections=False):
+            changes[(entity, obj.id)] = False
+    for obj in session.deleted:
+        entity = _ENTITY_OF.get(type(obj))
+        if entity:
+            changes[(entity, obj.id)] = True
+        elif isinstance(obj, models.ExpenseTag):
+            changes.setdefault(("expense", obj.expense_id), False)
+    _collect(session, changes)
+
+
+@event.listens_for(Session, "before_commit")
+def _log(session: Session):
+    if session.info.get("hold_sync"):
+        return
+    # Flush first so the commit's own final flush has nothing left to capture
+    session.flush()
+    changes = session.info.pop("sync_changes", None)
+    if changes:
+        write(session.connection(), changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _committed(session: Session):
+    # A held session's commit only released a savepoint; its changes wait for the caller
+    if not session.info.get("hold_sync"):
+        session.info.pop("sync_changes", None)
+
+
+@event.listens_for(Session, "after_rollback")
+@event.listens_for(Session, "after_soft_rollback")
+def _reset(session: Session, *args):
+    session.info.pop("sync_changes", None)
+
+
+def changes_since(db: Session, token: Optional[str], limit: int = PAGE_SIZE) -> Dict[str, Any]:
+    """One page of changes after ``token`` (from the beginning when None)."""
+    cursor = decode_token(token) if token else (0, "", 0)
+    purged = db.execute(select(Version.version).where(Version.name == PURGED_COUNTER)).scalar() or 0
+    if token and cursor[0] < purged:
+        raise TokenExpired()
+
+    page = db.execute(
+        select(Log.seq, Log.entity, Log.entity_id, Log.deleted, Log.archived)
+        .where(tuple_(Log.seq, Log.entity, Log.entity_id) > tuple_(*cursor))
+        .order_by(Log.seq, Log.entity, Log.entity_id)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    upserts: Dict[str, List[int]] = {}
+    deleted: Dict[str, List[int]] = {ENTITIES[name][3]: [] for name in ENTITIES}
+    archived: Dict[str, List[int]] = {ENTITIES[name][3]: [] for name in ENTITIES}
+    for row in page:
+        if row.deleted:
+            (archived if row.archived else deleted)[ENTITIES[row.entity][3]].append(row.entity_id)
+        else:
+            upserts.setdefault(row.entity, []).append(row.entity_id)
+
+    changed: Dict[str, List[Dict[str, Any]]] = {ENTITIES[name][3]: [] for name in ENTITIES}
+    for entity, ids in upserts.items():
+        model, schema, options, key = ENTITIES[entity]
+        # A row deleted since it was logged is skipped; its tombstone comes later
+        rows = db.query(model).options(*options).filter(model.id.in_(ids)).order_by(model.id).all()
+        changed[key] = [schema.from_orm(row).model_dump(mode="json") for row in rows]
+
+    if page:
+        last = page[-1]
+        next_token = encode_token(last.seq, last.entity, last.entity_id)
+    else:
+        next_token = token or encode_token(0)
+    return {"changed": changed, "deleted": deleted, "archived": archived, "next": next_token, "has_more": has_more}
+
+
+def purge_tombstones(engine: Engine, older_than_days: int = TOMBSTONE_DAYS) -> int:
+    """Drop old tombstones and raise the oldest token still accepted."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    with engine.begin() as conn:
+        horizon = conn.execute(
+            select(Log.seq).where(Log.deleted.is_(True), Log.changed_at < cutoff).order_by(Log.seq.desc()).limit(1)
+        ).scalar()
+        if horizon is None:
+            return 0
+        purged = conn.execute(delete(Log).where(Log.deleted.is_(True), Log.seq <= horizon)).rowcount
+        if not conn.execute(update(Version).where(Version.name == PURGED_COUNTER).values(version=horizon)).rowcount:
+            conn.execute(insert(Version).values(name=PURGED_COUNTER, version=horizon))
+    return purged
@@ -1,6 +1,8 @@
-from datetime import date, timedelta
+from datetime import date
 from calendar import monthrange
 
+from .recurrence import next_occurrence
+
 def add_months(source_date: date, months: int) -> date:
     """Add a specified number of months to a date, handling month boundaries correctly"""
     month = source_date.month - 1 + months
@@ -22,20 +24,4 @@ def get_month_range(year: int, month: int) -> tuple[date, date]:
 
 def calculate_next_occurrence(current_date: date, interval: str) -> date:
     """Calculate the next occurrence date based on the interval"""
-    interval = interval.lower()
-
-    if interval == "daily":
-        return current_date + timedelta(days=1)
-    elif interval == "weekly":
-        return current_date + timedelta(days=7)
-    elif interval == "biweekly":
-        return current_date + timedelta(days=14)
-    elif interval == "monthly":
-        return add_months(current_date, 1)
-    elif interval == "quarterly":
-        return add_months(current_date, 3)
-    elif interval in ["yearly", "annually"]:
-        return add_months(current_date, 12)
-    else:
-        # Default to monthly if interval is not recognized
-        return add_months(current_date, 1)
\ No newline at end of file
+    return next_occurrence(current_date, interval)
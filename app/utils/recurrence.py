@@ -0,0 +1,95 @@
+"""Occurrence engine for recurring expense intervals.
+
+Interval names are compiled once into small ``Rule`` objects (cached), which
+generate occurrences either one at a time or for a whole range at once with
+numpy. Month-based rules are anchored: the k-th occurrence is ``anchor`` plus
+``k * step`` months with the day clamped to the target month, so a rule
+starting on Jan 31 yields Feb 29, Mar 31, Apr 30 instead of drifting to the 29th.
+The anchor must stay fixed for the life of a rule (``RecurringExpense.start_date``);
+anchoring on the previous occurrence reintroduces the drift.
+"""
+from calendar import monthrange
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+DAY = "day"
+MONTH = "month"
+
+# interval name -> (unit, step)
+INTERVALS = {
+    "daily": (DAY, 1),
+    "weekly": (DAY, 7),
+    "biweekly": (DAY, 14),
+    "monthly": (MONTH, 1),
+    "quarterly": (MONTH, 3),
+    "yearly": (MONTH, 12),
+    "annually": (MONTH, 12),
+}
+DEFAULT_INTERVAL = "monthly"
+
+
+@dataclass(frozen=True)
+class Rule:
+    unit: str
+    step: int
+
+    def nth(self, anchor: date, n: int) -> date:
+        """The n-th occurrence after ``anchor`` (n=0 is the anchor itself)."""
+        if self.unit == DAY:
+            return anchor + timedelta(days=n * self.step)
+        month = anchor.month - 1 + n * self.step
+        year = anchor.year + month // 12
+        month = month % 12 + 1
+        return date(year, month, min(anchor.day, monthrange(year, month)[1]))
+
+    def next(self, current: date) -> date:
+        return self.nth(current, 1)
+
+    def index_on_or_after(self, anchor: date, day: date) -> int:
+        """The smallest n with ``nth(anchor, n) >= day``."""
+        if self.unit == DAY:
+            return max(0, -(-(day - anchor).days // self.step))
+        months = (day.year - anchor.year) * 12 + day.month - anchor.month
+        n = max(0, -(-months // self.step))
+        # Same month as ``day`` but clamped or anchored to an earlier day
+        return n + 1 if self.nth(anchor, n) < day else n
+
+    def first_on_or_after(self, anchor: date, day: date) -> date:
+        return self.nth(anchor, self.index_on_or_after(anchor, day))
+
+    def dates(self, anchor: date, end: date, start: Optional[date] = None) -> np.ndarray:
+        """All occurrences in ``[start, end]`` as a ``datetime64[D]`` array, computed in one pass."""
+        if end < anchor:
+            return np.empty(0, dtype="datetime64[D]")
+        first_n = self.index_on_or_after(anchor, start) if start is not None else 0
+        last = np.datetime64(end, "D")
+        if self.unit == DAY:
+            n = np.arange(first_n, (end - anchor).days // self.step + 1)
+            return np.datetime64(anchor, "D") + n * self.step
+        months = (end.year - anchor.year) * 12 + end.month - anchor.month
+        month_starts = np.datetime64(anchor.replace(day=1), "M") + np.arange(first_n, months // self.step + 1) * self.step
+        month_lengths = ((month_starts + 1).astype("datetime64[D]") - month_starts.astype("datetime64[D]")).astype(int)
+        result = month_starts.astype("datetime64[D]") + (np.minimum(anchor.day, month_lengths) - 1)
+        return result[result <= last]
+
+    def between(self, anchor: date, end: date, start: Optional[date] = None) -> List[date]:
+        return self.dates(anchor, end, start).astype(object).tolist()
+
+    def take(self, anchor: date, n: int) -> List[date]:
+        """The first ``n`` occurrences starting with ``anchor``."""
+        return [self.nth(anchor, k) for k in range(n)]
+
+
+@lru_cache(maxsize=None)
+def compile_rule(interval: str) -> Rule:
+    """Parse an interval name; unknown names fall back to monthly."""
+    unit, step = INTERVALS.get(interval.strip().lower(), INTERVALS[DEFAULT_INTERVAL])
+    return Rule(unit, step)
+
+
+def next_occurrence(current: date, interval: str) -> date:
+    return compile_rule(interval).next(current)
@@ -4,8 +4,8 @@ import time
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import engine
-from app.models import Base
-from app.routers import categories, expenses, budgets, accounts, tags, recurring, health, auth
+from app import partitioning, analytics, scheduler, idempotency, budget_stream, budget_alerts, metrics
+from app.routers import categories, expenses, budgets, accounts, tags, recurring, health, auth, forecast, imports, batch, sync, metrics as metrics_router
 from app.utils.error_handlers import (
     AppException, app_exception_handler,
     integrity_error_handler, operational_error_handler,
@@ -28,6 +28,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Replay stored responses for retried writes carrying an Idempotency-Key
+app.add_middleware(idempotency.IdempotencyMiddleware)
+
+# Per-route request counts and latency for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
 # Request timing middleware
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
@@ -43,9 +50,70 @@ app.add_exception_handler(IntegrityError, integrity_error_handler)
 app.add_exception_handler(OperationalError, operational_error_handler)
 app.add_exception_handler(ValueError, validation_error_handler)
 
-# Create tables (dev only)
-if os.getenv("DEBUG", "False").lower() == "true":
-    Base.metadata.create_all(bind=engine)
+# Apply pending migrations on startup (dev only); production runs
+# `python -m migrations.runner upgrade` as a separate deploy step
+@app.on_event("startup")
+def apply_migrations():
+    if os.getenv("DEBUG", "False").lower() == "true":
+        from migrations.runner import upgrade
+        upgrade(engine)
+
+# Load the optional in-memory analytics engine (ANALYTICS_ENGINE=true)
+@app.on_event("startup")
+def start_analytics_engine():
+    if analytics.ENABLED:
+        analytics.start(engine)
+
+# Keep monthly partitions created ahead of time (no-op unless expenses is partitioned)
+@app.on_event("startup")
+def ensure_expense_partitions():
+    partitioning.ensure_partitions(engine)
+
+# Generate due recurring expenses in the background (RECURRING_SCHEDULER=true)
+@app.on_event("startup")
+async def start_recurring_scheduler():
+    if scheduler.ENABLED:
+        scheduler.start(engine)
+
+@app.on_event("shutdown")
+async def stop_recurring_scheduler():
+    await scheduler.stop()
+
+# Purge expired idempotency keys in the background
+@app.on_event("startup")
+async def start_idempotency_cleanup():
+    idempotency.start(engine)
+
+@app.on_event("shutdown")
+async def stop_idempotency_cleanup():
+    await idempotency.stop()
+
+# Live budget status for /budgets/stream
+@app.on_event("startup")
+async def start_budget_stream():
+    budget_stream.start(engine)
+
+@app.on_event("shutdown")
+async def stop_budget_stream():
+    await budget_stream.stop()
+
+# Deliver budget threshold alerts to BUDGET_ALERT_WEBHOOK_URL
+@app.on_event("startup")
+async def start_budget_alerts():
+    budget_alerts.start(engine)
+
+@app.on_event("shutdown")
+async def stop_budget_alerts():
+    await budget_alerts.stop()
+
+# Write this worker's metrics for the other workers' /metrics (METRICS_DIR)
+@app.on_event("startup")
+async def start_metrics_flush():
+    metrics.start()
+
+@app.on_event("shutdown")
+async def stop_metrics_flush():
+    await metrics.stop()
 
 # Include routers with tags and prefixes
 app.include_router(auth.router, prefix="/api/v1", tags=["Authentication"])
@@ -56,6 +124,12 @@ app.include_router(budgets.router, prefix="/api/v1", tags=["Budgets"])
 app.include_router(accounts.router, prefix="/api/v1", tags=["Accounts"])
 app.include_router(tags.router, prefix="/api/v1", tags=["Tags"])
 app.include_router(recurring.router, prefix="/api/v1", tags=["Recurring"])
+app.include_router(forecast.router, prefix="/api/v1", tags=["Forecast"])
+app.include_router(imports.router, prefix="/api/v1", tags=["Imports"])
+app.include_router(batch.router, prefix="/api/v1", tags=["Batch"])
+app.include_router(sync.router, prefix="/api/v1", tags=["Sync"])
+# Scraped by Prometheus at the conventional path, outside the API prefix
+app.include_router(metrics_router.router, tags=["Metrics"])
 
 @app.get("/")
 async def root():
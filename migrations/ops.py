@@ -0,0 +1,305 @@
+# migrations/ops.py
+import os
+import time
+from typing import Callable, List, Optional, Sequence
+
+import sqlalchemy as sa
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+# Tracking tables live in their own metadata so the app models never see them
+meta = sa.MetaData()
+
+schema_migrations = sa.Table(
+    "schema_migrations", meta,
+    sa.Column("version", sa.String(32), primary_key=True),
+    sa.Column("name", sa.String(255), nullable=False),
+    sa.Column("applied_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+)
+
+migration_progress = sa.Table(
+    "migration_progress", meta,
+    sa.Column("version", sa.String(32), primary_key=True),
+    sa.Column("step", sa.String(100), primary_key=True),
+    sa.Column("cursor", sa.BigInteger, nullable=True),
+    sa.Column("done", sa.Boolean, nullable=False, default=False),
+    sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now()),
+)
+
+# Defaults for online operations, overridable per call or through the environment
+DEFAULT_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "10000"))
+DEFAULT_THROTTLE = float(os.getenv("MIGRATION_THROTTLE", "0.05"))  # seconds to sleep between batches
+LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+LOCK_RETRIES = int(os.getenv("MIGRATION_LOCK_RETRIES", "5"))
+
+
+class Operations:
+    """Idempotent schema operations handed to every migration's upgrade/downgrade.
+
+    Every step commits on its own, so a migration that is interrupted half-way
+    can simply be run again: finished steps are no-ops and batched backfills
+    continue from the cursor stored in ``migration_progress``.
+    """
+
+    def __init__(self, engine: Engine, version: str, echo: Callable[[str], None] = print):
+        self.engine = engine
+        self.version = version
+        self.echo = echo
+
+    @property
+    def dialect(self) -> str:
+        return self.engine.dialect.name
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.dialect == "postgresql"
+
+    # Introspection helpers
+    def has_table(self, table_name: str) -> bool:
+        return inspect(self.engine).has_table(table_name)
+
+    def has_column(self, table_name: str, column_name: str) -> bool:
+        if not self.has_table(table_name):
+            return False
+        return any(c["name"] == column_name for c in inspect(self.engine).get_columns(table_name))
+
+    def has_index(self, table_name: str, index_name: str) -> bool:
+        if not self.has_table(table_name):
+            return False
+        names = {ix["name"] for ix in inspect(self.engine).get_indexes(table_name)}
+        names.update(uc["name"] for uc in inspect(self.engine).get_unique_constraints(table_name))
+        return index_name in names
+
+    # Plain statements
+    def execute(self, sql: str, **params):
+        with self.engine.begin() as conn:
+            return conn.execute(text(sql), params)
+
+    def _ddl(self, sql: str):
+        # Short lock_timeout plus retries so DDL on a busy table never queues
+        # behind a long transaction while blocking every other writer
+        for attempt in range(1, LOCK_RETRIES + 1):
+            try:
+                with self.engine.begin() as conn:
+                    if self.is_postgres:
+                        conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+                    conn.execute(text(sql))
+                return
+            except OperationalError as e:
+                if not self.is_postgres or "lock timeout" not in str(e).lower() or attempt == LOCK_RETRIES:
+                    raise
+                self.echo(f"  lock timeout, retrying ({attempt}/{LOCK_RETRIES})...")
+                time.sleep(min(2 ** attempt, 30))
+
+    def _autocommit(self) -> Connection:
+        return self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+    # Tables and columns
+    def create_table(self, table: sa.Table):
+        if self.has_table(table.name):
+            return
+        self.echo(f"  create table {table.name}")
+        table.create(bind=self.engine, checkfirst=True)
+
+    def drop_table(self, table_name: str):
+        if not self.has_table(table_name):
+            return
+        self.echo(f"  drop table {table_name}")
+        self._ddl(f"DROP TABLE {table_name}")
+
+    def add_column(self, table_name: str, column: sa.Column):
+        """Add a nullable column (or one with a constant default), which is a metadata-only change."""
+        if self.has_column(table_name, column.name):
+            return
+        col_type = column.type.compile(dialect=self.engine.dialect)
+        sql = f"ALTER TABLE {table_name} ADD COLUMN {column.name} {col_type}"
+        if column.server_default is not None:
+            sql += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable and column.server_default is not None:
+            sql += " NOT NULL"
+        if column.foreign_keys:
+            fk = next(iter(column.foreign_keys))
+            references = f"REFERENCES {fk.target_fullname.replace('.', '(')})"
+            if fk.ondelete:
+                references += f" ON DELETE {fk.ondelete}"
+            if self.is_postgres:
+                # NOT VALID skips the full-table scan; existing rows are NULL anyway
+                self.echo(f"  add column {table_name}.{column.name}")
+                self._ddl(sql)
+                self._ddl(
+                    f"ALTER TABLE {table_name} ADD CONSTRAINT fk_{table_name}_{column.name} "
+                    f"FOREIGN KEY ({column.name}) {references} NOT VALID"
+                )
+                return
+            sql += f" {references}"
+        self.echo(f"  add column {table_name}.{column.name}")
+        self._ddl(sql)
+
+    def drop_column(self, table_name: str, column_name: str):
+        if not self.has_column(table_name, column_name):
+            return
+        self.echo(f"  drop column {table_name}.{column_name}")
+        self._ddl(f"ALTER TABLE {table_name} DROP COLUMN {column_name}")
+
+    def alter_column_default(self, table_name: str, column_name: str, default_sql: Optional[str]):
+        if not self.is_postgres:
+            # SQLite cannot alter column defaults; the models carry them instead
+            return
+        action = f"SET DEFAULT {default_sql}" if default_sql is not None else "DROP DEFAULT"
+        self._ddl(f"ALTER TABLE {table_name} ALTER COLUMN {column_name} {action}")
+
+    # Indexes
+    def _index_is_invalid(self, index_name: str) -> bool:
+        with self.engine.connect() as conn:
+            return bool(conn.execute(text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {"name": index_name}).first())
+
+    def create_index(
+        self,
+        index_name: str,
+        table_name: str,
+        columns: Sequence[str],
+        unique: bool = False,
+        where: Optional[str] = None,
+        using: Optional[str] = None,
+        concurrently: bool = True,
+    ):
+        """Create an index without blocking writes (CONCURRENTLY on PostgreSQL).
+
+        A concurrent build that was interrupted leaves an INVALID index behind;
+        it is dropped and rebuilt so re-running the migration repairs it.
+        """
+        concurrent = concurrently and self.is_postgres
+        if concurrent and self._index_is_invalid(index_name):
+            self.echo(f"  rebuilding invalid index {index_name}")
+            self.drop_index(index_name, table_name, concurrently=True)
+        if self.has_index(table_name, index_name):
+            return
+
+        sql = "CREATE {unique}INDEX {concurrently}IF NOT EXISTS {name} ON {table}{using} ({cols})".format(
+            unique="UNIQUE " if unique else "",
+            concurrently="CONCURRENTLY " if concurrent else "",
+            name=index_name,
+            table=table_name,
+            using=f" USING {using}" if using and self.is_postgres else "",
+            cols=", ".join(columns),
+        )
+        if where:
+            sql += f" WHERE {where}"
+
+        self.echo(f"  create index {index_name}")
+        if concurrent:
+            with self._autocommit() as conn:
+                conn.execute(text(sql))
+        else:
+            self._ddl(sql)
+
+    def drop_index(self, index_name: str, table_name: str, concurrently: bool = True):
+        self.echo(f"  drop index {index_name}")
+        if concurrently and self.is_postgres:
+            with self._autocommit() as conn:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+        else:
+            self._ddl(f"DROP INDEX IF EXISTS {index_name}")
+
+    # Batched, resumable data changes
+    def _get_progress(self, step: str):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                sa.select(migration_progress.c.cursor, migration_progress.c.done).where(
+                    migration_progress.c.version == self.version,
+                    migration_progress.c.step == step,
+                )
+            ).first()
+
+    def _save_progress(self, conn: Connection, step: str, cursor: Optional[int], done: bool = False):
+        updated = conn.execute(
+            migration_progress.update().where(
+                migration_progress.c.version == self.version,
+                migration_progress.c.step == step,
+            ).values(cursor=cursor, done=done)
+        ).rowcount
+        if not updated:
+            conn.execute(migration_progress.insert().values(
+                version=self.version, step=step, cursor=cursor, done=done
+            ))
+
+    def run_batched(
+        self,
+        step: str,
+        table_name: str,
+        fn: Callable[[Connection, int, int], None],
+        key: str = "id",
+        batch_size: Optional[int] = None,
+        throttle: Optional[float] = None,
+    ):
+        """Call ``fn(conn, lo, hi)`` for consecutive ``key`` ranges ``(lo, hi]``.
+
+        Each batch commits together with its progress row, so an interrupted
+        run resumes from the last finished batch. ``throttle`` seconds of sleep
+        between batches keep replication lag and lock pressure down.
+        """
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        throttle = DEFAULT_THROTTLE if throttle is None else throttle
+
+        progress = self._get_progress(step)
+        if progress and progress.done:
+            return
+
+        with self.engine.connect() as conn:
+            lo_key, hi_key = conn.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {table_name}")).first()
+
+        if hi_key is None:
+            with self.engine.begin() as conn:
+                self._save_progress(conn, step, None, done=True)
+            return
+
+        cursor = progress.cursor if progress and progress.cursor is not None else lo_key - 1
+        if cursor > lo_key - 1:
+            self.echo(f"  resuming {step} after {key}={cursor}")
+
+        batches = 0
+        while cursor < hi_key:
+            upper = min(cursor + batch_size, hi_key)
+            with self.engine.begin() as conn:
+                fn(conn, cursor, upper)
+                self._save_progress(conn, step, upper, done=upper >= hi_key)
+            cursor = upper
+            batches += 1
+            if batches % 10 == 0:
+                self.echo(f"  {step}: {key} {cursor}/{hi_key}")
+            if throttle and cursor < hi_key:
+                time.sleep(throttle)
+
+    def backfill(
+        self,
+        step: str,
+        table_name: str,
+        set_sql: str,
+        where: Optional[str] = None,
+        key: str = "id",
+        batch_size: Optional[int] = None,
+        throttle: Optional[float] = None,
+        **params,
+    ):
+        """Run ``UPDATE table SET <set_sql>`` in primary-key batches."""
+        condition = f"{key} > :_lo AND {key} <= :_hi"
+        if where:
+            condition += f" AND ({where})"
+        statement = text(f"UPDATE {table_name} SET {set_sql} WHERE {condition}")
+
+        def apply(conn: Connection, lo: int, hi: int):
+            conn.execute(statement, {"_lo": lo, "_hi": hi, **params})
+
+        self.echo(f"  backfill {step}")
+        self.run_batched(step, table_name, apply, key=key, batch_size=batch_size, throttle=throttle)
+
+    def clear_progress(self, steps: Optional[List[str]] = None):
+        with self.engine.begin() as conn:
+            query = migration_progress.delete().where(migration_progress.c.version == self.version)
+            if steps:
+                query = query.where(migration_progress.c.step.in_(steps))
+            conn.execute(query)
@@ -0,0 +1,142 @@
+# migrations/runner.py
+"""Versioned migration runner.
+
+Migrations live in ``migrations/versions/NNN_description.py`` and define
+``upgrade(op)`` and optionally ``downgrade(op)``, where ``op`` is a
+``migrations.ops.Operations``. Applied versions are tracked in the
+``schema_migrations`` table.
+
+Usage:
+    python -m migrations.runner upgrade [version]
+    python -m migrations.runner downgrade <version>
+    python -m migrations.runner status
+"""
+import sys
+import os
+import importlib.util
+from contextlib import contextmanager
+from dataclasses import dataclass
+from types import ModuleType
+from typing import List, Optional
+
+# Add the parent directory to sys.path to be able to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from migrations.ops import Operations, meta, schema_migrations
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "versions")
+
+# Arbitrary constant used as the PostgreSQL advisory lock key, so only one
+# process (e.g. one of several uvicorn workers) migrates at a time
+ADVISORY_LOCK_KEY = 73_610_026
+
+
+@dataclass
+class Migration:
+    version: str
+    name: str
+    module: ModuleType
+
+
+def discover() -> List[Migration]:
+    migrations = []
+    for filename in sorted(os.listdir(VERSIONS_DIR)):
+        if not filename.endswith(".py") or filename.startswith("_"):
+            continue
+        version, _, name = filename[:-3].partition("_")
+        if not version.isdigit():
+            continue
+        spec = importlib.util.spec_from_file_location(f"migrations.versions.v{version}", os.path.join(VERSIONS_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append(Migration(version=version, name=name, module=module))
+    return migrations
+
+
+def _get_engine() -> Engine:
+    from app.database import engine
+    return engine
+
+
+def applied_versions(engine: Engine) -> List[str]:
+    meta.create_all(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        rows = conn.execute(sa.select(schema_migrations.c.version).order_by(schema_migrations.c.version))
+        return [row[0] for row in rows]
+
+
+@contextmanager
+def _migration_lock(engine: Engine):
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+
+def upgrade(engine: Optional[Engine] = None, target: Optional[str] = None):
+    engine = engine or _get_engine()
+    with _migration_lock(engine):
+        applied = set(applied_versions(engine))
+        pending = [m for m in discover() if m.version not in applied and (target is None or m.version <= target)]
+        if not pending:
+            print("Database is up to date.")
+            return
+
+        for migration in pending:
+            print(f"Applying {migration.version}_{migration.name}...")
+            op = Operations(engine, migration.version)
+            migration.module.upgrade(op)
+            with engine.begin() as conn:
+                conn.execute(schema_migrations.insert().values(version=migration.version, name=migration.name))
+            op.clear_progress()
+        print("Migrations applied successfully!")
+
+
+def downgrade(target: str, engine: Optional[Engine] = None):
+    engine = engine or _get_engine()
+    with _migration_lock(engine):
+        applied = set(applied_versions(engine))
+        to_revert = [m for m in reversed(discover()) if m.version in applied and m.version > target]
+        for migration in to_revert:
+            if not hasattr(migration.module, "downgrade"):
+                raise RuntimeError(f"Migration {migration.version} cannot be downgraded")
+            print(f"Reverting {migration.version}_{migration.name}...")
+            op = Operations(engine, migration.version)
+            migration.module.downgrade(op)
+            with engine.begin() as conn:
+                conn.execute(schema_migrations.delete().where(schema_migrations.c.version == migration.version))
+            op.clear_progress()
+        print("Downgrade complete!")
+
+
+def status(engine: Optional[Engine] = None):
+    engine = engine or _get_engine()
+    applied = set(applied_versions(engine))
+    for migration in discover():
+        mark = "x" if migration.version in applied else " "
+        print(f"[{mark}] {migration.version}_{migration.name}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1].lower() if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        upgrade(target=sys.argv[2] if len(sys.argv) > 2 else None)
+    elif command == "downgrade":
+        if len(sys.argv) < 3:
+            print("Usage: python -m migrations.runner downgrade <version>")
+            sys.exit(1)
+        downgrade(sys.argv[2])
+    elif command == "status":
+        status()
+    else:
+        print(f"Unknown command: {command}")
+        print("Available commands: upgrade, downgrade, status")
@@ -0,0 +1,96 @@
+"""initial schema
+
+Revision ID: 000
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+
+# The schema as it was before versioned migrations, frozen here so later
+# model changes only ever reach a database through their own migration
+meta = sa.MetaData()
+
+TABLES = [
+    sa.Table(
+        "categories", meta,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("name", sa.String(100), unique=True, nullable=False),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ),
+    sa.Table(
+        "accounts", meta,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("name", sa.String(100), unique=True, nullable=False),
+        sa.Column("initial_balance", sa.Numeric(12, 2), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ),
+    sa.Table(
+        "tags", meta,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("name", sa.String(50), unique=True, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ),
+    sa.Table(
+        "expenses", meta,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("date", sa.Date, nullable=False, index=True),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("category_id", sa.Integer, sa.ForeignKey("categories.id"), nullable=False),
+        sa.Column("account_id", sa.Integer, sa.ForeignKey("accounts.id"), nullable=True),
+        sa.Column("receipt_path", sa.String(255), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ),
+    sa.Table(
+        "expense_tags", meta,
+        sa.Column("expense_id", sa.Integer, sa.ForeignKey("expenses.id"), primary_key=True),
+        sa.Column("tag_id", sa.Integer, sa.ForeignKey("tags.id"), primary_key=True),
+    ),
+    sa.Table(
+        "budgets", meta,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("category_id", sa.Integer, sa.ForeignKey("categories.id"), nullable=False),
+        sa.Column("year", sa.Integer, nullable=False),
+        sa.Column("month", sa.Integer, nullable=False),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("category_id", "year", "month", name="uq_budget_cat_month"),
+    ),
+    sa.Table(
+        "recurring_expenses", meta,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("name", sa.String(150), nullable=False),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("category_id", sa.Integer, sa.ForeignKey("categories.id"), nullable=False),
+        sa.Column("interval", sa.String(20), nullable=False),
+        sa.Column("next_date", sa.Date, nullable=False),
+        sa.Column("end_date", sa.Date, nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ),
+    sa.Table(
+        "users", meta,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("username", sa.String(50), unique=True, index=True, nullable=False),
+        sa.Column("email", sa.String(100), unique=True, index=True, nullable=False),
+        sa.Column("full_name", sa.String(100)),
+        sa.Column("hashed_password", sa.String(100), nullable=False),
+        sa.Column("is_active", sa.Boolean),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ),
+]
+
+def upgrade(op):
+    # Existing tables are left alone
+    for table in TABLES:
+        op.create_table(table)
+
+def downgrade(op):
+    for table in reversed(TABLES):
+        op.drop_table(table.name)
@@ -0,0 +1,17 @@
+"""expense recurring occurrence guard
+
+Revision ID: 002
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+
+def upgrade(op):
+    op.add_column('expenses', sa.Column(
+        'recurring_id', sa.Integer, sa.ForeignKey('recurring_expenses.id', ondelete='SET NULL'), nullable=True
+    ))
+    # Makes recurring generation idempotent across workers
+    op.create_index('uq_expense_recurring_occurrence', 'expenses', ['recurring_id', 'date'], unique=True)
+
+def downgrade(op):
+    op.drop_index('uq_expense_recurring_occurrence', 'expenses')
+    op.drop_column('expenses', 'recurring_id')
@@ -0,0 +1,67 @@
+"""account balance snapshots
+
+Revision ID: 003
+Create Date: 2026-10-19
+"""
+from decimal import Decimal
+
+import sqlalchemy as sa
+
+meta = sa.MetaData()
+
+accounts = sa.Table(
+    "accounts", meta,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("initial_balance", sa.Numeric(12, 2)),
+)
+
+expenses = sa.Table(
+    "expenses", meta,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("account_id", sa.Integer),
+    sa.Column("date", sa.Date),
+    sa.Column("amount", sa.Numeric(12, 2)),
+)
+
+snapshots = sa.Table(
+    "account_balance_snapshots", meta,
+    sa.Column("account_id", sa.Integer, sa.ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("month", sa.Date, primary_key=True),
+    sa.Column("spent", sa.Numeric(14, 2), nullable=False),
+    sa.Column("closing_balance", sa.Numeric(14, 2), nullable=False),
+    sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+)
+
+def _seed(conn):
+    # Same result as app.balances.rebuild at the time of this migration
+    initial = {account_id: Decimal(balance or 0) for account_id, balance in conn.execute(sa.select(accounts))}
+    conn.execute(snapshots.delete())
+    rows = []
+    for account_id, day, amount in conn.execute(
+        sa.select(expenses.c.account_id, expenses.c.date, sa.func.sum(expenses.c.amount))
+        .where(expenses.c.account_id.isnot(None))
+        .group_by(expenses.c.account_id, expenses.c.date)
+        .order_by(expenses.c.account_id, expenses.c.date)
+    ):
+        if account_id not in initial:
+            continue
+        month = day.replace(day=1)
+        if not rows or rows[-1]["account_id"] != account_id or rows[-1]["month"] != month:
+            opening = rows[-1]["closing_balance"] if rows and rows[-1]["account_id"] == account_id else initial[account_id]
+            rows.append({"account_id": account_id, "month": month, "spent": Decimal(0), "closing_balance": opening})
+        rows[-1]["spent"] += Decimal(amount)
+        rows[-1]["closing_balance"] -= Decimal(amount)
+    if rows:
+        conn.execute(snapshots.insert(), rows)
+    return len(rows)
+
+def upgrade(op):
+    op.create_index('ix_expenses_account_date', 'expenses', ['account_id', 'date'])
+    op.create_table(snapshots)
+    # Seed from existing expenses; replaces any partial result of an earlier run
+    with op.engine.begin() as conn:
+        op.echo(f"  seeded {_seed(conn)} balance snapshots")
+
+def downgrade(op):
+    op.drop_table('account_balance_snapshots')
+    op.drop_index('ix_expenses_account_date', 'expenses')
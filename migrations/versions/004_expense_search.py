@@ -0,0 +1,46 @@
+"""expense description search indexes
+
+Revision ID: 004
+Create Date: 2026-10-19
+"""
+import os
+
+# Must match the expression app/search.py queries with
+TS_CONFIG = os.getenv("SEARCH_TS_CONFIG", "simple")
+TSVECTOR_SQL = f"to_tsvector('{TS_CONFIG}', coalesce(description, ''))"
+FTS_TABLE = "expenses_fts"
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "description, content='expenses', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON expenses BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON expenses BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF description ON expenses BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) VALUES ('delete', old.id, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, description) VALUES (new.id, new.description); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+def upgrade(op):
+    if op.is_postgres:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index('ix_expenses_description_fts', 'expenses', [TSVECTOR_SQL], using='gin')
+        op.create_index('ix_expenses_description_trgm', 'expenses', ['description gin_trgm_ops'], using='gin')
+    elif op.dialect == 'sqlite':
+        if op.has_table(FTS_TABLE):
+            return
+        op.echo(f"  create fts table {FTS_TABLE}")
+        with op.engine.begin() as conn:
+            for statement in SQLITE_DDL:
+                conn.exec_driver_sql(statement)
+
+def downgrade(op):
+    if op.is_postgres:
+        op.drop_index('ix_expenses_description_trgm', 'expenses')
+        op.drop_index('ix_expenses_description_fts', 'expenses')
+    elif op.dialect == 'sqlite':
+        for trigger in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}")
+        op.drop_table(FTS_TABLE)
@@ -0,0 +1,24 @@
+"""reference data version counters
+
+Revision ID: 005
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+
+reference_versions = sa.Table(
+    "reference_versions", sa.MetaData(),
+    sa.Column("name", sa.String(50), primary_key=True),
+    sa.Column("version", sa.Integer, nullable=False),
+)
+
+def upgrade(op):
+    op.create_table(reference_versions)
+    for name in ('categories', 'accounts', 'tags'):
+        op.execute(
+            "INSERT INTO reference_versions (name, version) SELECT :name, 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM reference_versions WHERE name = :name)",
+            name=name
+        )
+
+def downgrade(op):
+    op.drop_table('reference_versions')
@@ -0,0 +1,51 @@
+"""expense duplicate fingerprints
+
+Revision ID: 006
+Create Date: 2026-10-19
+"""
+import hashlib
+import re
+from decimal import Decimal
+
+import sqlalchemy as sa
+
+expenses = sa.table(
+    "expenses",
+    sa.column("id"), sa.column("date"), sa.column("amount"), sa.column("account_id"), sa.column("description"),
+    sa.column("fingerprint"),
+)
+
+# Frozen copy of app/duplicates.fingerprint as of this revision, so later
+# changes to the app cannot change what this migration writes
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+def _fingerprint(day, amount, account_id, description):
+    text = _SPACES.sub(" ", _PUNCTUATION.sub(" ", (description or "").lower())).strip()
+    cents = int(Decimal(amount) * 100)
+    key = f"{day.isoformat()}|{cents}|{account_id or ''}|{text}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def _fill_fingerprints(conn, lo, hi):
+    rows = conn.execute(
+        sa.select(expenses.c.id, expenses.c.date, expenses.c.amount, expenses.c.account_id, expenses.c.description)
+        .where(expenses.c.id > lo, expenses.c.id <= hi, expenses.c.fingerprint.is_(None))
+    ).all()
+    if rows:
+        conn.execute(
+            sa.update(expenses).where(expenses.c.id == sa.bindparam('_id')),
+            [{"_id": row.id, "fingerprint": _fingerprint(row.date, row.amount, row.account_id, row.description)}
+             for row in rows]
+        )
+
+def upgrade(op):
+    op.add_column('expenses', sa.Column('fingerprint', sa.String(40), nullable=True))
+    op.add_column('expenses', sa.Column('duplicate_of_id', sa.Integer, nullable=True))
+    # Computed in Python; normalization and hashing are not portable SQL
+    op.run_batched('fill_fingerprints', 'expenses', _fill_fingerprints)
+    op.create_index('ix_expenses_fingerprint', 'expenses', ['fingerprint'])
+
+def downgrade(op):
+    op.drop_index('ix_expenses_fingerprint', 'expenses')
+    op.drop_column('expenses', 'duplicate_of_id')
+    op.drop_column('expenses', 'fingerprint')
@@ -0,0 +1,35 @@
+"""statement import jobs
+
+Revision ID: 007
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+
+import_jobs = sa.Table(
+    "import_jobs", sa.MetaData(),
+    sa.Column("id", sa.Integer, primary_key=True, index=True),
+    sa.Column("filename", sa.String(255), nullable=True),
+    sa.Column("format", sa.String(10), nullable=False),
+    sa.Column("status", sa.String(20), nullable=False),
+    sa.Column("mapping", sa.Text, nullable=True),
+    sa.Column("dedupe", sa.String(10), nullable=True),
+    sa.Column("upload_path", sa.String(255), nullable=True),
+    sa.Column("size_bytes", sa.Integer, nullable=False),
+    sa.Column("baseline_expense_id", sa.Integer, nullable=False),
+    sa.Column("rows_read", sa.Integer, nullable=False),
+    sa.Column("rows_imported", sa.Integer, nullable=False),
+    sa.Column("rows_skipped", sa.Integer, nullable=False),
+    sa.Column("rows_failed", sa.Integer, nullable=False),
+    sa.Column("chunks_committed", sa.Integer, nullable=False),
+    sa.Column("errors", sa.Text, nullable=True),
+    sa.Column("error", sa.Text, nullable=True),
+    sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+)
+
+def upgrade(op):
+    op.create_table(import_jobs)
+
+def downgrade(op):
+    op.drop_table('import_jobs')
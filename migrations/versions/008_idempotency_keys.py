@@ -0,0 +1,25 @@
+"""idempotency keys
+
+Revision ID: 008
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+
+idempotency_keys = sa.Table(
+    "idempotency_keys", sa.MetaData(),
+    sa.Column("scope", sa.String(64), primary_key=True),
+    sa.Column("key", sa.String(255), primary_key=True),
+    sa.Column("request_hash", sa.String(64), nullable=False),
+    sa.Column("status", sa.String(20), nullable=False),
+    sa.Column("response_status", sa.Integer, nullable=True),
+    sa.Column("content_type", sa.String(100), nullable=True),
+    sa.Column("body", sa.LargeBinary, nullable=True),
+    sa.Column("locked_at", sa.DateTime(timezone=True), nullable=False),
+    sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False, index=True),
+)
+
+def upgrade(op):
+    op.create_table(idempotency_keys)
+
+def downgrade(op):
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,53 @@
+"""sync change log
+
+Revision ID: 009
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+
+change_log = sa.Table(
+    "change_log", sa.MetaData(),
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("seq", sa.Integer, nullable=False),
+    sa.Column("entity", sa.String(20), nullable=False),
+    sa.Column("entity_id", sa.Integer, nullable=False),
+    sa.Column("deleted", sa.Boolean, nullable=False),
+    sa.Column("changed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    sa.UniqueConstraint("entity", "entity_id", name="uq_change_log_entity"),
+    sa.Index("ix_change_log_seq", "seq", "entity", "entity_id"),
+)
+
+TABLES = {
+    'expense': 'expenses',
+    'category': 'categories',
+    'tag': 'tags',
+    'account': 'accounts',
+    'budget': 'budgets',
+    'recurring': 'recurring_expenses',
+}
+
+def _seed(entity, table):
+    statement = sa.text(
+        f"INSERT INTO change_log (seq, entity, entity_id, deleted) "
+        f"SELECT 0, :entity, id, FALSE FROM {table} WHERE id > :lo AND id <= :hi"
+    )
+
+    def seed(conn, lo, hi):
+        conn.execute(statement, {"entity": entity, "lo": lo, "hi": hi})
+    return seed
+
+def upgrade(op):
+    op.create_table(change_log)
+    # Existing rows are all part of the first full sync
+    for entity, table in TABLES.items():
+        op.run_batched(f'seed_{entity}', table, _seed(entity, table))
+    for name in ('sync', 'sync_purged'):
+        op.execute(
+            "INSERT INTO reference_versions (name, version) SELECT :name, 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM reference_versions WHERE name = :name)",
+            name=name
+        )
+
+def downgrade(op):
+    op.drop_table('change_log')
+    op.execute("DELETE FROM reference_versions WHERE name IN ('sync', 'sync_purged')")
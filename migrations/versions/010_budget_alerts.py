@@ -0,0 +1,78 @@
+"""budget running totals and threshold alerts
+
+Revision ID: 010
+Create Date: 2026-10-19
+"""
+from decimal import Decimal
+
+import sqlalchemy as sa
+
+meta = sa.MetaData()
+
+sa.Table("categories", meta, sa.Column("id", sa.Integer, primary_key=True))
+sa.Table("budgets", meta, sa.Column("id", sa.Integer, primary_key=True))
+
+expenses = sa.Table(
+    "expenses", meta,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("category_id", sa.Integer),
+    sa.Column("date", sa.Date),
+    sa.Column("amount", sa.Numeric(12, 2)),
+)
+
+budget_spend = sa.Table(
+    "budget_spend", meta,
+    sa.Column("category_id", sa.Integer, sa.ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("month", sa.Date, primary_key=True),
+    sa.Column("spent", sa.Numeric(14, 2), nullable=False),
+    sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+)
+
+budget_alerts = sa.Table(
+    "budget_alerts", meta,
+    sa.Column("id", sa.Integer, primary_key=True, index=True),
+    sa.Column("budget_id", sa.Integer, sa.ForeignKey("budgets.id", ondelete="CASCADE"), nullable=False),
+    sa.Column("category_id", sa.Integer, nullable=False),
+    sa.Column("year", sa.Integer, nullable=False),
+    sa.Column("month", sa.Integer, nullable=False),
+    sa.Column("threshold", sa.Integer, nullable=False),
+    sa.Column("spent", sa.Numeric(14, 2), nullable=False),
+    sa.Column("budget_amount", sa.Numeric(12, 2), nullable=False),
+    sa.Column("status", sa.String(20), nullable=False),
+    sa.Column("attempts", sa.Integer, nullable=False),
+    sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+    sa.Column("last_error", sa.Text, nullable=True),
+    sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    sa.Column("delivered_at", sa.DateTime(timezone=True), nullable=True),
+    sa.UniqueConstraint("budget_id", "threshold", name="uq_budget_alert_threshold"),
+    sa.Index("ix_budget_alerts_outbox", "status", "next_attempt_at"),
+)
+
+def _seed(conn):
+    # Same result as app.budget_alerts.rebuild at the time of this migration
+    conn.execute(budget_spend.delete())
+    totals = {}
+    for category_id, day, amount in conn.execute(
+        sa.select(expenses.c.category_id, expenses.c.date, sa.func.sum(expenses.c.amount))
+        .group_by(expenses.c.category_id, expenses.c.date)
+    ):
+        key = (category_id, day.replace(day=1))
+        totals[key] = totals.get(key, Decimal(0)) + Decimal(amount)
+    rows = [{"category_id": category_id, "month": month, "spent": spent} for (category_id, month), spent in totals.items()]
+    if rows:
+        conn.execute(budget_spend.insert(), rows)
+    return len(rows)
+
+def upgrade(op):
+    op.add_column('budgets', sa.Column('thresholds', sa.String(100), nullable=True))
+    op.create_table(budget_spend)
+    op.create_table(budget_alerts)
+    # Seed from existing expenses; replaces any partial result of an earlier run.
+    # Thresholds already crossed before this migration do not alert.
+    with op.engine.begin() as conn:
+        op.echo(f"  seeded {_seed(conn)} budget spend rows")
+
+def downgrade(op):
+    op.drop_table('budget_alerts')
+    op.drop_table('budget_spend')
+    op.drop_column('budgets', 'thresholds')
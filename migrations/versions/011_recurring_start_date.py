@@ -0,0 +1,14 @@
+"""recurring rule anchor date
+
+Revision ID: 011
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+
+def upgrade(op):
+    op.add_column('recurring_expenses', sa.Column('start_date', sa.Date, nullable=True))
+    # The original start is unknown for existing rules; their next date is the best anchor left
+    op.backfill('start_date', 'recurring_expenses', 'start_date = next_date', where='start_date IS NULL')
+
+def downgrade(op):
+    op.drop_column('recurring_expenses', 'start_date')
@@ -0,0 +1,13 @@
+"""archived marker on change log tombstones
+
+Revision ID: 012
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+
+def upgrade(op):
+    # Constant default: a metadata-only change, existing tombstones read as real deletes
+    op.add_column('change_log', sa.Column('archived', sa.Boolean, nullable=False, server_default=sa.text('false')))
+
+def downgrade(op):
+    op.drop_column('change_log', 'archived')
@@ -0,0 +1,34 @@
+# scripts/archive_expenses.py
+"""Move expenses older than a cutoff month into compressed columnar month files.
+
+Usage:
+    python -m scripts.archive_expenses YYYY-MM [--dry-run]
+
+Expenses dated before the first day of YYYY-MM are written to
+EXPENSE_ARCHIVE_DIR (default: archive/expenses) and deleted from the
+database. Summaries keep including them transparently.
+"""
+import sys
+import os
+from datetime import date
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine
+from app import archive
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    year, month = args[0].split("-")
+    cutoff = date(int(year), int(month), 1)
+    dry_run = "--dry-run" in sys.argv
+
+    results = archive.archive_before(engine, cutoff, dry_run=dry_run)
+    for y, m, rows in results:
+        print(f"{y:04d}-{m:02d}: {rows} expenses{' (dry run)' if dry_run else ''}")
+    print(f"Archived {sum(r[2] for r in results)} expenses from {len(results)} months.")
@@ -0,0 +1,75 @@
+# scripts/bench_analytics.py
+"""Benchmark the in-memory analytics engine against the SQL path of /expenses/stats.
+
+Loads the engine from the configured database, checks that both paths return
+identical summaries for a set of date ranges, and prints the latency of each.
+Seed a large dataset first, e.g. ``python -m scripts.generate_data --expenses 10000000``.
+
+Usage:
+    python -m scripts.bench_analytics [runs]
+"""
+import sys
+import os
+import statistics
+import time
+from datetime import timedelta
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+
+from app import analytics, crud, models
+from app.database import SessionLocal, engine
+
+
+def _sorted(summary):
+    summary["by_category"] = sorted(summary["by_category"], key=lambda r: r["category_id"])
+    summary["by_tag"] = sorted(summary["by_tag"], key=lambda r: r["tag_id"])
+    return summary
+
+
+def _time(fn, runs):
+    timings = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return result, statistics.median(timings)
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    db = SessionLocal()
+    try:
+        first, last = db.query(func.min(models.Expense.date), func.max(models.Expense.date)).one()
+        rows = db.query(func.count(models.Expense.id)).scalar()
+        if not rows:
+            print("No expenses found; seed the database first.")
+            sys.exit(1)
+
+        t0 = time.perf_counter()
+        analytics.engine_store.load(engine)
+        print(f"Loaded {rows:,} expenses into the engine in {time.perf_counter() - t0:.1f}s")
+        analytics.ENABLED = True
+
+        span = (last - first).days
+        ranges = [
+            ("all", None, None, None),
+            ("last 30 days", last - timedelta(days=30), last, None),
+            ("last year", last - timedelta(days=365), last, None),
+            ("half span", first + timedelta(days=span // 4), first + timedelta(days=3 * span // 4), None),
+            ("one category", None, None, db.query(models.Category.id).first()[0]),
+        ]
+
+        print(f"{'range':<16}{'sql ms':>12}{'engine ms':>12}{'speedup':>10}  match")
+        mismatches = 0
+        for label, start, end, category_id in ranges:
+            sql_result, sql_ms = _time(lambda: crud.get_expense_summary(db, start, end, category_id, use_engine=False), runs)
+            engine_result, engine_ms = _time(lambda: crud.get_expense_summary(db, start, end, category_id), runs)
+            match = _sorted(sql_result) == _sorted(engine_result)
+            mismatches += not match
+            print(f"{label:<16}{sql_ms:>12.1f}{engine_ms:>12.1f}{sql_ms / engine_ms:>9.1f}x  {'yes' if match else 'NO'}")
+        sys.exit(1 if mismatches else 0)
+    finally:
+        db.close()
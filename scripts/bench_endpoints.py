@@ -0,0 +1,241 @@
+# scripts/bench_endpoints.py
+"""Concurrent load test of the hot API endpoints with regression thresholds.
+
+Boots the app in-process against a benchmark database (BENCH_DATABASE_URL,
+default: a local SQLite file), seeds it with generated data if it is empty,
+then drives each scenario with concurrent clients and records throughput,
+p50/p95/p99 latency, SQL statements per request and peak RSS.
+
+Results are compared against scripts/bench_baseline.json; the run exits
+non-zero when a scenario regresses beyond the tolerance.
+
+Usage:
+    python -m scripts.bench_endpoints [--requests 200] [--concurrency 16] [--expenses 100000]
+    python -m scripts.bench_endpoints --update-baseline
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import random
+import resource
+import statistics
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Tuple
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The engine is created on import, so point it at the benchmark database first
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("DEBUG", "False")
+
+import httpx
+from sqlalchemy import event, func, select
+
+from app.database import engine, SessionLocal
+from app import crud, models, schemas
+from app.utils.security import get_password_hash
+from migrations.runner import upgrade
+from scripts import generate_data
+import main
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+
+# SQL statements executed across all threads during a scenario
+_total_queries = 0
+_total_lock = threading.Lock()
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    global _total_queries
+    with _total_lock:
+        _total_queries += 1
+
+
+def prepare_database(expenses: int, seed: int):
+    upgrade(engine)
+    with engine.connect() as conn:
+        has_data = conn.execute(select(func.count()).select_from(models.Expense.__table__)).scalar()
+    if not has_data:
+        print(f"Seeding benchmark database with {expenses:,} expenses...")
+        generate_data.generate(generate_data.parse_args(["--expenses", str(expenses), "--seed", str(seed)]))
+
+    db = SessionLocal()
+    try:
+        if not crud.get_user_by_username(db, BENCH_USER):
+            crud.create_user(
+                db,
+                schemas.UserCreate(username=BENCH_USER, email="bench@example.com", password=BENCH_PASSWORD),
+                hashed_password=get_password_hash(BENCH_PASSWORD),
+            )
+        bounds = db.query(func.min(models.Expense.date), func.max(models.Expense.date)).one()
+        category_ids = [c for (c,) in db.query(models.Category.id).all()]
+        account_ids = [a for (a,) in db.query(models.Account.id).all()]
+        return bounds, category_ids, account_ids
+    finally:
+        db.close()
+
+
+def build_scenarios(bounds, category_ids, account_ids, rng: random.Random) -> Dict[str, Callable[[], Tuple[str, str, dict]]]:
+    first, last = bounds
+    span = (last - first).days
+
+    def random_range(days: int):
+        start = first + timedelta(days=rng.randrange(max(span - days, 1)))
+        return start, start + timedelta(days=days)
+
+    def list_expenses():
+        start, end = random_range(90)
+        params = {"limit": 50, "start_date": start.isoformat(), "end_date": end.isoformat()}
+        if rng.random() < 0.5:
+            params["category_id"] = rng.choice(category_ids)
+        return "GET", "/api/v1/expenses/", {"params": params}
+
+    def expense_stats():
+        start, end = random_range(365)
+        return "GET", "/api/v1/expenses/stats", {"params": {"start_date": start.isoformat(), "end_date": end.isoformat()}}
+
+    def budget_stats():
+        day = first + timedelta(days=rng.randrange(max(span, 1)))
+        return "GET", "/api/v1/budgets/stats", {"params": {"year": day.year, "month": day.month}}
+
+    def create_expense():
+        body = {
+            "amount": f"{rng.randint(1, 50000) / 100:.2f}",
+            "date": (last - timedelta(days=rng.randrange(30))).isoformat(),
+            "description": "bench expense",
+            "category_id": rng.choice(category_ids),
+            "account_id": rng.choice(account_ids) if account_ids else None,
+        }
+        return "POST", "/api/v1/expenses/", {"json": body}
+
+    def generate_recurring():
+        return "POST", "/api/v1/recurring/generate/", {"params": {"date_today": last.isoformat()}}
+
+    def login():
+        return "POST", "/api/v1/auth/token", {"data": {"username": BENCH_USER, "password": BENCH_PASSWORD}}
+
+    return {
+        "GET /expenses": list_expenses,
+        "GET /expenses/stats": expense_stats,
+        "GET /budgets/stats": budget_stats,
+        "POST /expenses": create_expense,
+        "POST /recurring/generate": generate_recurring,
+        "POST /auth/token": login,
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, make_request, requests: int, concurrency: int) -> dict:
+    global _total_queries
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        method, url, kwargs = make_request()
+        async with semaphore:
+            t0 = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        if response.status_code >= 400:
+            errors += 1
+
+    with _total_lock:
+        _total_queries = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(quantiles[49], 2),
+        "p95_ms": round(quantiles[94], 2),
+        "p99_ms": round(quantiles[98], 2),
+        "queries_per_request": round(_total_queries / requests, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: {result['errors']} errors (baseline {base.get('errors', 0)})")
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms > {base['p95_ms']}ms +{tolerance:.0%}")
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput_rps']} rps < {base['throughput_rps']} rps -{tolerance:.0%}")
+        # Query counts are deterministic, so any increase is an N+1 regression
+        if result["queries_per_request"] > base["queries_per_request"] + 0.5:
+            regressions.append(f"{name}: {result['queries_per_request']} queries/request > {base['queries_per_request']}")
+    return regressions
+
+
+async def main_async(args) -> int:
+    rng = random.Random(args.seed)
+    bounds, category_ids, account_ids = prepare_database(args.expenses, args.seed)
+    scenarios = build_scenarios(bounds, category_ids, account_ids, rng)
+    selected = {k: v for k, v in scenarios.items() if not args.only or any(o in k for o in args.only)}
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, make_request in selected.items():
+            # Warm up connections and caches before measuring
+            await run_scenario(client, make_request, min(10, args.requests), args.concurrency)
+            results[name] = await run_scenario(client, make_request, args.requests, args.concurrency)
+            r = results[name]
+            print(
+                f"{name:<26}{r['throughput_rps']:>9} rps  p50 {r['p50_ms']:>8}ms  p95 {r['p95_ms']:>8}ms  "
+                f"p99 {r['p99_ms']:>8}ms  {r['queries_per_request']:>6} q/req  {r['errors']} err"
+            )
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("No baseline found; run with --update-baseline first.")
+        return 0
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print("No regressions against baseline.")
+    return 1 if regressions else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test hot endpoints and compare against a baseline.")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--expenses", type=int, default=100_000, help="rows to generate into an empty database")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative latency/throughput drift")
+    parser.add_argument("--only", nargs="*", help="run only scenarios whose name contains one of these")
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main_async(parse_args())))
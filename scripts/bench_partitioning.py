@@ -0,0 +1,117 @@
+# scripts/bench_partitioning.py
+"""Benchmark month-scoped expense stats with and without monthly partitioning (PostgreSQL).
+
+Builds two scratch tables with identical synthetic data -- one plain, one
+range-partitioned by month -- and times the per-category monthly aggregate
+that backs /budgets/stats and /expenses/stats on both.
+
+Usage:
+    python -m scripts.bench_partitioning [rows] [months] [runs]
+"""
+import sys
+import os
+import statistics
+import time
+from datetime import date
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.utils.date_utils import add_months, get_month_range
+
+PLAIN = "bench_expenses_plain"
+PARTITIONED = "bench_expenses_part"
+
+STATS_SQL = """
+    SELECT category_id, SUM(amount), COUNT(*)
+    FROM {table}
+    WHERE date >= :start AND date <= :end
+    GROUP BY category_id
+"""
+
+
+def build(rows: int, months: int, first: date):
+    last = add_months(first, months)
+    span_days = (last - first).days
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {PLAIN}, {PARTITIONED} CASCADE"))
+        columns = "id bigint NOT NULL, amount numeric(12,2) NOT NULL, date date NOT NULL, category_id int NOT NULL, account_id int"
+        conn.execute(text(f"CREATE TABLE {PLAIN} ({columns}, PRIMARY KEY (id))"))
+        conn.execute(text(f"CREATE TABLE {PARTITIONED} ({columns}, PRIMARY KEY (id, date)) PARTITION BY RANGE (date)"))
+        for offset in range(months):
+            start = add_months(first, offset)
+            end = add_months(start, 1)
+            conn.execute(text(
+                f"CREATE TABLE {PARTITIONED}_p{start:%Y%m} PARTITION OF {PARTITIONED} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            ))
+
+        print(f"Generating {rows:,} rows over {months} months...")
+        conn.execute(text(f"""
+            INSERT INTO {PLAIN}
+            SELECT g, round((random() * 200 + 1)::numeric, 2),
+                   DATE '{first}' + (random() * ({span_days} - 1))::int,
+                   1 + (random() * 19)::int, 1 + (random() * 4)::int
+            FROM generate_series(1, :rows) AS g
+        """), {"rows": rows})
+        conn.execute(text(f"INSERT INTO {PARTITIONED} SELECT * FROM {PLAIN}"))
+        for table in (PLAIN, PARTITIONED):
+            conn.execute(text(f"CREATE INDEX ON {table} (date)"))
+            conn.execute(text(f"CREATE INDEX ON {table} (category_id, date)"))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"ANALYZE {PLAIN}"))
+        conn.execute(text(f"ANALYZE {PARTITIONED}"))
+
+
+def time_queries(table: str, month_ranges, runs: int):
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(runs):
+            for start, end in month_ranges:
+                t0 = time.perf_counter()
+                conn.execute(text(STATS_SQL.format(table=table)), {"start": start, "end": end}).all()
+                timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p95": timings[int(len(timings) * 0.95) - 1],
+        "mean": statistics.fmean(timings),
+    }
+
+
+def scanned_partitions(start: date, end: date) -> int:
+    with engine.connect() as conn:
+        plan = conn.execute(
+            text("EXPLAIN " + STATS_SQL.format(table=PARTITIONED)), {"start": start, "end": end}
+        ).scalars().all()
+    return sum(1 for line in plan if f"{PARTITIONED}_p" in line and "Scan" in line)
+
+
+if __name__ == "__main__":
+    if engine.dialect.name != "postgresql":
+        print("This benchmark requires PostgreSQL.")
+        sys.exit(1)
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    months = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    first = date(date.today().year - months // 12, 1, 1)
+
+    build(rows, months, first)
+    month_ranges = []
+    for offset in range(0, months, max(months // 12, 1)):
+        m = add_months(first, offset)
+        month_ranges.append(get_month_range(m.year, m.month))
+
+    print(f"Partitions scanned for one month: {scanned_partitions(*month_ranges[0])} of {months}")
+    print(f"{'table':<12}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for label, table in (("plain", PLAIN), ("partitioned", PARTITIONED)):
+        result = time_queries(table, month_ranges, runs)
+        print(f"{label:<12}{result['p50']:>10.2f}{result['p95']:>10.2f}{result['mean']:>10.2f}")
+
+    if "--keep" not in sys.argv:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {PLAIN}, {PARTITIONED} CASCADE"))
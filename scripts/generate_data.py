@@ -0,0 +1,254 @@
+# scripts/generate_data.py
+"""Generate a large, reproducible synthetic dataset for benchmarking.
+
+Rows are streamed in batches: PostgreSQL uses COPY, other databases use
+multi-row INSERTs. The same --seed always produces the same dataset.
+
+Usage:
+    python -m scripts.generate_data --expenses 1000000 --start 2019-01-01 --end 2024-12-31 --seed 42
+    python -m scripts.generate_data --help
+"""
+import sys
+import os
+import argparse
+import csv
+import io
+import math
+import random
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+
+from app.database import engine
+from app import balances, budget_alerts, duplicates, models, sync
+
+INTERVALS = ["daily", "weekly", "biweekly", "monthly", "quarterly", "yearly"]
+MERCHANTS = [
+    "Grocery store", "Coffee shop", "Gas station", "Restaurant", "Pharmacy", "Online order",
+    "Bus ticket", "Taxi ride", "Electric bill", "Water bill", "Internet", "Phone plan",
+    "Cinema", "Bookstore", "Hardware store", "Gym", "Clothing", "Parking", "Bakery", "Market",
+]
+
+
+def zipf_weights(n: int, skew: float) -> List[float]:
+    """Cumulative weights where item i is picked proportionally to 1 / (i + 1) ** skew (skew 0 = uniform)."""
+    return list(accumulate(1.0 / (i + 1) ** skew for i in range(n)))
+
+
+def poisson(rng: random.Random, mean: float) -> int:
+    # Knuth's method; fine for the small means used for tags per expense
+    limit, k, p = math.exp(-mean), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+def batched(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_rows(engine: Engine, table, rows: Iterable[dict], batch_size: int) -> int:
+    """Stream rows into ``table`` with COPY (PostgreSQL) or multi-row INSERT, committing per batch."""
+    written = 0
+    for batch in batched(rows, batch_size):
+        # Only the generated columns, so server defaults (created_at, ...) still apply
+        columns = list(batch[0])
+        if engine.dialect.name == "postgresql":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in batch:
+                writer.writerow(["\\N" if row.get(c) is None else row.get(c) for c in columns])
+            buffer.seek(0)
+            raw = engine.raw_connection()
+            try:
+                raw.cursor().copy_expert(
+                    f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer
+                )
+                raw.commit()
+            finally:
+                raw.close()
+        else:
+            with engine.begin() as conn:
+                conn.execute(table.insert(), [{c: row.get(c) for c in columns} for row in batch])
+        written += len(batch)
+    return written
+
+
+def next_id(engine: Engine, table) -> int:
+    with engine.connect() as conn:
+        return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def reset_sequences(engine: Engine, tables: Sequence):
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for table in tables:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+            ))
+
+
+def generate(args) -> Dict[str, int]:
+    rng = random.Random(args.seed)
+    counts: Dict[str, int] = {}
+    start, end = date.fromisoformat(args.start), date.fromisoformat(args.end)
+    span_days = (end - start).days + 1
+
+    categories = models.Category.__table__
+    accounts = models.Account.__table__
+    tags = models.Tag.__table__
+    expenses = models.Expense.__table__
+    expense_tags = models.ExpenseTag.__table__
+    budgets = models.Budget.__table__
+    recurring = models.RecurringExpense.__table__
+
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(categories)).scalar():
+            raise SystemExit("Data already exists in the database. Reset it first (python -m scripts.reset_db).")
+
+    # Reference data
+    category_ids = list(range(1, args.categories + 1))
+    account_ids = list(range(1, args.accounts + 1))
+    tag_ids = list(range(1, args.tags + 1))
+    counts["categories"] = write_rows(engine, categories, (
+        {"id": i, "name": f"Category {i:04d}", "description": f"Generated category {i}"} for i in category_ids
+    ), args.batch_size)
+    counts["accounts"] = write_rows(engine, accounts, (
+        {"id": i, "name": f"Account {i:04d}", "initial_balance": f"{rng.randint(0, 1_000_000) / 100:.2f}"} for i in account_ids
+    ), args.batch_size)
+    counts["tags"] = write_rows(engine, tags, ({"id": i, "name": f"tag-{i:05d}"} for i in tag_ids), args.batch_size)
+
+    category_weights = zipf_weights(len(category_ids), args.skew)
+    account_weights = zipf_weights(len(account_ids), args.skew)
+    tag_weights = zipf_weights(len(tag_ids), args.skew)
+
+    # Expenses and their tags are generated together so the ids line up
+    first_expense_id = next_id(engine, expenses)
+    pending_tags: List[dict] = []
+
+    def expense_rows() -> Iterator[dict]:
+        for offset in range(args.expenses):
+            expense_id = first_expense_id + offset
+            category = rng.choices(category_ids, cum_weights=category_weights)[0]
+            account = None if rng.random() < args.no_account_ratio else rng.choices(account_ids, cum_weights=account_weights)[0]
+            cents = max(1, int(rng.lognormvariate(args.amount_mu, args.amount_sigma) * 100))
+            n_tags = min(poisson(rng, args.tags_per_expense), args.max_tags, len(tag_ids))
+            for tag in set(rng.choices(tag_ids, cum_weights=tag_weights, k=n_tags)):
+                pending_tags.append({"expense_id": expense_id, "tag_id": tag})
+            amount = f"{cents // 100}.{cents % 100:02d}"
+            day = start + timedelta(days=rng.randrange(span_days))
+            description = f"{rng.choice(MERCHANTS)} #{rng.randint(1, 999)}"
+            yield {
+                "id": expense_id,
+                "amount": amount,
+                "date": day,
+                "description": description,
+                "category_id": category,
+                "account_id": account,
+                "fingerprint": duplicates.fingerprint(day, amount, account, description),
+            }
+
+    t0 = time.perf_counter()
+    counts["expenses"] = 0
+    counts["expense_tags"] = 0
+    for batch in batched(expense_rows(), args.batch_size):
+        counts["expenses"] += write_rows(engine, expenses, batch, args.batch_size)
+        counts["expense_tags"] += write_rows(engine, expense_tags, pending_tags, args.batch_size)
+        pending_tags.clear()
+        if counts["expenses"] % (args.batch_size * 20) == 0:
+            rate = counts["expenses"] / (time.perf_counter() - t0)
+            print(f"  {counts['expenses']:,} expenses ({rate:,.0f}/s)")
+
+    # Budgets for a share of categories in every month of the span
+    def budget_rows() -> Iterator[dict]:
+        budget_id = next_id(engine, budgets)
+        month = start.replace(day=1)
+        while month <= end:
+            for category in category_ids:
+                if rng.random() < args.budget_ratio:
+                    yield {
+                        "id": budget_id, "category_id": category, "year": month.year, "month": month.month,
+                        "amount": f"{rng.randint(50, 5000)}.00",
+                    }
+                    budget_id += 1
+            month = (month + timedelta(days=32)).replace(day=1)
+
+    counts["budgets"] = write_rows(engine, budgets, budget_rows(), args.batch_size)
+
+    def recurring_rows() -> Iterator[dict]:
+        recurring_id = next_id(engine, recurring)
+        for i in range(args.recurring):
+            next_date = start + timedelta(days=rng.randrange(span_days))
+            yield {
+                "id": recurring_id + i,
+                "name": f"{rng.choice(MERCHANTS)} subscription {i}",
+                "amount": f"{rng.randint(1, 500)}.{rng.randint(0, 99):02d}",
+                "category_id": rng.choices(category_ids, cum_weights=category_weights)[0],
+                "interval": rng.choice(INTERVALS),
+                "next_date": next_date,
+                "start_date": next_date,
+                "end_date": None if rng.random() < 0.7 else next_date + timedelta(days=rng.randint(30, 1000)),
+            }
+
+    counts["recurring_expenses"] = write_rows(engine, recurring, recurring_rows(), args.batch_size)
+
+    # Rows were written behind crud's back, so derive what crud maintains once
+    with engine.begin() as conn:
+        counts["balance_snapshots"] = balances.rebuild(conn)
+        counts["budget_spend"] = budget_alerts.rebuild(conn)
+        counts["change_log"] = sync.record_all(conn)
+
+    reset_sequences(engine, [categories, accounts, tags, expenses, budgets, recurring])
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+    return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic expense dataset.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--expenses", type=int, default=100_000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--accounts", type=int, default=5)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--recurring", type=int, default=200)
+    # Fixed default span so the same seed reproduces the same dataset on any day
+    parser.add_argument("--start", default="2020-01-01", help="first expense date (YYYY-MM-DD)")
+    parser.add_argument("--end", default="2024-12-31", help="last expense date (YYYY-MM-DD)")
+    parser.add_argument("--tags-per-expense", type=float, default=1.2, help="mean of the Poisson tag count")
+    parser.add_argument("--max-tags", type=int, default=5)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for category/account/tag popularity")
+    parser.add_argument("--amount-mu", type=float, default=3.0, help="log-normal mu of amounts")
+    parser.add_argument("--amount-sigma", type=float, default=1.0, help="log-normal sigma of amounts")
+    parser.add_argument("--no-account-ratio", type=float, default=0.1)
+    parser.add_argument("--budget-ratio", type=float, default=0.6, help="share of categories budgeted each month")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    started = time.perf_counter()
+    counts = generate(args)
+    for table, count in counts.items():
+        print(f"{table:<20}{count:>12,}")
+    print(f"Generated in {time.perf_counter() - started:.1f}s (seed {args.seed}).")
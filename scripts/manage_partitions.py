@@ -0,0 +1,57 @@
+# scripts/manage_partitions.py
+"""Manage monthly partitions of the expenses table (PostgreSQL only).
+
+Usage:
+    python -m scripts.manage_partitions convert
+    python -m scripts.manage_partitions ensure [months_ahead]
+    python -m scripts.manage_partitions list
+    python -m scripts.manage_partitions detach YYYY-MM
+    python -m scripts.manage_partitions archive YYYY-MM [archive_dir]
+"""
+import sys
+import os
+from datetime import date
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine
+from app import partitioning
+
+
+def _parse_month(value: str) -> date:
+    year, month = value.split("-")
+    return date(int(year), int(month), 1)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1].lower() if len(sys.argv) > 1 else "list"
+
+    if engine.dialect.name != "postgresql":
+        print("Partitioning requires PostgreSQL.")
+        sys.exit(1)
+
+    if command == "convert":
+        if partitioning.convert_to_partitioned(engine):
+            print(f"expenses is now partitioned; the old table is kept as {partitioning.TABLE}_unpartitioned.")
+        else:
+            print("expenses is already partitioned.")
+    elif command == "ensure":
+        months = int(sys.argv[2]) if len(sys.argv) > 2 else partitioning.MONTHS_AHEAD
+        count = partitioning.ensure_partitions(engine, months_ahead=months)
+        print(f"{count} partitions ensured.")
+    elif command == "list":
+        with engine.connect() as conn:
+            for name in partitioning.list_partitions(conn):
+                print(name)
+    elif command == "detach" and len(sys.argv) > 2:
+        month = _parse_month(sys.argv[2])
+        name = partitioning.detach_partition(engine, month.year, month.month)
+        print(f"Detached {name}." if name else "No such partition.")
+    elif command == "archive" and len(sys.argv) > 2:
+        before = _parse_month(sys.argv[2])
+        archive_dir = sys.argv[3] if len(sys.argv) > 3 else partitioning.ARCHIVE_DIR
+        archived = partitioning.archive_partitions(engine, before, archive_dir)
+        print(f"Archived {len(archived)} partitions to {archive_dir}: {', '.join(archived) or '-'}")
+    else:
+        print(__doc__)
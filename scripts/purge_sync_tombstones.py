@@ -0,0 +1,21 @@
+# scripts/purge_sync_tombstones.py
+"""Delete sync tombstones older than SYNC_TOMBSTONE_DAYS (default 90).
+
+Usage:
+    python -m scripts.purge_sync_tombstones [DAYS]
+
+Clients holding a token from before the purged tombstones get 410 from
+GET /api/v1/sync/ and start over with a full sync.
+"""
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine
+from app import sync
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else sync.TOMBSTONE_DAYS
+    print(f"Purged {sync.purge_tombstones(engine, days)} tombstones older than {days} days.")
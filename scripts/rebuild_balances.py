@@ -0,0 +1,23 @@
+# scripts/rebuild_balances.py
+"""Recompute account balance snapshots from the expenses table.
+
+Needed only after expenses were written without going through the API
+(bulk SQL, restores); API writes keep the snapshots current.
+
+Usage:
+    python -m scripts.rebuild_balances [account_id ...]
+"""
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine
+from app import balances
+
+if __name__ == "__main__":
+    account_ids = [int(a) for a in sys.argv[1:]] or None
+    with engine.begin() as conn:
+        rows = balances.rebuild(conn, account_ids)
+    print(f"Rebuilt {rows} balance snapshots.")
@@ -0,0 +1,44 @@
+# scripts/run_scheduler.py
+"""Run the recurring-expense scheduler outside the API processes.
+
+Usage:
+    python -m scripts.run_scheduler                  # loop forever as a candidate leader
+    python -m scripts.run_scheduler --once           # one pass, e.g. from cron
+    python -m scripts.run_scheduler --once --no-leader --date 2024-12-31
+                                                     # help drain a backlog next to other workers
+"""
+import sys
+import os
+import argparse
+import asyncio
+from datetime import date
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import scheduler
+from app.database import engine
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate due recurring expenses.")
+    parser.add_argument("--once", action="store_true", help="run a single pass and exit")
+    parser.add_argument("--no-leader", action="store_true",
+                        help="skip leader election; rules are still claimed with SKIP LOCKED")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="generate as of this day")
+    parser.add_argument("--batch-size", type=int, default=scheduler.BATCH_SIZE, help="rules claimed per transaction")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.once:
+        asyncio.run(scheduler.run_forever(engine))
+    elif args.no_leader:
+        print(scheduler.run_once(args.date, args.batch_size))
+    else:
+        with scheduler.leader_lock(engine) as leader:
+            if not leader:
+                print("Another scheduler holds the leader lock; use --no-leader to help it.")
+                sys.exit(1)
+            print(scheduler.run_once(args.date, args.batch_size))
@@ -0,0 +1,43 @@
+"""Shared fixtures: a throwaway SQLite database migrated to head and an API client on it."""
+import os
+import tempfile
+
+# Must be set before anything imports app.database
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='expense-tests-')}/test.db"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from app import models, refcache
+from app.database import SessionLocal, engine
+from migrations.runner import upgrade
+
+API = "/api/v1"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated():
+    upgrade(engine)
+
+
+@pytest.fixture(autouse=True)
+def empty_tables(migrated):
+    yield
+    with engine.begin() as conn:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+    refcache.invalidate()
+
+
+@pytest.fixture
+def client():
+    from main import app
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
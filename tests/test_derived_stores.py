@@ -0,0 +1,155 @@
+"""The running totals crud maintains next to expenses stay equal to a recomputation."""
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from app import models
+
+from .conftest import API
+
+
+def create(client, path, payload):
+    response = client.post(f"{API}/{path}/", json=payload)
+    assert response.status_code == 201, response.text
+    return response.json()["data"]
+
+
+def budget_spend(db):
+    """``budget_spend`` without the rows that have dropped back to zero."""
+    Spend = models.BudgetSpend
+    return {
+        (category_id, month): Decimal(spent)
+        for category_id, month, spent in db.execute(select(Spend.category_id, Spend.month, Spend.spent))
+        if Decimal(spent)
+    }
+
+
+def expected_spend(db):
+    totals = {}
+    for category_id, day, amount in db.execute(
+        select(models.Expense.category_id, models.Expense.date, models.Expense.amount)
+    ):
+        key = (category_id, day.replace(day=1))
+        totals[key] = totals.get(key, Decimal(0)) + Decimal(amount)
+    return {key: total for key, total in totals.items() if total}
+
+
+def balance(client, account_id):
+    response = client.get(f"{API}/accounts/{account_id}/balance", params={"as_of": "2026-10-19"})
+    return Decimal(response.json()["data"]["balance"])
+
+
+def expected_balance(db, account_id):
+    initial = db.execute(select(models.Account.initial_balance).where(models.Account.id == account_id)).scalar()
+    spent = db.execute(
+        select(models.Expense.amount).where(models.Expense.account_id == account_id)
+    ).scalars().all()
+    return Decimal(initial) - sum((Decimal(amount) for amount in spent), Decimal(0))
+
+
+def change_log(db):
+    """(entity, entity_id) -> (deleted, archived) for every logged row."""
+    Log = models.ChangeLog
+    return {
+        (entity, entity_id): (deleted, archived)
+        for entity, entity_id, deleted, archived in db.execute(
+            select(Log.entity, Log.entity_id, Log.deleted, Log.archived)
+        )
+    }
+
+
+def test_expense_writes_keep_budget_spend_and_balances_in_step(client, db):
+    food = create(client, "categories", {"name": "Food"})
+    rent = create(client, "categories", {"name": "Rent"})
+    card = create(client, "accounts", {"name": "Card", "initial_balance": "500.00"})
+    cash = create(client, "accounts", {"name": "Cash", "initial_balance": "80.00"})
+
+    def check():
+        assert budget_spend(db) == expected_spend(db)
+        for account in (card, cash):
+            assert balance(client, account["id"]) == expected_balance(db, account["id"])
+
+    first = create(client, "expenses", {
+        "amount": "12.50", "date": "2026-08-03", "category_id": food["id"], "account_id": card["id"],
+    })
+    second = create(client, "expenses", {
+        "amount": "40.00", "date": "2026-09-14", "category_id": rent["id"], "account_id": cash["id"],
+    })
+    check()
+
+    # Amount, category and account all change at once
+    response = client.put(f"{API}/expenses/{first['id']}", json={
+        "amount": "20.00", "category_id": rent["id"], "account_id": cash["id"],
+    })
+    assert response.status_code == 200, response.text
+    check()
+    assert budget_spend(db) == {
+        (rent["id"], date(2026, 8, 1)): Decimal("20.00"),
+        (rent["id"], date(2026, 9, 1)): Decimal("40.00"),
+    }
+
+    assert client.delete(f"{API}/expenses/{second['id']}").status_code == 200
+    check()
+    assert balance(client, cash["id"]) == Decimal("60.00")
+
+
+def test_change_log_follows_creates_updates_and_deletes(client, db):
+    category = create(client, "categories", {"name": "Books"})
+    expense = create(client, "expenses", {"amount": "9.99", "date": "2026-08-03", "category_id": category["id"]})
+    assert change_log(db) == {("category", category["id"]): (False, False), ("expense", expense["id"]): (False, False)}
+
+    client.put(f"{API}/expenses/{expense['id']}", json={"amount": "11.00"})
+    synced = client.get(f"{API}/sync/").json()["data"]
+    assert [row["amount"] for row in synced["changed"]["expenses"]] == ["11.00"]
+
+    assert client.delete(f"{API}/categories/{category['id']}").status_code == 200
+    assert change_log(db) == {("category", category["id"]): (True, False), ("expense", expense["id"]): (True, False)}
+    synced = client.get(f"{API}/sync/", params={"since": synced["next"]}).json()["data"]
+    assert synced["deleted"]["expenses"] == [expense["id"]]
+    assert synced["deleted"]["categories"] == [category["id"]]
+
+
+def test_failed_atomic_batch_leaves_no_trace(client, db):
+    category = create(client, "categories", {"name": "Fuel"})
+    before = (budget_spend(db), change_log(db))
+
+    response = client.post(f"{API}/batch/", json={"operations": [
+        {"op": "create_expense", "data": {"amount": "30.00", "date": "2026-08-03", "category_id": category["id"]}},
+        {"op": "create_expense", "data": {"amount": "5.00", "date": "2026-08-04", "category_id": 999}},
+    ]})
+    assert response.status_code == 400, response.text
+
+    assert db.execute(select(models.Expense.id)).all() == []
+    assert (budget_spend(db), change_log(db)) == before
+
+
+def test_deleting_an_account_unbooks_its_expenses_from_budget_spend(client, db):
+    category = create(client, "categories", {"name": "Groceries"})
+    account = create(client, "accounts", {"name": "Card", "initial_balance": "100.00"})
+    create(client, "budgets", {"category_id": category["id"], "year": 2026, "month": 8, "amount": "100.00"})
+    create(client, "expenses", {
+        "amount": "60.00", "date": "2026-08-03", "category_id": category["id"], "account_id": account["id"],
+    })
+
+    assert client.delete(f"{API}/accounts/{account['id']}").status_code == 200
+    assert budget_spend(db) == expected_spend(db) == {}
+
+    create(client, "expenses", {"amount": "30.00", "date": "2026-08-04", "category_id": category["id"]})
+    assert budget_spend(db) == {(category["id"], date(2026, 8, 1)): Decimal("30.00")}
+    # 50% fired for the deleted 60.00; 30.00 alone crosses nothing further
+    thresholds = db.execute(select(models.BudgetAlert.threshold)).scalars().all()
+    assert thresholds == [50]
+
+
+def test_deleting_a_category_unbooks_its_expenses_from_balance_snapshots(client, db):
+    category = create(client, "categories", {"name": "Travel"})
+    account = create(client, "accounts", {"name": "Savings", "initial_balance": "100.00"})
+    create(client, "expenses", {
+        "amount": "60.00", "date": "2026-08-03", "category_id": category["id"], "account_id": account["id"],
+    })
+    balance = lambda: client.get(f"{API}/accounts/{account['id']}/balance", params={"as_of": "2026-10-19"}).json()["data"]
+    assert balance()["balance"] == "40.00"
+
+    assert client.delete(f"{API}/categories/{category['id']}").status_code == 200
+    assert balance()["balance"] == "100.00"
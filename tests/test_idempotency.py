@@ -0,0 +1,19 @@
+"""Idempotency-Key handling in app/idempotency.py."""
+from sqlalchemy import func, select
+
+from app import models
+
+from .conftest import API
+
+
+def test_unauthenticated_requests_are_not_replayed(client, db):
+    category = client.post(f"{API}/categories/", json={"name": "Coffee"}).json()["data"]
+    payload = {"amount": "4.50", "date": "2026-08-03", "category_id": category["id"]}
+    headers = {"Idempotency-Key": "1"}
+    first = client.post(f"{API}/expenses/", json=payload, headers=headers)
+    second = client.post(f"{API}/expenses/", json=payload, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert "idempotent-replayed" not in second.headers
+    assert first.json()["data"]["id"] != second.json()["data"]["id"]
+    assert db.execute(select(func.count()).select_from(models.IdempotencyKey)).scalar() == 0
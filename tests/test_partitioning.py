@@ -0,0 +1,68 @@
+"""app/partitioning.py against a real PostgreSQL database.
+
+Skipped unless ``TEST_POSTGRES_URL`` points at a database the tests may wipe:
+every test drops and recreates its ``public`` schema.
+"""
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+from app import partitioning
+from app.utils.date_utils import add_months
+from migrations.runner import upgrade
+
+URL = os.getenv("TEST_POSTGRES_URL")
+pytestmark = pytest.mark.skipif(not URL, reason="TEST_POSTGRES_URL is not set")
+
+
+@pytest.fixture
+def pg():
+    engine = create_engine(URL)
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    upgrade(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO categories (id, name) VALUES (1, 'Food')"))
+        conn.execute(text("INSERT INTO accounts (id, name) VALUES (1, 'Card')"))
+        conn.execute(text(
+            "INSERT INTO expenses (amount, date, category_id, account_id) "
+            "VALUES (5, '2024-01-15', 1, 1), (7, '2024-02-03', 1, NULL)"
+        ))
+    yield engine
+    engine.dispose()
+
+
+def foreign_keys(engine, table):
+    with engine.connect() as conn:
+        return set(conn.execute(text(
+            "SELECT c.conname, pg_get_constraintdef(c.oid) FROM pg_constraint c "
+            "JOIN pg_class t ON t.oid = c.conrelid WHERE t.relname = :table AND c.contype = 'f'"
+        ), {"table": table}).all())
+
+
+def test_convert_keeps_foreign_keys(pg):
+    before = foreign_keys(pg, "expenses")
+    assert any("ON DELETE SET NULL" in definition for _, definition in before)
+
+    assert partitioning.convert_to_partitioned(pg)
+    assert foreign_keys(pg, "expenses") == before
+    with pytest.raises(IntegrityError), pg.begin() as conn:
+        conn.execute(text("INSERT INTO expenses (amount, date, category_id) VALUES (1, '2024-01-20', 999)"))
+
+
+def test_ensure_partitions_moves_rows_out_of_the_default_partition(pg):
+    assert partitioning.convert_to_partitioned(pg)
+    ahead = partitioning.MONTHS_AHEAD + 2
+    month = add_months(date.today().replace(day=1), ahead)
+    with pg.begin() as conn:
+        conn.execute(text("INSERT INTO expenses (amount, date, category_id) VALUES (3, :day, 1)"), {"day": month})
+
+    assert partitioning.ensure_partitions(pg, months_ahead=ahead) == ahead + 1
+    name = partitioning.partition_name(month.year, month.month)
+    with pg.connect() as conn:
+        assert conn.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar() == 1
+        assert conn.execute(text(f"SELECT COUNT(*) FROM {partitioning.DEFAULT_PARTITION} WHERE date = :day"), {"day": month}).scalar() == 0
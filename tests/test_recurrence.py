@@ -0,0 +1,77 @@
+"""Property-based tests of app/utils/recurrence.py against a naive reference."""
+from datetime import date, timedelta
+
+from hypothesis import given, strategies as st
+
+from app.utils.date_utils import add_months
+from app.utils.recurrence import DAY, INTERVALS, compile_rule
+
+intervals = st.sampled_from(sorted(INTERVALS))
+days = st.dates(min_value=date(1990, 1, 1), max_value=date(2060, 12, 31))
+
+
+def reference_nth(interval: str, anchor: date, n: int) -> date:
+    unit, step = INTERVALS[interval]
+    if unit == DAY:
+        return anchor + timedelta(days=n * step)
+    return add_months(anchor, n * step)
+
+
+def reference_between(interval: str, anchor: date, end: date, start: date = None):
+    result = []
+    n = 0
+    while reference_nth(interval, anchor, n) <= end:
+        occurrence = reference_nth(interval, anchor, n)
+        if start is None or occurrence >= start:
+            result.append(occurrence)
+        n += 1
+    return result
+
+
+@given(intervals, days, st.integers(min_value=0, max_value=400))
+def test_nth_matches_reference(interval, anchor, n):
+    assert compile_rule(interval).nth(anchor, n) == reference_nth(interval, anchor, n)
+
+
+@given(intervals, days, st.integers(min_value=-60, max_value=800), st.integers(min_value=-60, max_value=800))
+def test_between_matches_reference(interval, anchor, start_offset, end_offset):
+    start = anchor + timedelta(days=start_offset)
+    end = anchor + timedelta(days=end_offset)
+    rule = compile_rule(interval)
+    assert rule.between(anchor, end) == reference_between(interval, anchor, end)
+    assert rule.between(anchor, end, start) == reference_between(interval, anchor, end, start)
+
+
+@given(intervals, days, st.integers(min_value=-60, max_value=3000))
+def test_first_on_or_after(interval, anchor, offset):
+    day = anchor + timedelta(days=offset)
+    rule = compile_rule(interval)
+    n = rule.index_on_or_after(anchor, day)
+    assert rule.nth(anchor, n) >= day
+    assert n == 0 or rule.nth(anchor, n - 1) < day
+    assert rule.first_on_or_after(anchor, day) == reference_nth(interval, anchor, n)
+
+
+@given(intervals, days, st.lists(st.integers(min_value=1, max_value=120), min_size=1, max_size=30))
+def test_runs_on_any_schedule_match_one_catch_up(interval, anchor, gaps):
+    # What generate_recurring_expenses does on every run: occurrences from
+    # next_date through today, then next_date moves past today
+    rule = compile_rule(interval)
+    generated = []
+    next_date = anchor
+    today = anchor
+    for gap in gaps:
+        today += timedelta(days=gap)
+        if next_date <= today:
+            generated += rule.between(anchor, today, start=next_date)
+            next_date = rule.first_on_or_after(anchor, today + timedelta(days=1))
+    assert generated == reference_between(interval, anchor, today)
+
+
+@given(st.integers(min_value=1990, max_value=2060), st.integers(min_value=1, max_value=12))
+def test_month_end_anchor_does_not_drift(year, month):
+    anchor = add_months(date(year, month, 1), 1) - timedelta(days=1)
+    if anchor.day != 31:
+        return
+    for occurrence in compile_rule("monthly").between(anchor, add_months(anchor, 36)):
+        assert (occurrence + timedelta(days=1)).day == 1